@@ -0,0 +1,79 @@
+"""
+Run the benchmarks and store their results as json, to be compared between versions with benchmarks.compare
+
+    $ python -m benchmarks [-o results.json] [name ...]
+    $ python -m benchmarks.compare baseline.json results.json
+"""
+from datetime import datetime, timezone
+import argparse
+import importlib
+import importlib.metadata
+import json
+import platform
+import subprocess
+import sys
+import time
+
+
+# Run in this order by default
+BENCHMARKS = ("models", "decode", "projection", "to_dict", "hash", "token", "ratelimit", "transport", "e2e", "metrics", "memory")
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _version(package: str) -> str | None:
+    try:
+        return importlib.metadata.version(package)
+    except importlib.metadata.PackageNotFoundError:
+        return None
+
+
+def metadata() -> dict:
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": _git_commit(),
+        "circleapi": _version("circleapi"),
+        "msgspec": _version("msgspec"),
+        "httpx": _version("httpx"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine()
+    }
+
+
+def run(names: list[str]) -> dict:
+    results = {}
+    for name in names:
+        module = importlib.import_module(f".bench_{name}", __package__)
+        print(f"Running {name} ...", file=sys.stderr)
+        start = time.perf_counter()
+        results[name] = module.run()
+        print(f"{name} done in {time.perf_counter() - start:.1f} s", file=sys.stderr)
+    return {"meta": metadata(), "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("names", nargs="*", metavar="name",
+                        help=f"benchmarks to run, all by default ({', '.join(BENCHMARKS)})")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="json file the results are written to")
+    args = parser.parse_args()
+    if unknown := [name for name in args.names if name not in BENCHMARKS]:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    report = run(args.names if args.names else list(BENCHMARKS))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Compare the legacy decode -> patch -> encode -> decode response path with the single pass decoder
+
+    $ python -m benchmarks.bench_decode
+"""
+import timeit
+import msgspec
+from circleapi.models import BeatmapScores, BeatmapsExtended, BeatmapUserScore, BeatmapUserScores
+from circleapi.utils import decode_response
+from . import payloads
+
+
+_decoder = msgspec.json.Decoder()
+_encoder = msgspec.json.Encoder()
+
+
+def legacy_decode(content: bytes, validate_with, args: dict | None = None):
+    data: dict = _decoder.decode(content)
+    if args:
+        data.update(args)
+        if validate_with is BeatmapScores:
+            for score in data["scores"]:
+                score.update(args)
+            if "user_score" in data:
+                data["user_score"]["score"].update(args)
+        elif validate_with is BeatmapUserScore:
+            data["score"].update(args)
+        elif validate_with is BeatmapUserScores:
+            for score in data["scores"]:
+                score.update(args)
+    return msgspec.json.decode(_encoder.encode(data), type=validate_with, strict=False)
+
+
+CASES = [
+    (
+        "BeatmapScores (50 scores)",
+        payloads.beatmap_scores(50),
+        BeatmapScores,
+        {"args": {"beatmap_id": 53, "type": "global"}, "beatmap_id": 53, "scope": "global"}
+    ),
+    (
+        "BeatmapsExtended (50 beatmaps)",
+        payloads.beatmaps_extended(50),
+        BeatmapsExtended,
+        {"args": {"ids": list(range(50))}}
+    ),
+]
+
+
+def run(number: int = 200) -> list[dict]:
+    results = []
+    for name, content, validate_with, args in CASES:
+        assert legacy_decode(content, validate_with, args) == decode_response(content, validate_with, args)
+        legacy = min(timeit.repeat(lambda: legacy_decode(content, validate_with, args), number=number, repeat=5))
+        single = min(timeit.repeat(lambda: decode_response(content, validate_with, args), number=number, repeat=5))
+        results.append({
+            "name": name,
+            "size_bytes": len(content),
+            "legacy_us": legacy / number * 1e6,
+            "single_pass_us": single / number * 1e6,
+            "speedup": legacy / single
+        })
+    return results
+
+
+if __name__ == "__main__":
+    for result in run():
+        print(f"{result['name']:<32} {result['size_bytes']:>8} B | "
+              f"legacy {result['legacy_us']:>9.1f} us | "
+              f"single pass {result['single_pass_us']:>9.1f} us | "
+              f"x{result['speedup']:.2f}")
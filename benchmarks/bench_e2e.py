@@ -0,0 +1,77 @@
+"""
+End-to-end requests per second of ApiV2 on worker threads vs AsyncApiV2, against fixtures recorded
+from a local stub server (replayed with and without simulated latency) and against the stub server itself
+
+    $ python -m benchmarks.bench_e2e
+"""
+import asyncio
+import tempfile
+import time
+from circleapi import ApiV2, AsyncApiV2, RecordTransport, ReplayTransport
+from . import payloads
+from .stub_server import StubServer, fake_guest_token, fake_async_guest_token
+
+
+_IDS = range(1, 51)
+
+
+def _result(name: str, requests: int, errors: int, elapsed: float) -> dict:
+    return {
+        "name": name,
+        "requests": requests,
+        "errors": errors,
+        "req_per_s": requests / elapsed,
+        "request_us": elapsed / requests * 1e6
+    }
+
+
+def bench_sync(name: str, requests: int, workers: int, **kwargs) -> dict:
+    with ApiV2(fake_guest_token(), coalesce_requests=False, **kwargs) as api:
+        # Only the pipeline is measured, not the default 1000 req/min budget
+        api.rate_limit.set_rate_limit(10 ** 9)
+        api.get_beatmap(_IDS[0])
+        calls = (("get_beatmap", {"beatmap_id": _IDS[i % len(_IDS)]}) for i in range(requests))
+        start = time.perf_counter()
+        errors = sum(1 for result in api.batch(calls, max_workers=workers) if result.error)
+        return _result(f"{name} sync {workers} threads", requests, errors, time.perf_counter() - start)
+
+
+async def bench_async(name: str, requests: int, concurrency: int, **kwargs) -> dict:
+    async with AsyncApiV2(fake_async_guest_token(), coalesce_requests=False, **kwargs) as api:
+        api.rate_limit.set_rate_limit(10 ** 9)
+        await api.get_beatmap(_IDS[0])
+        calls = ({"beatmap_id": _IDS[i % len(_IDS)]} for i in range(requests))
+        start = time.perf_counter()
+        errors = 0
+        async for result in api.map_stream("get_beatmap", calls, concurrency=concurrency):
+            errors += result.error is not None
+        return _result(f"{name} async {concurrency} tasks", requests, errors, time.perf_counter() - start)
+
+
+def record_fixtures(url: str, directory: str):
+    record = RecordTransport(directory)
+    with ApiV2(fake_guest_token(), base_url=url, transport=record) as api:
+        for beatmap_id in _IDS:
+            api.get_beatmap(beatmap_id)
+
+
+def run(requests: int = 2000, workers: int = 8, latency: float = 0.005) -> list[dict]:
+    results = []
+    with StubServer(payloads.beatmap_extended()) as server, tempfile.TemporaryDirectory() as fixtures:
+        record_fixtures(server.url, fixtures)
+        cases = [
+            ("replay", requests, {"base_url": server.url, "transport": ReplayTransport(fixtures)}),
+            (f"replay {latency * 1e3:g}ms", requests // 4,
+             {"base_url": server.url, "transport": ReplayTransport(fixtures, latency=latency)}),
+            ("stub server", requests, {"base_url": server.url, "http2": False}),
+        ]
+        for name, count, kwargs in cases:
+            results.append(bench_sync(name, count, workers, **kwargs))
+            results.append(asyncio.run(bench_async(name, count, workers, **kwargs)))
+    return results
+
+
+if __name__ == "__main__":
+    for result in run():
+        print(f"{result['name']:<32} {result['requests']:>6} req ({result['errors']} errors) | "
+              f"{result['req_per_s']:>8.0f} req/s | {result['request_us']:>8.1f} us/req")
@@ -0,0 +1,42 @@
+"""
+Compare the legacy repr based hash of the models with the natural key / field values hash
+
+    $ python -m benchmarks.bench_hash
+"""
+import timeit
+from circleapi.models import BeatmapsExtended, BeatmapScores
+from circleapi.utils import decode_response
+from . import payloads
+
+
+def legacy_hash(obj) -> int:
+    return hash(obj.__repr__())
+
+
+def run(number: int = 20) -> list[dict]:
+    beatmaps = decode_response(payloads.beatmaps_extended(500), BeatmapsExtended).beatmaps
+    scores = decode_response(payloads.beatmap_scores(500), BeatmapScores).scores
+    # Without natural key
+    statistics = [score.statistics for score in scores]
+
+    results = []
+    for name, items in (("BeatmapExtended", beatmaps), ("Score", scores), ("StatisticsOsu", statistics)):
+        # De-duplicate a result set holding every item twice
+        items = items + items
+        legacy = min(timeit.repeat(lambda: {legacy_hash(item) for item in items}, number=number, repeat=3))
+        current = min(timeit.repeat(lambda: set(items), number=number, repeat=3))
+        results.append({
+            "name": name,
+            "items": len(items),
+            "legacy_ms": legacy / number * 1e3,
+            "current_ms": current / number * 1e3,
+            "speedup": legacy / current
+        })
+    return results
+
+
+if __name__ == "__main__":
+    for result in run():
+        print(f"{result['name']:<16} {result['items']:>6} items | "
+              f"legacy {result['legacy_ms']:>8.2f} ms | current {result['current_ms']:>7.2f} ms | "
+              f"x{result['speedup']:.1f}")
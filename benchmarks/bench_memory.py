@@ -0,0 +1,90 @@
+"""
+Memory, decode time and GC pauses with millions of live models, default vs compact mode
+(CIRCLEAPI_COMPACT=1), and size of the stored models (json vs compact msgpack)
+
+    $ python -m benchmarks.bench_memory [responses]
+"""
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+import tracemalloc
+import msgspec
+from . import payloads
+
+
+def measure(responses: int) -> dict:
+    from circleapi.models import BeatmapScores, COMPACT, encode_compact, decode_compact
+    from circleapi.utils import decode_response
+
+    content = payloads.beatmap_scores(50)
+    args = {"beatmap_id": 53, "scope": "global"}
+    stored = encode_compact(decode_response(content, BeatmapScores, args))
+    decode_compact(stored, BeatmapScores)
+
+    # Every decoded object is kept alive, the collector runs (and slows down) as the heap grows
+    start = time.perf_counter()
+    kept = [decode_response(content, BeatmapScores, args) for _ in range(responses)]
+    decode_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    gc.collect()
+    gc_pause_s = time.perf_counter() - start
+
+    # Memory of a tenth of the responses, tracemalloc slows allocations down a lot
+    tracemalloc.start()
+    sample = [decode_response(content, BeatmapScores, args) for _ in range(responses // 10)]
+    memory = tracemalloc.get_traced_memory()[0] * 10
+    tracemalloc.stop()
+    del sample
+
+    start = time.perf_counter()
+    for _ in range(100):
+        decode_compact(stored, BeatmapScores)
+    decode_compact_us = (time.perf_counter() - start) / 100 * 1e6
+
+    return {
+        "compact": COMPACT,
+        "responses": responses,
+        "scores": responses * len(kept[0].scores),
+        "decode_s": decode_s,
+        "memory_mb": memory / 2 ** 20,
+        "gc_tracked_objects": len(gc.get_objects()),
+        "gc_pause_ms": gc_pause_s * 1e3,
+        "json_bytes": len(content),
+        "msgpack_bytes": len(msgspec.msgpack.encode(kept[0])),
+        "compact_bytes": len(stored),
+        "decode_compact_us": decode_compact_us,
+        "decode_json_us": decode_s / responses * 1e6
+    }
+
+
+def run(responses: int = 2000) -> list[dict]:
+    results = []
+    for compact in ("0", "1"):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_memory", "--child", str(responses)],
+            env=os.environ | {"CIRCLEAPI_COMPACT": compact},
+            capture_output=True,
+            check=True
+        ).stdout
+        results.append(json.loads(output))
+    return results
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--child"]:
+        print(json.dumps(measure(int(sys.argv[2]))))
+        sys.exit()
+
+    results = run(*(int(arg) for arg in sys.argv[1:2]))
+    for result in results:
+        print(f"{'compact' if result['compact'] else 'default':<8} {result['scores']:>8} scores | "
+              f"decode {result['decode_s']:>6.2f} s | {result['memory_mb']:>7.1f} MiB | "
+              f"gc tracked {result['gc_tracked_objects']:>8} | gc pause {result['gc_pause_ms']:>7.1f} ms")
+    result = results[0]
+    print(f"stored BeatmapScores (50 scores): json {result['json_bytes']} B | msgpack {result['msgpack_bytes']} B | "
+          f"compact {result['compact_bytes']} B | decode json {result['decode_json_us']:.1f} us, "
+          f"compact {result['decode_compact_us']:.1f} us")
@@ -0,0 +1,46 @@
+"""
+Per request cost of the metrics, disabled (default) vs recorded in circleapi.metrics.Metrics,
+on responses replayed from fixtures recorded from a local stub server
+
+    $ python -m benchmarks.bench_metrics
+"""
+import tempfile
+import timeit
+from circleapi import ApiV2, Metrics, RecordTransport, ReplayTransport
+from . import payloads
+from .stub_server import StubServer, fake_guest_token
+
+
+def run(number: int = 1000, repeat: int = 10) -> list[dict]:
+    with StubServer(payloads.beatmap_extended()) as server, tempfile.TemporaryDirectory() as fixtures:
+        with ApiV2(fake_guest_token(), base_url=server.url, transport=RecordTransport(fixtures)) as api:
+            api.get_beatmap(53)
+
+        metrics = Metrics()
+        sinks = {"disabled": None, "Metrics": metrics}
+        apis = {
+            name: ApiV2(fake_guest_token(), base_url=server.url, transport=ReplayTransport(fixtures),
+                        coalesce_requests=False, metrics=sink)
+            for name, sink in sinks.items()
+        }
+        # Rounds are interleaved so both configurations see the same machine noise
+        best = dict.fromkeys(apis, float("inf"))
+        for _ in range(repeat):
+            for name, api in apis.items():
+                api.rate_limit.set_rate_limit(10 ** 9)
+                best[name] = min(best[name], timeit.timeit(lambda: api.get_beatmap(53), number=number))
+        for api in apis.values():
+            api.stop_client()
+        results = [{"name": name, "request_us": elapsed / number * 1e6} for name, elapsed in best.items()]
+        start = timeit.default_timer()
+        metrics.render()
+        results.append({"name": "Metrics.render", "render_us": (timeit.default_timer() - start) * 1e6})
+    return results
+
+
+if __name__ == "__main__":
+    for result in run():
+        if "request_us" in result:
+            print(f"{result['name']:<16} {result['request_us']:>8.1f} us/request")
+        else:
+            print(f"{result['name']:<16} {result['render_us']:>8.1f} us")
@@ -0,0 +1,52 @@
+"""
+Decode + validate throughput of every api response model
+
+    $ python -m benchmarks.bench_models
+"""
+import timeit
+from circleapi.models import (
+    BeatmapExtended, BeatmapsExtended, BeatmapScores, BeatmapUserScore, BeatmapUserScores,
+    BeatmapAttributes, Score, UserExtended
+)
+from circleapi.utils import decode_response
+from . import payloads
+
+
+CASES = [
+    ("BeatmapExtended", payloads.beatmap_extended(), BeatmapExtended, None),
+    ("BeatmapsExtended (50 beatmaps)", payloads.beatmaps_extended(50), BeatmapsExtended, None),
+    (
+        "BeatmapScores (50 scores)",
+        payloads.beatmap_scores(50),
+        BeatmapScores,
+        {"args": {"beatmap_id": 53, "type": "global"}, "beatmap_id": 53, "scope": "global"}
+    ),
+    ("BeatmapUserScore", payloads.beatmap_user_score(), BeatmapUserScore, {"args": {"beatmap_id": 53}}),
+    ("BeatmapUserScores (20 scores)", payloads.beatmap_user_scores(20), BeatmapUserScores, {"args": {"beatmap_id": 53}}),
+    ("BeatmapAttributes", payloads.beatmap_attributes(), BeatmapAttributes, {"beatmap_id": 53}),
+    ("Score", payloads.score_extended(), Score, None),
+    ("UserExtended", payloads.user_extended(), UserExtended, None),
+]
+
+
+def run(number: int = 200) -> list[dict]:
+    results = []
+    for name, content, validate_with, args in CASES:
+        decode_response(content, validate_with, args)
+        elapsed = min(timeit.repeat(lambda: decode_response(content, validate_with, args), number=number, repeat=5))
+        results.append({
+            "name": name,
+            "size_bytes": len(content),
+            "decode_us": elapsed / number * 1e6,
+            "decodes_per_s": number / elapsed,
+            "mb_per_s": len(content) * number / elapsed / 1e6
+        })
+    return results
+
+
+if __name__ == "__main__":
+    for result in run():
+        print(f"{result['name']:<32} {result['size_bytes']:>8} B | "
+              f"{result['decode_us']:>9.1f} us | "
+              f"{result['decodes_per_s']:>10.0f} decodes/s | "
+              f"{result['mb_per_s']:>7.1f} MB/s")
@@ -0,0 +1,66 @@
+"""
+Compare decoding full models with decoding projections of them (only a few fields)
+
+    $ python -m benchmarks.bench_projection
+"""
+import timeit
+import tracemalloc
+from circleapi.models import BeatmapScores, BeatmapsExtended, projection
+from circleapi.utils import decode_response
+from . import payloads
+
+
+CASES = [
+    (
+        "BeatmapScores (50 scores)",
+        payloads.beatmap_scores(50),
+        BeatmapScores,
+        ["scores.id", "scores.user_id", "scores.pp", "scores.accuracy", "beatmap_id"],
+        {"args": {"beatmap_id": 53, "type": "global"}, "beatmap_id": 53, "scope": "global"}
+    ),
+    (
+        "BeatmapsExtended (50 beatmaps)",
+        payloads.beatmaps_extended(50),
+        BeatmapsExtended,
+        ["beatmaps.id", "beatmaps.difficulty_rating", "beatmaps.beatmapset.title"],
+        {"args": {"ids": list(range(50))}}
+    ),
+]
+
+
+def retained_bytes(content: bytes, validate_with, args: dict) -> int:
+    tracemalloc.start()
+    data = decode_response(content, validate_with, args)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return size
+
+
+def run(number: int = 200) -> list[dict]:
+    results = []
+    for name, content, model, fields, args in CASES:
+        projected = projection(model, fields)
+        # Build the decoders outside of the measures
+        decode_response(content, model, args)
+        decode_response(content, projected, args)
+        full = min(timeit.repeat(lambda: decode_response(content, model, args), number=number, repeat=5))
+        partial = min(timeit.repeat(lambda: decode_response(content, projected, args), number=number, repeat=5))
+        results.append({
+            "name": name,
+            "size_bytes": len(content),
+            "full_us": full / number * 1e6,
+            "projection_us": partial / number * 1e6,
+            "speedup": full / partial,
+            "full_memory_bytes": retained_bytes(content, model, args),
+            "projection_memory_bytes": retained_bytes(content, projected, args)
+        })
+    return results
+
+
+if __name__ == "__main__":
+    for result in run():
+        print(f"{result['name']:<32} {result['size_bytes']:>8} B | "
+              f"full {result['full_us']:>8.1f} us {result['full_memory_bytes'] / 1024:>7.1f} KiB | "
+              f"projection {result['projection_us']:>8.1f} us {result['projection_memory_bytes'] / 1024:>7.1f} KiB | "
+              f"x{result['speedup']:.2f}")
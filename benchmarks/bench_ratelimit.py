@@ -0,0 +1,97 @@
+"""
+Overhead of RateLimit / AsyncRateLimit.acquire under contention, and accuracy of the enforced rate
+
+    $ python -m benchmarks.bench_ratelimit
+"""
+import asyncio
+import threading
+import time
+from circleapi import RateLimit, AsyncRateLimit
+
+
+# Never reached, every acquire is served at once: only the bookkeeping is measured
+_UNLIMITED = 10 ** 9
+
+
+def _threads(rate_limit: RateLimit, threads: int, per_thread: int) -> float:
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        barrier.wait()
+        for _ in range(per_thread):
+            rate_limit.acquire()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for worker_thread in workers:
+        worker_thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker_thread in workers:
+        worker_thread.join()
+    return time.perf_counter() - start
+
+
+async def _tasks(rate_limit: AsyncRateLimit, tasks: int, per_task: int) -> float:
+    async def worker():
+        for _ in range(per_task):
+            await rate_limit.acquire()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(tasks)))
+    return time.perf_counter() - start
+
+
+def _overhead(name: str, acquires: int, elapsed: float) -> dict:
+    return {
+        "name": name,
+        "acquires": acquires,
+        "acquire_ns": elapsed / acquires * 1e9,
+        "acquires_per_s": acquires / elapsed
+    }
+
+
+def _accuracy(name: str, req_per_minute: int, acquires: int, elapsed: float) -> dict:
+    return {
+        "name": name,
+        "acquires": acquires,
+        "target_per_s": req_per_minute / 60,
+        "achieved_per_s": acquires / elapsed,
+        "rate_error": acquires / elapsed / (req_per_minute / 60) - 1
+    }
+
+
+def run(acquires: int = 20000, req_per_minute: int = 12000) -> list[dict]:
+    results = []
+    for threads in (1, 4, 16):
+        elapsed = _threads(RateLimit(_UNLIMITED), threads, acquires // threads)
+        results.append(_overhead(f"RateLimit {threads} threads", acquires // threads * threads, elapsed))
+    for tasks in (1, 16, 256):
+        elapsed = asyncio.run(_tasks(AsyncRateLimit(_UNLIMITED), tasks, acquires // tasks))
+        results.append(_overhead(f"AsyncRateLimit {tasks} tasks", acquires // tasks * tasks, elapsed))
+
+    # Saturated limiter: the bucket is drained first so every acquire waits for its turn
+    count = req_per_minute // 60
+    rate_limit = RateLimit(req_per_minute)
+    rate_limit.acquire(int(rate_limit.bucket))
+    results.append(_accuracy(f"RateLimit {req_per_minute}/min 8 threads",
+                             req_per_minute, count // 8 * 8, _threads(rate_limit, 8, count // 8)))
+
+    async def saturated() -> float:
+        async_rate_limit = AsyncRateLimit(req_per_minute)
+        await async_rate_limit.acquire(int(async_rate_limit.bucket))
+        return await _tasks(async_rate_limit, 32, count // 32)
+
+    results.append(_accuracy(f"AsyncRateLimit {req_per_minute}/min 32 tasks",
+                             req_per_minute, count // 32 * 32, asyncio.run(saturated())))
+    return results
+
+
+if __name__ == "__main__":
+    for result in run():
+        if "acquire_ns" in result:
+            print(f"{result['name']:<36} {result['acquires']:>7} acquires | "
+                  f"{result['acquire_ns']:>8.0f} ns/acquire | {result['acquires_per_s']:>10.0f} acquires/s")
+        else:
+            print(f"{result['name']:<36} {result['acquires']:>7} acquires | "
+                  f"target {result['target_per_s']:.0f}/s | achieved {result['achieved_per_s']:.1f}/s | "
+                  f"error {result['rate_error']:+.2%}")
@@ -0,0 +1,53 @@
+"""
+Compare the legacy recursive to_dict with the msgspec.to_builtins based one, and json lines export
+
+    $ python -m benchmarks.bench_to_dict
+"""
+import timeit
+import msgspec
+from circleapi.models import BeatmapScores, BeatmapsExtended, to_json_lines
+from circleapi.utils import decode_response
+from . import payloads
+
+
+def legacy_to_dict(data: msgspec.Struct) -> dict:
+    new_dict = msgspec.structs.asdict(data)
+    for key in new_dict:
+        if isinstance(new_dict[key], msgspec.Struct):
+            new_dict[key] = legacy_to_dict(new_dict[key])
+        elif isinstance(new_dict[key], list):
+            # Copied, the legacy version replaced the items of the struct own lists
+            new_dict[key] = [legacy_to_dict(value) if isinstance(value, msgspec.Struct) else value
+                             for value in new_dict[key]]
+    return new_dict
+
+
+def run(number: int = 50) -> list[dict]:
+    cases = (
+        ("BeatmapScores (500 scores)", decode_response(payloads.beatmap_scores(500), BeatmapScores)),
+        ("BeatmapsExtended (500 beatmaps)", decode_response(payloads.beatmaps_extended(500), BeatmapsExtended)),
+    )
+    results = []
+    for name, data in cases:
+        items = data.scores if isinstance(data, BeatmapScores) else data.beatmaps
+        legacy = min(timeit.repeat(lambda: legacy_to_dict(data), number=number, repeat=3))
+        current = min(timeit.repeat(lambda: data.to_dict(), number=number, repeat=3))
+        iso = min(timeit.repeat(lambda: data.to_dict(datetime_format="iso", omit_none=True), number=number, repeat=3))
+        lines = min(timeit.repeat(lambda: b"".join(to_json_lines(items)), number=number, repeat=3))
+        results.append({
+            "name": name,
+            "legacy_ms": legacy / number * 1e3,
+            "to_dict_ms": current / number * 1e3,
+            "to_dict_iso_omit_none_ms": iso / number * 1e3,
+            "json_lines_ms": lines / number * 1e3,
+            "speedup": legacy / current
+        })
+    return results
+
+
+if __name__ == "__main__":
+    for result in run():
+        print(f"{result['name']:<32} | legacy {result['legacy_ms']:>7.2f} ms | "
+              f"to_dict {result['to_dict_ms']:>6.2f} ms (x{result['speedup']:.1f}) | "
+              f"iso + omit_none {result['to_dict_iso_omit_none_ms']:>6.2f} ms | "
+              f"json lines {result['json_lines_ms']:>6.2f} ms")
@@ -0,0 +1,66 @@
+"""
+Per request overhead of the token validity check and of the authorization headers
+
+    $ python -m benchmarks.bench_token
+"""
+import asyncio
+import threading
+import time
+import timeit
+from .stub_server import fake_guest_token, fake_async_guest_token
+
+
+def _per_call(name: str, calls: int, elapsed: float) -> dict:
+    return {
+        "name": name,
+        "calls": calls,
+        "call_ns": elapsed / calls * 1e9,
+        "calls_per_s": calls / elapsed
+    }
+
+
+def _threads(func, threads: int, per_thread: int) -> float:
+    barrier = threading.Barrier(threads + 1)
+
+    def worker():
+        barrier.wait()
+        for _ in range(per_thread):
+            func()
+
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for worker_thread in workers:
+        worker_thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker_thread in workers:
+        worker_thread.join()
+    return time.perf_counter() - start
+
+
+async def _async_check(calls: int) -> float:
+    token = fake_async_guest_token()
+    start = time.perf_counter()
+    for _ in range(calls):
+        await token.check_token()
+    return time.perf_counter() - start
+
+
+def run(calls: int = 100000) -> list[dict]:
+    token = fake_guest_token()
+    results = [
+        _per_call("GuestToken.check_token", calls,
+                  min(timeit.repeat(token.check_token, number=calls, repeat=5))),
+        _per_call("GuestToken.headers", calls,
+                  min(timeit.repeat(lambda: token.headers, number=calls, repeat=5))),
+    ]
+    for threads in (4, 16):
+        results.append(_per_call(f"GuestToken.check_token {threads} threads", calls // threads * threads,
+                                 _threads(token.check_token, threads, calls // threads)))
+    results.append(_per_call("AsyncGuestToken.check_token", calls, asyncio.run(_async_check(calls))))
+    return results
+
+
+if __name__ == "__main__":
+    for result in run():
+        print(f"{result['name']:<36} {result['calls']:>7} calls | "
+              f"{result['call_ns']:>7.0f} ns/call | {result['calls_per_s']:>11.0f} calls/s")
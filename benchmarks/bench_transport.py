@@ -0,0 +1,78 @@
+"""
+Measure the per request latency saved by the shared connection pool against a local stub server
+
+    $ python -m benchmarks.bench_transport
+"""
+import asyncio
+import statistics
+import time
+from circleapi import ApiV2, AsyncApiV2, BeatmapExtended
+from . import payloads
+from .stub_server import StubServer, fake_guest_token
+
+
+def _summary(name: str, samples: list[float]) -> dict:
+    samples.sort()
+    return {
+        "name": name,
+        "requests": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1e3,
+        "p50_ms": samples[len(samples) // 2] * 1e3,
+        "p99_ms": samples[int(len(samples) * 0.99)] * 1e3
+    }
+
+
+def bench_sync(url: str, count: int) -> list[dict]:
+    api = ApiV2(fake_guest_token(), base_url=url)
+
+    # Previous default: a brand-new client (and connection) per request
+    fresh = []
+    for _ in range(count):
+        start = time.perf_counter()
+        with api._create_client() as client:
+            client.get("/beatmaps/53", headers=api.token.headers).raise_for_status()
+        fresh.append(time.perf_counter() - start)
+
+    pooled = []
+    with api:
+        for _ in range(count):
+            start = time.perf_counter()
+            api._get_client().get("/beatmaps/53", headers=api.token.headers).raise_for_status()
+            pooled.append(time.perf_counter() - start)
+
+    return [_summary("sync client per request", fresh), _summary("sync pooled client", pooled)]
+
+
+async def bench_async(url: str, count: int) -> list[dict]:
+    api = AsyncApiV2(fake_guest_token(), base_url=url)
+
+    fresh = []
+    for _ in range(count):
+        start = time.perf_counter()
+        async with api._create_client() as client:
+            (await client.get("/beatmaps/53", headers=api.token.headers)).raise_for_status()
+        fresh.append(time.perf_counter() - start)
+
+    pooled = []
+    async with api:
+        for _ in range(count):
+            start = time.perf_counter()
+            client = await api._get_client()
+            (await client.get("/beatmaps/53", headers=api.token.headers)).raise_for_status()
+            pooled.append(time.perf_counter() - start)
+
+    return [_summary("async client per request", fresh), _summary("async pooled client", pooled)]
+
+
+def run(count: int = 300) -> list[dict]:
+    with StubServer(payloads.beatmap_extended()) as server:
+        # Warm up and sanity check
+        with ApiV2(fake_guest_token(), base_url=server.url) as api:
+            assert isinstance(api.get_beatmap(53), BeatmapExtended)
+        return bench_sync(server.url, count) + asyncio.run(bench_async(server.url, count))
+
+
+if __name__ == "__main__":
+    for result in run():
+        print(f"{result['name']:<28} {result['requests']:>5} req | "
+              f"mean {result['mean_ms']:.3f} ms | p50 {result['p50_ms']:.3f} ms | p99 {result['p99_ms']:.3f} ms")
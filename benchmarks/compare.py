@@ -0,0 +1,96 @@
+"""
+Compare two benchmark result files written by `python -m benchmarks`, exit with status 1 on regressions
+
+    $ python -m benchmarks.compare baseline.json results.json [--threshold 0.1]
+
+Durations and sizes (*_us, *_ms, *_s, *_bytes, ...) are better lower, throughputs (*_per_s, speedup)
+better higher. Other fields and the legacy_* reference implementations are not compared.
+"""
+import argparse
+import json
+import sys
+
+
+_LOWER_IS_BETTER = ("_ns", "_us", "_ms", "_s", "_bytes", "_mb")
+
+
+def direction(metric: str) -> int:
+    """
+    1 if higher is better, -1 if lower is better, 0 if the metric is not compared
+    """
+    if metric.startswith("legacy"):
+        return 0
+    if metric.endswith("_per_s") or metric == "speedup":
+        return 1
+    if metric.endswith(_LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def _entries(results: list[dict]) -> dict[str, dict]:
+    return {str(result.get("name", f"#{index}")): result for index, result in enumerate(results)}
+
+
+def compare(baseline: dict, current: dict, threshold: float = 0.1) -> list[dict]:
+    """
+    Relative change of every compared metric present in both result sets
+    """
+    rows = []
+    for benchmark, results in current["results"].items():
+        base_entries = _entries(baseline["results"].get(benchmark, []))
+        for name, result in _entries(results).items():
+            base = base_entries.get(name)
+            if base is None:
+                continue
+            for metric, value in result.items():
+                sign = direction(metric)
+                base_value = base.get(metric)
+                if not sign or not isinstance(value, (int, float)) or not isinstance(base_value, (int, float)) \
+                        or isinstance(value, bool) or not base_value:
+                    continue
+                change = (value - base_value) / abs(base_value)
+                rows.append({
+                    "benchmark": benchmark,
+                    "name": name,
+                    "metric": metric,
+                    "baseline": base_value,
+                    "current": value,
+                    "change": change,
+                    "regression": change * sign < -threshold,
+                    "improvement": change * sign > threshold
+                })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative change tolerated before reporting a regression (default 0.1)")
+    parser.add_argument("--all", action="store_true", help="also print the metrics within the threshold")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    print(f"baseline {baseline['meta'].get('git_commit')} ({baseline['meta'].get('created_at')}) -> "
+          f"current {current['meta'].get('git_commit')} ({current['meta'].get('created_at')})")
+    rows = compare(baseline, current, args.threshold)
+    for row in rows:
+        if not args.all and not row["regression"] and not row["improvement"]:
+            continue
+        status = "REGRESSION" if row["regression"] else "improved" if row["improvement"] else ""
+        print(f"{row['benchmark']:<10} {row['name']:<40} {row['metric']:<18} "
+              f"{row['baseline']:>12.4g} -> {row['current']:>12.4g} {row['change']:>+8.1%} {status}")
+
+    regressions = sum(row["regression"] for row in rows)
+    print(f"{len(rows)} metrics compared, {regressions} regressions, "
+          f"{sum(row['improvement'] for row in rows)} improvements (threshold {args.threshold:.0%})")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Local stand-in of osu.ppy.sh/api/v2 and /oauth/token serving synthetic payloads, with injected latency,
+server errors and throttling (429 + Retry-After once its own rate limit is exceeded)
+
+    $ python -m benchmarks.fake_server --port 8000 --latency 0.05 --error-rate 0.01 --req-per-minute 1200
+
+Point the clients at it with ApiV2(GuestToken(token_url=server.token_url), base_url=server.api_url)
+"""
+from functools import lru_cache
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+import argparse
+import math
+import random
+import re
+import threading
+import time
+import msgspec
+from . import payloads
+from .stub_server import fake_access_token
+
+
+@lru_cache(maxsize=4096)
+def _beatmap(beatmap_id: int) -> bytes:
+    return payloads.beatmap_extended(beatmap_id, seed=beatmap_id)
+
+
+@lru_cache(maxsize=1024)
+def _beatmaps(ids: tuple[int, ...]) -> bytes:
+    rng = random.Random(0)
+    return msgspec.json.encode({"beatmaps": [payloads.beatmap(rng, beatmap_id) for beatmap_id in ids]})
+
+
+@lru_cache(maxsize=4096)
+def _score(score_id: int) -> bytes:
+    return payloads.score_extended(score_id, seed=score_id)
+
+
+# Payloads depending on the configured size only are generated once
+_beatmap_scores = lru_cache(maxsize=16)(payloads.beatmap_scores)
+_beatmap_user_scores = lru_cache(maxsize=16)(payloads.beatmap_user_scores)
+_beatmap_user_score = lru_cache(maxsize=1)(payloads.beatmap_user_score)
+_beatmap_attributes = lru_cache(maxsize=1)(payloads.beatmap_attributes)
+_user_extended = lru_cache(maxsize=1)(payloads.user_extended)
+
+
+class _Throttle:
+    """
+    Token bucket of the server, one second worth of requests can be burst
+    """
+    def __init__(self, req_per_minute: float):
+        self.rate = req_per_minute / 60
+        self.capacity = max(1.0, self.rate)
+        self.bucket = self.capacity
+        self.last_ts = time.monotonic()
+        self._lock = threading.Lock()
+
+    def take(self) -> tuple[int, float | None]:
+        """
+        Return the remaining requests and, if the request is refused, the seconds to wait
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.bucket = min(self.capacity, self.bucket + (now - self.last_ts) * self.rate)
+            self.last_ts = now
+            if self.bucket < 1:
+                return 0, (1 - self.bucket) / self.rate
+            self.bucket -= 1
+            return int(self.bucket), None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "_Server"
+
+    def _send(self, status: int, body: bytes, headers: dict[str, str] | None = None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _route(self, method: str, path: str, query: dict[str, list[str]]) -> bytes | None:
+        config = self.server.config
+        if method == "GET":
+            if path == "/beatmaps/lookup":
+                return _beatmap(int(query.get("id", ["53"])[0]))
+            if path == "/beatmaps":
+                return _beatmaps(tuple(int(beatmap_id) for beatmap_id in query.get("ids[]", [])))
+            if match := re.fullmatch(r"/beatmaps/(\d+)", path):
+                return _beatmap(int(match[1]))
+            if re.fullmatch(r"/beatmaps/\d+/scores", path):
+                return _beatmap_scores(config.scores)
+            if re.fullmatch(r"/beatmaps/\d+/scores/users/\d+/all", path):
+                return _beatmap_user_scores(config.scores)
+            if re.fullmatch(r"/beatmaps/\d+/scores/users/\d+", path):
+                return _beatmap_user_score()
+            if match := re.fullmatch(r"/scores/\w+/(\d+)", path):
+                return _score(int(match[1]))
+            if re.fullmatch(r"/me/\w*", path):
+                return _user_extended()
+        elif method == "POST" and re.fullmatch(r"/beatmaps/\d+/attributes", path):
+            return _beatmap_attributes()
+        return None
+
+    def _reply(self, method: str):
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            self.rfile.read(length)
+        url = urlsplit(self.path)
+        server = self.server
+        config = server.config
+
+        if url.path == "/_stats":
+            with server.lock:
+                return self._send(200, msgspec.json.encode(server.stats))
+
+        server.count("requests")
+        delay = config.latency + (server.rng.uniform(0, config.jitter) if config.jitter else 0)
+        if delay > 0:
+            time.sleep(delay)
+
+        if method == "POST" and url.path == "/oauth/token":
+            server.count("tokens")
+            return self._send(200, msgspec.json.encode({
+                "token_type": "Bearer", "expires_in": config.token_lifetime,
+                "access_token": fake_access_token(config.token_lifetime), "refresh_token": "fake"
+            }))
+
+        if not url.path.startswith("/api/v2/"):
+            return self._send(404, b'{"error":null}')
+        if not self.headers.get("Authorization", "").startswith("Bearer "):
+            server.count("unauthorized")
+            return self._send(401, b'{"authentication":"basic"}')
+
+        headers = {}
+        if server.throttle:
+            remaining, retry_after = server.throttle.take()
+            headers = {"X-RateLimit-Limit": str(config.req_per_minute), "X-RateLimit-Remaining": str(remaining)}
+            if retry_after is not None:
+                server.count("throttled")
+                return self._send(429, b'{"error":"Too Many Attempts."}',
+                                  headers | {"Retry-After": str(math.ceil(retry_after))})
+        if config.error_rate and server.rng.random() < config.error_rate:
+            server.count("errors")
+            return self._send(server.rng.choice((500, 502, 503)), b'{"error":"Server Error"}', headers)
+
+        body = self._route(method, url.path.removeprefix("/api/v2"), parse_qs(url.query))
+        if body is None:
+            return self._send(404, b'{"error":null}', headers)
+        server.count("ok")
+        self._send(200, body, headers)
+
+    def do_GET(self):
+        self._reply("GET")
+
+    def do_POST(self):
+        self._reply("POST")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeServerConfig(msgspec.Struct, kw_only=True):
+    latency: float = 0.0
+    jitter: float = 0.0
+    error_rate: float = 0.0
+    req_per_minute: float | None = None
+    scores: int = 50
+    token_lifetime: int = 86400
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Accept bursts of connections from hundreds of clients
+    request_queue_size = 1024
+
+    def __init__(self, address: tuple[str, int], config: FakeServerConfig, seed: int):
+        super().__init__(address, _Handler)
+        self.config = config
+        self.throttle = _Throttle(config.req_per_minute) if config.req_per_minute else None
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "tokens": 0, "ok": 0, "throttled": 0, "errors": 0, "unauthorized": 0}
+
+    def count(self, name: str):
+        with self.lock:
+            self.stats[name] += 1
+
+
+class FakeOsuServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, seed: int = 0, **config):
+        """
+        :param config: FakeServerConfig fields: latency and jitter (seconds), error_rate (share of 5xx responses),
+                       req_per_minute (server rate limit, unlimited if None), scores (scores per response),
+                       token_lifetime (seconds)
+        """
+        self.config = FakeServerConfig(**config)
+        self._server = _Server((host, port), self.config, seed)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.url}/api/v2"
+
+    @property
+    def token_url(self) -> str:
+        return f"{self.url}/oauth/token"
+
+    @property
+    def stats(self) -> dict[str, int]:
+        with self._server.lock:
+            return dict(self._server.stats)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.fake_server", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000, help="0 picks a free port")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds waited before each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="maximum random seconds added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 5xx")
+    parser.add_argument("--req-per-minute", type=float, default=None, help="rate limit of the server (429 above)")
+    parser.add_argument("--scores", type=int, default=50, help="scores per score list response")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeOsuServer(
+        args.host, args.port, seed=args.seed, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, req_per_minute=args.req_per_minute, scores=args.scores
+    )
+    # Parsed by the load generator when it starts the server in a child process
+    print(f"Listening on {server.url}", flush=True)
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
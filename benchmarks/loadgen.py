@@ -0,0 +1,214 @@
+"""
+Load generator comparing ApiV2 on N threads with AsyncApiV2 on N coroutines against the fake osu! api
+(benchmarks.fake_server, started in a child process unless --url is given), reports throughput,
+latency percentiles and what the server saw (429s, injected errors)
+
+    $ python -m benchmarks.loadgen --concurrency 16 --requests 1000 --client-rate 1200 \\
+        --latency 0.05 --jitter 0.05 --error-rate 0.01 --server-rate 1200
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import subprocess
+import sys
+import time
+import httpx
+from circleapi import ApiV2, AsyncApiV2, GuestToken, AsyncGuestToken, RetryPolicy
+
+
+ENDPOINTS = ("beatmap", "scores", "beatmaps", "score", "attributes")
+
+
+def calls(endpoint: str, requests: int) -> list[tuple[str, dict]]:
+    """
+    (endpoint name, kwargs) of each request, endpoints are interleaved with "mix"
+    """
+    kinds = itertools.cycle(ENDPOINTS if endpoint == "mix" else (endpoint,))
+    result = []
+    for i, kind in zip(range(requests), kinds):
+        beatmap_id = 1000 + i % 500
+        if kind == "beatmap":
+            result.append(("get_beatmap", {"beatmap_id": beatmap_id}))
+        elif kind == "scores":
+            result.append(("get_beatmap_scores", {"beatmap_id": beatmap_id}))
+        elif kind == "beatmaps":
+            result.append(("get_beatmaps", {"ids": list(range(beatmap_id, beatmap_id + 50))}))
+        elif kind == "score":
+            result.append(("get_score", {"mode": "osu", "score_id": 4_000_000_000 + i}))
+        else:
+            result.append(("get_beatmap_attributes", {"beatmap_id": beatmap_id}))
+    return result
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * q))] * 1e3 if samples else float("nan")
+
+
+def _report(name: str, latencies: list[float], errors: int, elapsed: float, server: dict) -> dict:
+    latencies.sort()
+    done = len(latencies)
+    return {
+        "name": name,
+        "requests": done + errors,
+        "ok": done,
+        "errors": errors,
+        "elapsed_s": elapsed,
+        "req_per_s": done / elapsed,
+        "req_per_min": done / elapsed * 60,
+        "p50_ms": _percentile(latencies, 0.5),
+        "p90_ms": _percentile(latencies, 0.9),
+        "p99_ms": _percentile(latencies, 0.99),
+        "max_ms": latencies[-1] * 1e3 if latencies else float("nan"),
+        "server_requests": server.get("requests", 0),
+        "server_throttled": server.get("throttled", 0),
+        "server_errors": server.get("errors", 0)
+    }
+
+
+def _stats(url: str) -> dict:
+    try:
+        return httpx.get(f"{url}/_stats").json()
+    except (httpx.HTTPError, ValueError):
+        return {}
+
+
+def _diff(before: dict, after: dict) -> dict:
+    return {key: value - before.get(key, 0) for key, value in after.items()}
+
+
+def run_sync(url: str, work: list[tuple[str, dict]], concurrency: int, client_rate: int, retry_policy: RetryPolicy) -> dict:
+    token = GuestToken(1, "secret", token_url=f"{url}/oauth/token")
+    with ApiV2(token, base_url=f"{url}/api/v2", http2=False, coalesce_requests=False,
+               retry_policy=retry_policy, limits=httpx.Limits(max_connections=concurrency)) as api:
+        api.rate_limit.set_rate_limit(client_rate)
+        token.check_token()
+
+        def timed(method: str, **kwargs) -> float:
+            start = time.perf_counter()
+            getattr(api, method)(**kwargs)
+            return time.perf_counter() - start
+
+        before = _stats(url)
+        latencies, errors = [], 0
+        start = time.perf_counter()
+        for result in api.batch(((timed, {"method": method, **kwargs}) for method, kwargs in work),
+                                max_workers=concurrency):
+            if result.error:
+                errors += 1
+            else:
+                latencies.append(result.result)
+        elapsed = time.perf_counter() - start
+        return _report(f"sync {concurrency} threads", latencies, errors, elapsed, _diff(before, _stats(url)))
+
+
+async def run_async(url: str, work: list[tuple[str, dict]], concurrency: int, client_rate: int, retry_policy: RetryPolicy) -> dict:
+    token = AsyncGuestToken(1, "secret", token_url=f"{url}/oauth/token")
+    async with AsyncApiV2(token, base_url=f"{url}/api/v2", http2=False, coalesce_requests=False,
+                          retry_policy=retry_policy, limits=httpx.Limits(max_connections=concurrency)) as api:
+        api.rate_limit.set_rate_limit(client_rate)
+        await token.check_token()
+
+        async def timed(method: str, **kwargs) -> float:
+            start = time.perf_counter()
+            await getattr(api, method)(**kwargs)
+            return time.perf_counter() - start
+
+        before = _stats(url)
+        latencies, errors = [], 0
+        start = time.perf_counter()
+        async for result in api.map_stream(timed, ({"method": method, **kwargs} for method, kwargs in work),
+                                           concurrency=concurrency):
+            if result.error:
+                errors += 1
+            else:
+                latencies.append(result.result)
+        elapsed = time.perf_counter() - start
+        return _report(f"async {concurrency} tasks", latencies, errors, elapsed, _diff(before, _stats(url)))
+
+
+def start_server(**options) -> tuple[subprocess.Popen, str]:
+    """
+    Start benchmarks.fake_server in a child process (no GIL shared with the clients), return it with its url
+    """
+    args = [sys.executable, "-m", "benchmarks.fake_server", "--port", "0"]
+    for key, value in options.items():
+        if value is not None:
+            args += [f"--{key.replace('_', '-')}", str(value)]
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith("Listening on "):
+        process.kill()
+        raise RuntimeError("Fake server failed to start")
+    return process, line.removeprefix("Listening on ").strip()
+
+
+def run(
+        requests: int = 500,
+        concurrency: int = 8,
+        modes: tuple[str, ...] = ("sync", "async"),
+        endpoint: str = "mix",
+        client_rate: int = 1200,
+        url: str | None = None,
+        latency: float = 0.05,
+        jitter: float = 0.05,
+        error_rate: float = 0.01,
+        server_rate: float | None = 1200,
+        scores: int = 50,
+        max_attempts: int = 5) -> list[dict]:
+    process = None
+    if url is None:
+        process, url = start_server(latency=latency, jitter=jitter, error_rate=error_rate,
+                                    req_per_minute=server_rate, scores=scores)
+    retry_policy = RetryPolicy(max_attempts=max_attempts, base_delay=0.1, max_delay=5)
+    work = calls(endpoint, requests)
+    try:
+        results = []
+        for mode in modes:
+            if mode == "sync":
+                results.append(run_sync(url, work, concurrency, client_rate, retry_policy))
+            else:
+                results.append(asyncio.run(run_async(url, work, concurrency, client_rate, retry_policy)))
+        return results
+    finally:
+        if process:
+            process.terminate()
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.loadgen", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500, help="requests per mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="threads (sync) / coroutines (async)")
+    parser.add_argument("--mode", choices=("sync", "async", "both"), default="both")
+    parser.add_argument("--endpoint", choices=ENDPOINTS + ("mix",), default="mix")
+    parser.add_argument("--client-rate", type=int, default=1200, help="client rate limit in requests per minute")
+    parser.add_argument("--url", default=None, help="already running fake server, started in a child process otherwise")
+    parser.add_argument("--latency", type=float, default=0.05, help="server latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="maximum random seconds added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="share of requests answered with a 5xx")
+    parser.add_argument("--server-rate", type=float, default=1200, help="server rate limit in requests per minute, 0 disables it")
+    parser.add_argument("--scores", type=int, default=50, help="scores per score list response")
+    parser.add_argument("--max-attempts", type=int, default=5, help="attempts per request (retries on 429/5xx)")
+    parser.add_argument("-o", "--output", default=None, help="json file the results are written to")
+    args = parser.parse_args()
+
+    results = run(
+        requests=args.requests, concurrency=args.concurrency,
+        modes=("sync", "async") if args.mode == "both" else (args.mode,), endpoint=args.endpoint,
+        client_rate=args.client_rate, url=args.url, latency=args.latency, jitter=args.jitter,
+        error_rate=args.error_rate, server_rate=args.server_rate or None, scores=args.scores,
+        max_attempts=args.max_attempts
+    )
+    for result in results:
+        print(f"{result['name']:<18} {result['ok']:>6}/{result['requests']} ok in {result['elapsed_s']:.1f} s | "
+              f"{result['req_per_min']:>7.0f} req/min | p50 {result['p50_ms']:.1f} ms | p90 {result['p90_ms']:.1f} ms | "
+              f"p99 {result['p99_ms']:.1f} ms | max {result['max_ms']:.1f} ms | "
+              f"server: {result['server_throttled']} x 429, {result['server_errors']} x 5xx")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Synthetic osu! api v2 payloads shaped like recorded responses, used as benchmark fixtures
+"""
+import random
+import msgspec
+
+
+_TS = "2023-01-01T12:00:00+00:00"
+
+
+def covers() -> dict:
+    base = "https://assets.ppy.sh/beatmaps/1/covers/"
+    return {
+        name: f"{base}{name}.jpg"
+        for name in ("cover", "cover@2x", "card", "card@2x", "list", "list@2x", "slimcover", "slimcover@2x")
+    }
+
+
+def user(rng: random.Random, user_id: int) -> dict:
+    return {
+        "avatar_url": f"https://a.ppy.sh/{user_id}",
+        "country_code": rng.choice(["FR", "JP", "US", "KR", "DE"]),
+        "default_group": "default",
+        "id": user_id,
+        "is_active": True,
+        "is_bot": False,
+        "is_deleted": False,
+        "is_online": rng.random() > 0.5,
+        "is_supporter": rng.random() > 0.5,
+        "last_visit": _TS,
+        "pm_friends_only": False,
+        "profile_colour": None,
+        "username": f"player{user_id}",
+        "country": {"code": "FR", "name": "France"},
+        "cover": {"custom_url": None, "url": "https://osu.ppy.sh/images/headers/profile-covers/c1.jpg", "id": "1"},
+    }
+
+
+def beatmapset(rng: random.Random, beatmapset_id: int) -> dict:
+    return {
+        "artist": "Artist",
+        "artist_unicode": "Artist",
+        "covers": covers(),
+        "creator": "mapper",
+        "favourite_count": rng.randint(0, 10000),
+        "hype": None,
+        "id": beatmapset_id,
+        "nsfw": False,
+        "offset": 0,
+        "play_count": rng.randint(0, 10 ** 6),
+        "preview_url": f"//b.ppy.sh/preview/{beatmapset_id}.mp3",
+        "source": "",
+        "spotlight": False,
+        "status": "ranked",
+        "title": "Title",
+        "title_unicode": "Title",
+        "track_id": None,
+        "user_id": 2,
+        "video": False,
+        "bpm": 180.0,
+        "can_be_hyped": False,
+        "deleted_at": None,
+        "discussion_enabled": True,
+        "discussion_locked": False,
+        "is_scoreable": True,
+        "last_updated": _TS,
+        "legacy_thread_url": "https://osu.ppy.sh/community/forums/topics/1",
+        "nominations_summary": {"current": 2, "required": 2},
+        "ranked": 1,
+        "ranked_date": _TS,
+        "storyboard": False,
+        "submitted_date": _TS,
+        "tags": "tag1 tag2 tag3",
+        "availability": {"download_disabled": False, "more_information": None},
+        "ratings": [rng.randint(0, 100) for _ in range(11)],
+    }
+
+
+def beatmap(rng: random.Random, beatmap_id: int, with_beatmapset: bool = True) -> dict:
+    data = {
+        "beatmapset_id": beatmap_id // 10,
+        "difficulty_rating": round(rng.uniform(1, 8), 2),
+        "id": beatmap_id,
+        "mode": "osu",
+        "status": "ranked",
+        "total_length": rng.randint(30, 600),
+        "user_id": 2,
+        "version": "Insane",
+        "accuracy": 7.0,
+        "ar": 9.0,
+        "bpm": 180.0,
+        "convert": False,
+        "count_circles": rng.randint(100, 1000),
+        "count_sliders": rng.randint(100, 1000),
+        "count_spinners": rng.randint(0, 5),
+        "cs": 4.0,
+        "deleted_at": None,
+        "drain": 6.0,
+        "hit_length": rng.randint(30, 600),
+        "is_scoreable": True,
+        "last_updated": _TS,
+        "mode_int": 0,
+        "passcount": rng.randint(0, 10 ** 5),
+        "playcount": rng.randint(0, 10 ** 6),
+        "ranked": 1,
+        "url": f"https://osu.ppy.sh/beatmaps/{beatmap_id}",
+        "checksum": "%032x" % rng.getrandbits(128),
+        "max_combo": rng.randint(100, 2000),
+        "failtimes": {"fail": [0] * 100, "exit": [0] * 100},
+    }
+    if with_beatmapset:
+        data["beatmapset"] = beatmapset(rng, beatmap_id // 10)
+    return data
+
+
+def score(rng: random.Random, score_id: int, with_user: bool = True) -> dict:
+    user_id = rng.randint(1, 10 ** 7)
+    data = {
+        "accuracy": rng.random(),
+        "best_id": score_id,
+        "created_at": _TS,
+        "id": score_id,
+        "max_combo": rng.randint(100, 2000),
+        "mode": "osu",
+        "mode_int": 0,
+        "mods": rng.choice([[], ["HD"], ["HD", "DT"], ["HR"]]),
+        "passed": True,
+        "perfect": False,
+        "pp": rng.uniform(50, 800),
+        "rank": "S",
+        "replay": True,
+        "score": rng.randint(10 ** 5, 10 ** 8),
+        "statistics": {
+            "count_100": rng.randint(0, 50),
+            "count_300": rng.randint(100, 1000),
+            "count_50": rng.randint(0, 10),
+            "count_geki": rng.randint(0, 200),
+            "count_katu": rng.randint(0, 50),
+            "count_miss": rng.randint(0, 5),
+        },
+        "user_id": user_id,
+    }
+    if with_user:
+        data["user"] = user(rng, user_id)
+    return data
+
+
+def beatmap_scores(count: int = 50, seed: int = 0) -> bytes:
+    """
+    Body of a /beatmaps/{beatmap}/scores response
+    """
+    rng = random.Random(seed)
+    return msgspec.json.encode({"scores": [score(rng, 4_000_000_000 + i) for i in range(count)]})
+
+
+def beatmap_extended(beatmap_id: int = 53, seed: int = 0) -> bytes:
+    """
+    Body of a /beatmaps/{beatmap} response
+    """
+    return msgspec.json.encode(beatmap(random.Random(seed), beatmap_id))
+
+
+def beatmaps_extended(count: int = 50, seed: int = 0) -> bytes:
+    """
+    Body of a /beatmaps?ids[]= response
+    """
+    rng = random.Random(seed)
+    return msgspec.json.encode({"beatmaps": [beatmap(rng, 1_000_000 + i) for i in range(count)]})
+
+
+def user_statistics(rng: random.Random) -> dict:
+    return {
+        "count_300": rng.randint(10 ** 5, 10 ** 7),
+        "count_100": rng.randint(10 ** 4, 10 ** 6),
+        "count_50": rng.randint(10 ** 3, 10 ** 5),
+        "count_miss": rng.randint(10 ** 3, 10 ** 5),
+        "level": {"current": rng.randint(1, 120), "progress": rng.randint(0, 99)},
+        "pp": rng.uniform(0, 20000),
+        "ranked_score": rng.randint(10 ** 6, 10 ** 11),
+        "hit_accuracy": rng.uniform(80, 100),
+        "play_count": rng.randint(0, 10 ** 5),
+        "play_time": rng.randint(0, 10 ** 7),
+        "total_score": rng.randint(10 ** 6, 10 ** 12),
+        "total_hits": rng.randint(10 ** 5, 10 ** 7),
+        "maximum_combo": rng.randint(100, 5000),
+        "replays_watched_by_others": rng.randint(0, 10 ** 4),
+        "is_ranked": True,
+        "grade_counts": {"a": rng.randint(0, 5000), "s": rng.randint(0, 5000), "sh": rng.randint(0, 5000),
+                         "ss": rng.randint(0, 500), "ssh": rng.randint(0, 500)},
+        "global_rank": rng.randint(1, 10 ** 6),
+        "country_rank": rng.randint(1, 10 ** 5),
+    }
+
+
+def score_extended(score_id: int = 4_000_000_000, seed: int = 0) -> bytes:
+    """
+    Body of a /scores/{mode}/{score} response
+    """
+    rng = random.Random(seed)
+    data = score(rng, score_id)
+    data["beatmap"] = beatmap(rng, 53)
+    data["rank_global"] = rng.randint(1, 10 ** 6)
+    return msgspec.json.encode(data)
+
+
+def beatmap_user_score(seed: int = 0) -> bytes:
+    """
+    Body of a /beatmaps/{beatmap}/scores/users/{user} response
+    """
+    rng = random.Random(seed)
+    return msgspec.json.encode({"position": rng.randint(1, 1000), "score": score(rng, 4_000_000_000)})
+
+
+def beatmap_user_scores(count: int = 20, seed: int = 0) -> bytes:
+    """
+    Body of a /beatmaps/{beatmap}/scores/users/{user}/all response
+    """
+    rng = random.Random(seed)
+    return msgspec.json.encode({"scores": [score(rng, 4_000_000_000 + i, with_user=False) for i in range(count)]})
+
+
+def beatmap_attributes(seed: int = 0) -> bytes:
+    """
+    Body of a /beatmaps/{beatmap}/attributes response
+    """
+    rng = random.Random(seed)
+    return msgspec.json.encode({"attributes": {
+        "max_combo": rng.randint(100, 2000), "star_rating": rng.uniform(1, 8),
+        "aim_difficulty": rng.uniform(1, 4), "approach_rate": 9.0, "flashlight_difficulty": rng.uniform(1, 4),
+        "overall_difficulty": 8.0, "slider_factor": rng.random(), "speed_difficulty": rng.uniform(1, 4)
+    }})
+
+
+def user_extended(user_id: int = 2, seed: int = 0) -> bytes:
+    """
+    Body of a /users/{user} response
+    """
+    rng = random.Random(seed)
+    data = user(rng, user_id)
+    data.update({
+        "has_supported": True,
+        "join_date": _TS,
+        "kudosu": {"available": rng.randint(0, 100), "total": rng.randint(100, 1000)},
+        "max_blocks": 100,
+        "max_friends": 500,
+        "playmode": "osu",
+        "playstyle": ["mouse", "keyboard"],
+        "post_count": rng.randint(0, 10 ** 4),
+        "profile_order": ["me", "recent_activity", "top_ranks", "medals", "historical", "beatmaps", "kudosu"],
+        "follower_count": rng.randint(0, 10 ** 5),
+        "monthly_playcounts": [{"start_date": f"20{y:02d}-{m:02d}-01", "count": rng.randint(0, 5000)}
+                               for y in range(12, 24) for m in range(1, 13)],
+        "statistics": user_statistics(rng),
+        "rank_history": {"mode": "osu", "data": [rng.randint(1, 10 ** 6) for _ in range(90)]},
+        "previous_usernames": ["old_name"],
+    })
+    return msgspec.json.encode(data)
@@ -0,0 +1,77 @@
+"""
+Minimal local HTTP/1.1 keep-alive server answering every request with a fixed json body
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import base64
+import threading
+import time
+import msgspec
+from circleapi import GuestToken, AsyncGuestToken
+from circleapi.utils import extract_payload_from_token
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def _reply(self):
+        length = int(self.headers.get("Content-Length", 0))
+        if length:
+            self.rfile.read(length)
+        body = self.server.body
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _reply
+    do_POST = _reply
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer:
+    def __init__(self, body: bytes = b"{}", host: str = "127.0.0.1", port: int = 0):
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.body = body
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def fake_access_token(lifetime: int = 86400, scopes: tuple[str, ...] = ("public", "identify")) -> str:
+    """
+    Unsigned jwt-like token accepted by circleapi tokens, for offline use only
+    """
+    now = time.time()
+    payload = {"aud": 1, "jti": "bench", "iat": now, "nbf": now, "exp": now + lifetime, "sub": None, "scopes": list(scopes)}
+    encoded = base64.b64encode(msgspec.json.encode(payload)).decode()
+    return f"e30.{encoded}.sig"
+
+
+def fake_guest_token() -> GuestToken:
+    token = GuestToken()
+    token.access_token = fake_access_token()
+    token.payload = extract_payload_from_token(token.access_token)
+    return token
+
+
+def fake_async_guest_token() -> AsyncGuestToken:
+    token = AsyncGuestToken()
+    token.access_token = fake_access_token()
+    token.payload = extract_payload_from_token(token.access_token)
+    return token
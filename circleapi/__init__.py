@@ -1,12 +1,19 @@
-from .token import UserToken, GuestToken
-from .async_token import AsyncGuestToken, AsyncUserToken
+from .token import UserToken, GuestToken, TokenPool
+from .async_token import AsyncGuestToken, AsyncUserToken, AsyncTokenPool
 from .logger import logger, setup_logging_queue, start_logging
 from .api import ApiV2, ExternalApi
-from .utils import RateLimit, RequestThread, AsyncRateLimit
+from .utils import (
+    RateLimit, RequestThread, AsyncRateLimit, RetryPolicy, CallResult, BeatmapIds, BeatmapIdsCache,
+    BeatmapIdsDiff, diff_sorted_ids, load_ids_snapshot, save_ids_snapshot
+)
 from .async_api import AsyncApiV2, AsyncExternalApi
+from .cache import MemoryCache, SqliteCache, ConditionalCache, DEFAULT_CACHE_TTL
+from .replay import RecordTransport, ReplayTransport, FixtureNotFound
+from .metrics import Metrics, MetricsSink
+from .profiling import RequestTiming, RequestProfiler
 from .models import (
     BeatmapExtended, BeatmapUserScore, BeatmapUserScores,
     BeatmapScores, BeatmapsExtended, BeatmapAttributes,
     Score, BeatmapsetExtended, User, ScoreScope, Ruleset, UserExtended,
-    BaseStruct
+    BaseStruct, projection, compact_type, encode_compact, decode_compact, to_json_lines
 )
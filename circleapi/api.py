@@ -1,52 +1,111 @@
 from .logger import logger
+from .cache import ResponseCache, ConditionalCache, DEFAULT_CACHE_TTL
+from .profiling import RequestTiming, RequestProfiler
+from .metrics import (
+    MetricsSink, REQUESTS, REQUEST_DURATION, RESPONSE_SIZE, RATE_LIMIT_WAIT, TOKEN_REFRESHES, RETRIES, CACHE_HITS
+)
 from .models import (
     BeatmapScores, Ruleset, ScoreScope,
     BeatmapExtended, Mod, BeatmapUserScore,
     BeatmapUserScores, BeatmapsExtended, BeatmapAttributes,
-    Score, UserExtended
+    Score, UserExtended, projection
 )
-from .token import GuestToken, UserToken
-from .utils import RateLimit
-import msgspec
-import time
+from .token import GuestToken, UserToken, TokenPool, PooledToken
+from .utils import (
+    RateLimit, RetryPolicy, CallResult, decode_response, request_key, bulk_fields,
+    parse_retry_after, parse_rate_limit_remaining, request_priority, _request_priority,
+    BeatmapIds, BeatmapIdsCache, BeatmapIdsDiff, diff_sorted_ids, load_ids_snapshot, save_ids_snapshot
+)
+from collections import deque
+from collections.abc import Callable, Hashable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+from typing import Any
+import contextvars
 import threading
+import time
 import httpx
-import random
 
 
 class ApiV2:
-    def __init__(self, token: GuestToken | UserToken):
+    def __init__(
+            self,
+            token: GuestToken | UserToken | TokenPool,
+            limits: httpx.Limits | None = None,
+            http2: bool = True,
+            base_url: str = "https://osu.ppy.sh/api/v2",
+            retry_policy: RetryPolicy | None = None,
+            cache: ResponseCache | None = None,
+            cache_ttl: dict[str, float | None] | None = None,
+            conditional_cache: ConditionalCache | None = None,
+            coalesce_requests: bool = True,
+            tenant_weights: dict[Hashable, float] | None = None,
+            transport: httpx.BaseTransport | None = None,
+            metrics: MetricsSink | None = None,
+            timing_hooks: Iterable[Callable[[RequestTiming], Any]] | None = None,
+            profiler: RequestProfiler | None = None,
+            rate_limit: RateLimit | None = None):
+        """
+        :param transport: custom httpx transport (e.g. circleapi.replay.ReplayTransport), limits and http2 are then ignored
+        :param metrics: sink of the request metrics (e.g. circleapi.metrics.Metrics), nothing is recorded by default
+        :param timing_hooks: functions called with the RequestTiming (phase timestamps) of every call once it is done,
+                             they run on the calling thread and must be fast
+        :param profiler: RequestProfiler sampling requests with cProfile or tracemalloc
+        :param rate_limit: rate limit of a single token, RateLimit(1000) by default, RateLimit(1000, shared_file=...)
+                           shares the budget with every process using the same file (each credential of a TokenPool has its own)
+        """
         self.timeout = httpx.Timeout(20, read=240)
+        self.limits = limits if limits else httpx.Limits(max_connections=100, max_keepalive_connections=20)
+        self.http2 = http2
+        self.base_url = base_url
+        self.retry_policy = retry_policy if retry_policy else RetryPolicy()
+        self.cache = cache
+        self.cache_ttl = DEFAULT_CACHE_TTL | (cache_ttl or {})
+        self.conditional_cache = conditional_cache
+        self.coalesce_requests = coalesce_requests
+        # Share of the rate limit of each tenant while requests are queued, 1 by default
+        self.tenant_weights = tenant_weights if tenant_weights else {}
+        self.transport = transport
+        self.metrics = metrics
+        self.timing_hooks = list(timing_hooks) if timing_hooks else []
+        self.profiler = profiler
         self.token = token
-        self.rate_limit = RateLimit(1000)
-        self._global_client = False
+        # Used by single tokens, each credential of a TokenPool has its own rate limit
+        self.rate_limit = rate_limit if rate_limit else RateLimit(1000)
+        self._client: httpx.Client | None = None
         self._lock = threading.Lock()
-        self._decoder = msgspec.json.Decoder()
-        self._encoder = msgspec.json.Encoder()
+        self._in_flight: dict[tuple, Future] = {}
 
     def _create_client(self) -> httpx.Client:
         return httpx.Client(
             timeout=self.timeout,
-            base_url="https://osu.ppy.sh/api/v2"
+            limits=self.limits,
+            http2=self.http2,
+            base_url=self.base_url,
+            transport=self.transport
         )
 
     def _get_client(self) -> httpx.Client:
-        if not self._global_client:
-            return self._create_client()
-        with self._lock:
-            if self._client.is_closed:
-                self.start_client()
-                logger.warning("ApiV2 pool renewed")
-        return self._client
+        """
+        Return the shared connection pool, lazily (re)created on first use
+        """
+        client = self._client
+        if client is None or client.is_closed:
+            with self._lock:
+                if self._client is None or self._client.is_closed:
+                    if self._client is not None:
+                        logger.warning("ApiV2 pool renewed")
+                    self._client = self._create_client()
+                client = self._client
+        return client
 
     def start_client(self):
-        self._global_client = True
-        self._client = self._create_client().__enter__()
+        self._get_client()
 
     def stop_client(self, exc_type=None, exc_val=None, exc_tb=None):
-        self._global_client = False
-        if not self._client.is_closed:
-            self._client.__exit__(exc_type, exc_val, exc_tb)
+        with self._lock:
+            client, self._client = self._client, None
+        if client is not None and not client.is_closed:
+            client.__exit__(exc_type, exc_val, exc_tb)
 
     def __enter__(self):
         self.start_client()
@@ -55,6 +114,146 @@ class ApiV2:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.stop_client(exc_type, exc_val, exc_tb)
 
+    @staticmethod
+    def priority(priority: int = 0, tenant: Hashable = None):
+        """
+        Context manager setting the priority and tenant of the requests sent within the block,
+        queued requests are served by priority (highest first) then by weighted fair share
+        of their tenant (see tenant_weights)
+
+        with api.priority(10, tenant="interactive"):
+            api.beatmap_lookup(...)
+        """
+        return request_priority(priority, tenant)
+
+    def _select_credential(self) -> PooledToken:
+        """
+        Token and rate limit to use for the next request
+        """
+        if isinstance(self.token, TokenPool):
+            return self.token.select()
+        return PooledToken(self.token, self.rate_limit)
+
+    def _send(
+            self,
+            method: str,
+            url: str,
+            params: dict | str | None = None,
+            json_data: dict | None = None,
+            headers: dict | None = None,
+            endpoint: str | None = None,
+            timing: RequestTiming | None = None) -> httpx.Response:
+        """
+        Send a request, retrying transient failures according to the retry policy
+        """
+        policy = self.retry_policy
+        metrics = self.metrics
+        endpoint = endpoint if endpoint else "other"
+        delay = None
+        token_refreshed = False
+        attempt = 0
+        priority, tenant = _request_priority.get()
+        while True:
+            attempt += 1
+            credential = self._select_credential()
+            token, rate_limit = credential
+
+            # Rate limit check, wait for our turn
+            wait_start = time.monotonic()
+            rate_limit.acquire(priority=priority, tenant=tenant, weight=self.tenant_weights.get(tenant, 1))
+            token_start = time.monotonic()
+            if metrics is not None:
+                metrics.observe(RATE_LIMIT_WAIT, token_start - wait_start, {"endpoint": endpoint})
+
+            # Token validity check
+            if not token.check_token() and metrics is not None:
+                metrics.inc(TOKEN_REFRESHES, {"reason": "expired"})
+
+            send_start = time.monotonic()
+            if timing is not None:
+                timing.add("rate_limit", wait_start, token_start)
+                timing.add("token", token_start, send_start)
+            try:
+                req = self._get_client().request(
+                    method=method,
+                    url=url,
+                    headers=token.headers | headers if headers else token.headers,
+                    params=params,
+                    json=json_data
+                )
+            except httpx.TransportError as exc:
+                if timing is not None:
+                    timing.add("network", send_start, time.monotonic())
+                if metrics is not None:
+                    metrics.inc(REQUESTS, {"endpoint": endpoint, "method": method, "status": "error"})
+                if not policy.retry_transport_errors or attempt >= policy.max_attempts:
+                    raise
+                if metrics is not None:
+                    metrics.inc(RETRIES, {"endpoint": endpoint, "reason": "transport"})
+                delay = policy.next_delay(delay)
+                logger.warning(f"[\033[33mRETRY\033[0m ] {url} {exc!r}, attempt {attempt}, retrying in {delay:.2f}s")
+                backoff_start = time.monotonic()
+                time.sleep(delay)
+                if timing is not None:
+                    timing.add("backoff", backoff_start, time.monotonic())
+                continue
+
+            send_end = time.monotonic()
+            if timing is not None:
+                timing.add("network", send_start, send_end)
+                timing.status_code = req.status_code
+            if metrics is not None:
+                metrics.inc(REQUESTS, {"endpoint": endpoint, "method": method, "status": str(req.status_code)})
+                metrics.observe(REQUEST_DURATION, send_end - send_start, {"endpoint": endpoint})
+                metrics.observe(RESPONSE_SIZE, len(req.content), {"endpoint": endpoint})
+
+            # Let the rate limit know how much we have left
+            retry_after = parse_retry_after(req.headers.get("Retry-After"))
+            rate_limit.throttle(
+                remaining=parse_rate_limit_remaining(req.headers.get("X-RateLimit-Remaining")),
+                retry_after=retry_after
+            )
+
+            if req.status_code == 401 and not token_refreshed:
+                logger.warning(f"[\033[33mRETRY\033[0m ] {url} 401, refreshing token")
+                token_refreshed = True
+                token.check_token(force_refresh=True)
+                if metrics is not None:
+                    metrics.inc(TOKEN_REFRESHES, {"reason": "401"})
+                    metrics.inc(RETRIES, {"endpoint": endpoint, "reason": "401"})
+                continue
+
+            if req.status_code == 429 and isinstance(self.token, TokenPool) and attempt < policy.max_attempts:
+                # Rotate the credential out, retry right away with another one
+                self.token.report_throttled(credential, retry_after)
+                if metrics is not None:
+                    metrics.inc(RETRIES, {"endpoint": endpoint, "reason": "429"})
+                logger.warning(f"[\033[33mRETRY\033[0m ] {url} 429, attempt {attempt}, switching credential")
+                continue
+
+            if req.status_code in policy.status_codes and attempt < policy.max_attempts:
+                if metrics is not None:
+                    metrics.inc(RETRIES, {"endpoint": endpoint, "reason": str(req.status_code)})
+                if retry_after is not None:
+                    # Every caller is already paused until then by the rate limit
+                    delay = retry_after
+                else:
+                    delay = policy.next_delay(delay)
+                logger.warning(f"[\033[33mRETRY\033[0m ] {url} {req.status_code}, attempt {attempt}, retrying in {delay:.2f}s")
+                if retry_after is None and req.status_code == 429:
+                    # Throttled without more details, pause every caller
+                    rate_limit.throttle(retry_after=delay)
+                elif retry_after is None:
+                    backoff_start = time.monotonic()
+                    time.sleep(delay)
+                    if timing is not None:
+                        timing.add("backoff", backoff_start, time.monotonic())
+                continue
+
+            if req.status_code != 304:
+                req.raise_for_status()
+            return req
+
     def _request(
             self,
             method: str,
@@ -63,60 +262,187 @@ class ApiV2:
             json_data: dict | None = None,
             args: dict | None = None,
             as_dict: bool = False,
-            validate_with=None):
-
-        # Rate limit check
-        # Exponential backoff with a bit of randomness
-        rate_limit_hit = 0
-        while self.rate_limit.is_exceeded():
-            sleep_time = min(2 ** rate_limit_hit, 32) + random.randint(0, 1000) / 1000
-            time.sleep(sleep_time)
-            rate_limit_hit += 1
+            validate_with=None,
+            endpoint: str | None = None):
+        hooks = self.timing_hooks
+        profiler = self.profiler
+        if not hooks and profiler is None:
+            return self._call(method, url, params, json_data, args, as_dict, validate_with, endpoint)
+
+        timing = RequestTiming(endpoint, method, url)
+        capture = profiler.start() if profiler is not None else None
+        try:
+            return self._call(method, url, params, json_data, args, as_dict, validate_with, endpoint, timing)
+        except BaseException as exc:
+            timing.error = exc
+            raise
+        finally:
+            if capture is not None:
+                timing.profile = profiler.stop(capture)
+            timing.end = time.monotonic()
+            for hook in hooks:
+                try:
+                    hook(timing)
+                except Exception:
+                    logger.exception("Timing hook failed")
+
+    def _call(
+            self,
+            method: str,
+            url: str,
+            params: dict | str | None,
+            json_data: dict | None,
+            args: dict | None,
+            as_dict: bool,
+            validate_with,
+            endpoint: str | None,
+            timing: RequestTiming | None = None):
+
+        key = request_key(method, url, params, json_data)
+
+        # Cached responses skip both the network and the rate limit
+        if self.cache is not None and endpoint in self.cache_ttl:
+            cache_start = time.monotonic()
+            content = self.cache.get(key)
+            if timing is not None:
+                timing.add("cache", cache_start, time.monotonic())
+            if content is not None:
+                logger.info(f"[\033[36mCACHED\033[0m] {url} {params=} {json_data=}")
+                if self.metrics is not None:
+                    self.metrics.inc(CACHE_HITS, {"endpoint": endpoint, "cache": "response"})
+                return self._decode(content, validate_with, args, as_dict, timing)
+
+        if not self.coalesce_requests:
+            return self._fetch(key, method, url, params, json_data, args, as_dict, validate_with, endpoint, timing)
+
+        # Merge identical in-flight requests into a single network call, every caller gets the same result.
+        # The priority is part of the key, a caller never waits behind a queued request of lower priority
+        flight_key = (key, validate_with, as_dict, _request_priority.get()[0])
+        with self._lock:
+            future = self._in_flight.get(flight_key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[flight_key] = Future()
+        if not leader:
+            wait_start = time.monotonic()
+            try:
+                return future.result()
+            finally:
+                if timing is not None:
+                    timing.add("coalesced", wait_start, time.monotonic())
 
-        # Token validity check
-        self.token.check_token()
+        try:
+            data = self._fetch(key, method, url, params, json_data, args, as_dict, validate_with, endpoint, timing)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(data)
+            return data
+        finally:
+            with self._lock:
+                del self._in_flight[flight_key]
 
-        client = self._get_client()
+    @staticmethod
+    def _decode(content: bytes, validate_with, args: dict | None, as_dict: bool, timing: RequestTiming | None):
+        if timing is None:
+            return decode_response(content, validate_with, args, as_dict)
+        decode_start = time.monotonic()
         try:
-            req = client.request(
-                method=method,
-                url=url,
-                headers=self.token.headers,
-                params=params,
-                json=json_data
-            )
+            return decode_response(content, validate_with, args, as_dict)
         finally:
-            if not self._global_client and not client.is_closed:
-                client.close()
+            timing.add("decode", decode_start, time.monotonic())
 
-        req.raise_for_status()
+    def _fetch(
+            self,
+            key: str,
+            method: str,
+            url: str,
+            params: dict | str | None,
+            json_data: dict | None,
+            args: dict | None,
+            as_dict: bool,
+            validate_with,
+            endpoint: str | None,
+            timing: RequestTiming | None = None):
+
+        # Revalidate what we already have instead of downloading it again
+        conditional_key = None
+        conditional_headers = None
+        if self.conditional_cache is not None:
+            conditional_key = (key, validate_with, as_dict)
+            conditional_headers = self.conditional_cache.get_headers(conditional_key)
+
+        req = self._send(method, url, params, json_data, conditional_headers, endpoint, timing)
+        if req.status_code == 304 and conditional_headers:
+            data = self.conditional_cache.get(conditional_key)
+            if data is not None:
+                logger.info(f"[\033[36m 304  \033[0m] {url} {params=} {json_data=}")
+                if self.metrics is not None:
+                    self.metrics.inc(CACHE_HITS, {"endpoint": endpoint, "cache": "conditional"})
+                return data
+            req.raise_for_status()
         logger.info(f"[  \033[32mOK\033[0m  ] {url} {params=} {json_data=}")
 
-        # Dirty workaround to add some important values that are missing from api responses
-        data: dict = self._decoder.decode(req.content)
-        if args:
-            data.update(args)
-            if validate_with is BeatmapScores:
-                for score in data["scores"]:
-                    score.update(args)
-                if "user_score" in data:
-                    data["user_score"]["score"].update(args)
-            elif validate_with is BeatmapUserScore:
-                data["score"].update(args)
-            elif validate_with is BeatmapUserScores:
-                for score in data["scores"]:
-                    score.update(args)
+        if self.cache is not None and endpoint in self.cache_ttl:
+            self.cache.set(key, req.content, self.cache_ttl[endpoint])
+        data = self._decode(req.content, validate_with, args, as_dict, timing)
+        if conditional_key is not None:
+            self.conditional_cache.set(conditional_key, req.headers, data)
+        return data
 
-        if as_dict:
-            return data
-        else:
-            return msgspec.json.decode(self._encoder.encode(data), type=validate_with, strict=False)
+    def batch(
+            self,
+            calls: Iterable[tuple[str | Callable, dict]],
+            max_workers: int = 4,
+            ordered: bool = False) -> Iterator[CallResult]:
+        """
+        Run (method, kwargs) calls on a bounded pool of worker threads, method being an endpoint name
+        or any callable
+
+        The input is consumed lazily (at most 2 * max_workers calls are queued at once), results
+        (or per-call errors) are yielded in input order if ordered is True, as they complete otherwise
+        """
+        def call(method: str | Callable, kwargs: dict) -> CallResult:
+            if isinstance(method, str):
+                method = getattr(self, method)
+            try:
+                return CallResult(kwargs, method(**kwargs))
+            except Exception as exc:
+                return CallResult(kwargs, error=exc)
+
+        calls = iter(calls)
+        max_pending = max_workers * 2
+        pending = deque()
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            for method, kwargs in calls:
+                # Run in a copy of the caller context to keep its request priority
+                pending.append(executor.submit(contextvars.copy_context().run, call, method, kwargs))
+                # Back-pressure: stop reading the input until a slot is free
+                while len(pending) >= max_pending:
+                    yield from self._pop_completed(pending, ordered)
+            while pending:
+                yield from self._pop_completed(pending, ordered)
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    @staticmethod
+    def _pop_completed(pending: deque[Future], ordered: bool) -> Iterator[CallResult]:
+        if ordered:
+            yield pending.popleft().result()
+            return
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+            yield future.result()
 
     def beatmap_lookup(self,
                        checksum: str | None = None,
                        filename: str | None = None,
                        beatmap_id: int | None = None,
-                       as_dict: bool = False) -> BeatmapExtended:
+                       as_dict: bool = False,
+                       fields: Iterable[str] | None = None) -> BeatmapExtended:
         # https://osu.ppy.sh/docs/index.html#lookup-beatmap
         self.token.has_scope("public", raise_exception=True)
 
@@ -132,9 +458,10 @@ class ApiV2:
             "method": "GET",
             "url": f"/beatmaps/lookup",
             "params": params,
-            "validate_with": BeatmapExtended,
+            "validate_with": projection(BeatmapExtended, fields) if fields else BeatmapExtended,
             "args": params,
-            "as_dict": as_dict
+            "as_dict": as_dict,
+            "endpoint": "beatmap_lookup"
         }
 
         return self._request(**kwargs)
@@ -144,7 +471,8 @@ class ApiV2:
                                user_id: int,
                                mode: Ruleset | None = None,
                                mods: list[Mod] | None = None,
-                               as_dict: bool = False) -> BeatmapUserScore:
+                               as_dict: bool = False,
+                               fields: Iterable[str] | None = None) -> BeatmapUserScore:
         # https://osu.ppy.sh/docs/index.html#get-a-user-beatmap-score
         self.token.has_scope("public", raise_exception=True)
 
@@ -156,9 +484,10 @@ class ApiV2:
             "method": "GET",
             "url": f"/beatmaps/{beatmap_id}/scores/users/{user_id}",
             "params": params,
-            "validate_with": BeatmapUserScore,
+            "validate_with": projection(BeatmapUserScore, fields) if fields else BeatmapUserScore,
             "args": {"args": {"beatmap_id": beatmap_id, "user_id": user_id, **params}, "beatmap_id": beatmap_id},
-            "as_dict": as_dict
+            "as_dict": as_dict,
+            "endpoint": "get_user_beatmap_score"
         }
 
         return self._request(**kwargs)
@@ -167,7 +496,8 @@ class ApiV2:
                                 beatmap_id: int,
                                 user_id: int,
                                 mode: Ruleset | None = None,
-                                as_dict: bool = False) -> BeatmapUserScores:
+                                as_dict: bool = False,
+                                fields: Iterable[str] | None = None) -> BeatmapUserScores:
         # https://osu.ppy.sh/docs/index.html#get-a-user-beatmap-scores
         self.token.has_scope("public", raise_exception=True)
 
@@ -178,9 +508,10 @@ class ApiV2:
             "method": "GET",
             "url": f"/beatmaps/{beatmap_id}/scores/users/{user_id}/all",
             "params": params,
-            "validate_with": BeatmapUserScores,
+            "validate_with": projection(BeatmapUserScores, fields) if fields else BeatmapUserScores,
             "args": {"args": {"beatmap_id": beatmap_id, "user_id": user_id, **params}, "beatmap_id": beatmap_id},
-            "as_dict": as_dict
+            "as_dict": as_dict,
+            "endpoint": "get_user_beatmap_scores"
         }
 
         return self._request(**kwargs)
@@ -190,7 +521,8 @@ class ApiV2:
                            mode: Ruleset | None = None,
                            mods: list[Mod] | None = None,
                            scope: ScoreScope = "global",
-                           as_dict: bool = False) -> BeatmapScores:
+                           as_dict: bool = False,
+                           fields: Iterable[str] | None = None) -> BeatmapScores:
         # https://osu.ppy.sh/docs/index.html#get-beatmap-scores
         self.token.has_scope("public", raise_exception=True)
 
@@ -203,16 +535,18 @@ class ApiV2:
             "method": "GET",
             "url": f"/beatmaps/{beatmap_id}/scores",
             "params": params,
-            "validate_with": BeatmapScores,
+            "validate_with": projection(BeatmapScores, fields) if fields else BeatmapScores,
             "args": {"args": {"beatmap_id": beatmap_id, **params}, "beatmap_id": beatmap_id, "scope": scope},
-            "as_dict": as_dict
+            "as_dict": as_dict,
+            "endpoint": "get_beatmap_scores"
         }
 
         return self._request(**kwargs)
 
     def get_beatmaps(self,
                      ids: list[int],
-                     as_dict: bool = False) -> BeatmapsExtended:
+                     as_dict: bool = False,
+                     fields: Iterable[str] | None = None) -> BeatmapsExtended:
         # https://osu.ppy.sh/docs/index.html#get-beatmaps
         self.token.has_scope("public", raise_exception=True)
 
@@ -221,16 +555,71 @@ class ApiV2:
             "method": "GET",
             "url": f"/beatmaps",
             "params": params,
-            "validate_with": BeatmapsExtended,
+            "validate_with": projection(BeatmapsExtended, fields) if fields else BeatmapsExtended,
             "args": {"args": {"ids": ids}},
-            "as_dict": as_dict
+            "as_dict": as_dict,
+            "endpoint": "get_beatmaps"
         }
 
         return self._request(**kwargs)
 
+    def iter_beatmaps_bulk(self,
+                           ids: Iterable[int],
+                           chunk_size: int = 50,
+                           concurrency: int = 4,
+                           as_dict: bool = False,
+                           fields: Iterable[str] | None = None) -> Iterator[BeatmapsExtended]:
+        """
+        De-duplicate ids, split them in chunks of at most 50 (api limit) and fetch the chunks
+        concurrently, yield results in chunk order
+
+        At most 2 * concurrency chunks are fetched ahead of the consumer
+        """
+        if not 0 < chunk_size <= 50:
+            raise ValueError(f"chunk_size must be between 1 and 50, got {chunk_size}")
+
+        ids = list(dict.fromkeys(ids))
+        fields = tuple(fields) if fields else None
+        context = contextvars.copy_context()
+        max_pending = concurrency * 2
+        pending = deque()
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        try:
+            for index in range(0, len(ids), chunk_size):
+                chunk = ids[index:index + chunk_size]
+                pending.append(executor.submit(context.copy().run, self.get_beatmaps, chunk,
+                                               as_dict=as_dict, fields=fields))
+                # Back-pressure: stop submitting chunks until the consumer catches up
+                while len(pending) >= max_pending:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            executor.shutdown(cancel_futures=True)
+
+    def get_beatmaps_bulk(self,
+                          ids: Iterable[int],
+                          chunk_size: int = 50,
+                          concurrency: int = 4,
+                          as_dict: bool = False,
+                          fields: Iterable[str] | None = None) -> BeatmapsExtended:
+        """
+        Same as get_beatmaps without the 50 ids limit, see iter_beatmaps_bulk
+        """
+        fields = bulk_fields(fields)
+        ids = list(ids)
+        beatmaps = []
+        for chunk in self.iter_beatmaps_bulk(ids, chunk_size, concurrency, as_dict, fields):
+            beatmaps.extend(chunk["beatmaps"] if as_dict else chunk.beatmaps)
+
+        if as_dict:
+            return {"beatmaps": beatmaps, "args": {"ids": ids}}
+        return (projection(BeatmapsExtended, fields) if fields else BeatmapsExtended)(beatmaps=beatmaps)
+
     def get_beatmap(self,
                      beatmap_id: int,
-                     as_dict: bool = False) -> BeatmapExtended:
+                     as_dict: bool = False,
+                     fields: Iterable[str] | None = None) -> BeatmapExtended:
         # https://osu.ppy.sh/docs/index.html#get-beatmap
         self.token.has_scope("public", raise_exception=True)
 
@@ -238,9 +627,10 @@ class ApiV2:
             "method": "GET",
             "url": f"/beatmaps/{beatmap_id}",
             "params": {},
-            "validate_with": BeatmapExtended,
+            "validate_with": projection(BeatmapExtended, fields) if fields else BeatmapExtended,
             "args": {"args": {"beatmap_id": beatmap_id}},
-            "as_dict": as_dict
+            "as_dict": as_dict,
+            "endpoint": "get_beatmap"
         }
 
         return self._request(**kwargs)
@@ -265,7 +655,8 @@ class ApiV2:
             "json_data": params,
             "validate_with": BeatmapAttributes,
             "args": {"args": {"beatmap_id": beatmap_id, **params}, "beatmap_id": beatmap_id},
-            "as_dict": as_dict
+            "as_dict": as_dict,
+            "endpoint": "get_beatmap_attributes"
         }
 
         return self._request(**kwargs)
@@ -273,16 +664,18 @@ class ApiV2:
     def get_score(self,
                   mode: Ruleset,
                   score_id: int,
-                  as_dict: bool = False) -> Score:
+                  as_dict: bool = False,
+                  fields: Iterable[str] | None = None) -> Score:
         # https://osu.ppy.sh/docs/index.html#get-apiv2scoresmodescore
         self.token.has_scope("public", raise_exception=True)
 
         kwargs = {
             "method": "GET",
             "url": f"/scores/{mode}/{score_id}",
-            "validate_with": Score,
+            "validate_with": projection(Score, fields) if fields else Score,
             "args": {"args": {"mode": mode, "score_id": score_id}, "id": score_id},
-            "as_dict": as_dict
+            "as_dict": as_dict,
+            "endpoint": "get_score"
         }
 
         return self._request(**kwargs)
@@ -298,31 +691,59 @@ class ApiV2:
             "url": f"/me/{mode if mode else ''}",
             "validate_with": UserExtended,
             "args": {"args": {"mode": mode}},
-            "as_dict": as_dict
+            "as_dict": as_dict,
+            "endpoint": "get_own_data"
         }
 
         return self._request(**kwargs)
 
 
 class ExternalApi:
-    @staticmethod
-    def get_ranked_ids() -> list[int]:
-        r = httpx.get("https://osu.lea.moe/beatmaps")
-        l = r.json()["ranked"]["beatmaps"]
-        l.sort()
-        return l
-
-    @staticmethod
-    def get_loved_ids() -> list[int]:
-        r = httpx.get("https://osu.lea.moe/beatmaps")
-        l = r.json()["loved"]["beatmaps"]
-        l.sort()
-        return l
-
-    @staticmethod
-    def get_ranked_and_loved_ids() -> list[int]:
-        r = httpx.get("https://osu.lea.moe/beatmaps")
-        data = r.json()
-        l = list(set(data["ranked"]["beatmaps"]) | set(data["loved"]["beatmaps"]))
-        l.sort()
-        return l
\ No newline at end of file
+    """
+    The osu.lea.moe document is fetched once, cached (see BeatmapIdsCache, set
+    ExternalApi.cache = BeatmapIdsCache(filepath) to keep it on disk) and revalidated with
+    a conditional request once older than cache.max_age
+
+    Ids are stored as sorted array('i') (see get_beatmap_ids), the other accessors return lists
+    """
+    url = "https://osu.lea.moe/beatmaps"
+    cache = BeatmapIdsCache()
+    _client: httpx.Client | None = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_beatmap_ids(cls) -> BeatmapIds:
+        with cls._lock:
+            if cls.cache.is_fresh():
+                return cls.cache.ids
+            if cls._client is None or cls._client.is_closed:
+                cls._client = httpx.Client(timeout=httpx.Timeout(20, read=240))
+            r = cls._client.get(cls.url, headers=cls.cache.headers)
+            return cls.cache.update(r)
+
+    @classmethod
+    def get_ranked_ids(cls) -> list[int]:
+        return cls.get_beatmap_ids().ranked.tolist()
+
+    @classmethod
+    def get_loved_ids(cls) -> list[int]:
+        return cls.get_beatmap_ids().loved.tolist()
+
+    @classmethod
+    def get_ranked_and_loved_ids(cls) -> list[int]:
+        return cls.get_beatmap_ids().ranked_and_loved.tolist()
+
+    @classmethod
+    def get_ranked_and_loved_diff(cls, snapshot_filepath: str, update_snapshot: bool = True) -> BeatmapIdsDiff:
+        """
+        Return the ranked and loved ids added/removed since the snapshot saved in snapshot_filepath
+        (everything is added on the first run)
+
+        With update_snapshot=False the snapshot is left untouched, save diff.current with
+        save_ids_snapshot once the delta has been processed
+        """
+        current = cls.get_beatmap_ids().ranked_and_loved
+        diff = diff_sorted_ids(load_ids_snapshot(snapshot_filepath), current)
+        if update_snapshot:
+            save_ids_snapshot(snapshot_filepath, current)
+        return diff
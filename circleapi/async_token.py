@@ -1,29 +1,112 @@
 from .logger import logger
 from .models import TokenPayload, ApiScope
-from .utils import InvalidApiScope, extract_payload_from_token
+from .utils import InvalidApiScope, FileLock, AsyncRateLimit, TokenSnapshot, extract_payload_from_token
+from typing import NamedTuple
+import abc
+import contextlib
 import httpx
 import time
 import socket
 import asyncio
+import threading
 
 
-class AsyncGuestToken:
+class AsyncBaseToken(abc.ABC):
+    """
+    The token state is kept in an immutable snapshot replaced as a whole on refresh,
+    checking a valid token or reading its headers is a lock-free read
+    """
+    # Refresh the access token once it expires within this many seconds
+    refresh_margin = 3600
+    _snapshot: TokenSnapshot
+
+    @property
+    def access_token(self) -> str | None:
+        return self._snapshot.access_token
+
+    @access_token.setter
+    def access_token(self, access_token: str | None):
+        self._snapshot = TokenSnapshot.create(access_token, self._snapshot.payload)
+
+    @property
+    def payload(self) -> TokenPayload | None:
+        return self._snapshot.payload
+
+    @payload.setter
+    def payload(self, payload: TokenPayload | None):
+        self._snapshot = TokenSnapshot.create(self._snapshot.access_token, payload)
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return self._snapshot.headers
+
+    @abc.abstractmethod
+    async def check_token(self, force_refresh=False) -> bool:
+        ...
+
+    def start_auto_refresh(self, ahead: float = 60):
+        """
+        Refresh the token in a background task `ahead` seconds before check_token would
+        (halfway through the lifetime of short-lived tokens), so requests never wait for a refresh.
+        Must be called from a running event loop
+        """
+        if getattr(self, "_refresh_task", None) and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.get_running_loop().create_task(self._auto_refresh(ahead))
+
+    async def stop_auto_refresh(self):
+        if getattr(self, "_refresh_task", None):
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def _auto_refresh(self, ahead: float):
+        while True:
+            delay = self._snapshot.refresh_delay(self.refresh_margin + ahead)
+            await asyncio.sleep(delay)
+            try:
+                await self.check_token(force_refresh=True)
+            except Exception:
+                logger.exception("Background token refresh failed, retrying in 30s")
+                await asyncio.sleep(30)
+
+
+class AsyncGuestToken(AsyncBaseToken):
     def __init__(
             self,
             client_id: int | None = None,
             client_secret: str | None = None,
             payload: TokenPayload | None = None,
-            filepath: str | None = None):
+            filepath: str | None = None,
+            shared: bool = False,
+            transport: httpx.AsyncBaseTransport | None = None,
+            token_url: str = "https://osu.ppy.sh/oauth/token"):
+        """
+        :param shared: the token file is shared by several processes, refreshes are done
+                       under a file lock and a token refreshed by another process is reused
+        :param transport: custom httpx transport used to request tokens
+        :param token_url: oauth token endpoint, to use a local stand-in of the api
+        """
+        if shared and not filepath:
+            raise ValueError("A shared token needs a filepath")
         self.client_id = client_id
         self.client_secret = client_secret
-        self.payload = payload
-        self.access_token = None
+        self._snapshot = TokenSnapshot.create(None, payload)
         self._file = None
+        self._file_lock = FileLock(f"{filepath}.lock") if shared else None
+        # FileLock isn't reentrant, a cancelled acquire may still be pending in its worker thread
+        self._file_thread_lock = threading.Lock()
+        self.transport = transport
+        self.token_url = token_url
         self._lock = asyncio.Lock()
 
         if filepath:
             try:
-                self.load_from_file(filepath, enable_auto_update=True)
+                with self._file_lock if shared else contextlib.nullcontext():
+                    self.load_from_file(filepath, enable_auto_update=True)
             except FileNotFoundError:
                 logger.warning("Loading token from file failed: file does not exist")
 
@@ -46,8 +129,7 @@ class AsyncGuestToken:
             if len(lines) != 1:
                 raise ValueError("Invalid file format")
             access_token = lines[0].strip()
-        self.access_token = access_token
-        self.payload = extract_payload_from_token(self.access_token)
+        self._snapshot = TokenSnapshot.create(access_token, extract_payload_from_token(access_token))
 
     def export_to_file(self, filename: str, enable_auto_update: bool = False):
         if enable_auto_update:
@@ -62,19 +144,82 @@ class AsyncGuestToken:
 
         :return:
         """
+        # Lock-free fast path
+        if not force_refresh and self._snapshot.is_valid(self.refresh_margin):
+            return True
+
         async with self._lock:
             if not self.access_token \
                     or not self.payload \
-                    or time.time() > self.payload.exp - 3600 \
+                    or time.time() > self.payload.exp - self.refresh_margin \
                     or force_refresh:
-                logger.info(f"Refreshing guest token ... | {force_refresh=} {time.time()}:{self.payload.exp - 3600 if self.payload else 0}")
-                await self._request_token()
-                if self._file:
-                    self.export_to_file(self._file)
-                logger.info("Guest token refreshed")
+                if self._file_lock:
+                    await self._acquire_file_lock()
+                try:
+                    if self._file_lock and self._load_shared_token(force_refresh):
+                        logger.info("Guest token refreshed by another process")
+                        return False
+                    logger.info(f"Refreshing guest token ... | {force_refresh=} {time.time()}:{self.payload.exp - self.refresh_margin if self.payload else 0}")
+                    await self._request_token()
+                    if self._file:
+                        self.export_to_file(self._file)
+                    logger.info("Guest token refreshed")
+                finally:
+                    if self._file_lock:
+                        self._release_file_lock()
                 return False
             return True
 
+    async def _acquire_file_lock(self):
+        """
+        Take the cross-process lock in a worker thread, if the caller is cancelled while waiting
+        the thread releases the lock as soon as it gets it
+        """
+        guard = threading.Lock()
+        state = {"acquired": False, "cancelled": False}
+
+        def acquire():
+            self._file_thread_lock.acquire()
+            try:
+                self._file_lock.acquire()
+            except BaseException:
+                self._file_thread_lock.release()
+                raise
+            with guard:
+                if state["cancelled"]:
+                    self._release_file_lock()
+                else:
+                    state["acquired"] = True
+
+        try:
+            await asyncio.to_thread(acquire)
+        except BaseException:
+            with guard:
+                state["cancelled"] = True
+                if state["acquired"]:
+                    self._release_file_lock()
+            raise
+
+    def _release_file_lock(self):
+        self._file_lock.release()
+        self._file_thread_lock.release()
+
+    def _load_shared_token(self, force_refresh: bool = False) -> bool:
+        """
+        Adopt the token stored by another process, return False if it must be refreshed anyway
+        """
+        try:
+            with open(self._file, "r") as f:
+                access_token = f.read().strip()
+            snapshot = TokenSnapshot.create(access_token, extract_payload_from_token(access_token))
+        except (OSError, ValueError, IndexError, TypeError):
+            return False
+        if not snapshot.is_valid(self.refresh_margin) \
+                or (force_refresh and snapshot.access_token == self.access_token):
+            return False
+        self._snapshot = snapshot
+        return True
+
     async def _request_token(self):
         """
         Request an access token from osu! api with the provided client_id and client_secret
@@ -87,33 +232,27 @@ class AsyncGuestToken:
             'grant_type': 'client_credentials',
             'scope': 'public'
         }
-        async with httpx.AsyncClient() as client:
-            req = await client.post('https://osu.ppy.sh/oauth/token', data=post_data)
+        async with httpx.AsyncClient(transport=self.transport) as client:
+            req = await client.post(self.token_url, data=post_data)
         req.raise_for_status()
         res = req.json()
-        self.access_token = res["access_token"]
-        self.payload = extract_payload_from_token(self.access_token)
+        self._snapshot = TokenSnapshot.create(res["access_token"], extract_payload_from_token(res["access_token"]))
 
-    @property
-    def headers(self):
-        return {
-            "Authorization": f"Bearer {self.access_token}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
 
-
-class AsyncUserToken:
+class AsyncUserToken(AsyncBaseToken):
     def __init__(self,
                  client_id: int | None = None,
                  client_secret: str | None = None,
                  payload: TokenPayload | None = None,
-                 filepath: str | None = None):
+                 filepath: str | None = None,
+                 transport: httpx.AsyncBaseTransport | None = None,
+                 token_url: str = "https://osu.ppy.sh/oauth/token"):
         self.client_id = client_id
         self.client_secret = client_secret
-        self.payload = payload
-        self.access_token = None
+        self._snapshot = TokenSnapshot.create(None, payload)
         self.refresh_token = None
+        self.transport = transport
+        self.token_url = token_url
         self._file = None
         self._lock = asyncio.Lock()
 
@@ -159,6 +298,11 @@ class AsyncUserToken:
         :return:
         """
 
+        # Lock-free fast path
+        if not force_renew and not force_refresh and self.refresh_token \
+                and self._snapshot.is_valid(self.refresh_margin):
+            return True
+
         async with self._lock:
             if not self.access_token or not self.refresh_token or not self.payload or force_renew:
                 logger.info(f"Manually renewing user token ...")
@@ -168,8 +312,8 @@ class AsyncUserToken:
                 logger.info(f"Manually renewed user token")
                 return False
 
-            if time.time() > self.payload.exp - 3600 or force_refresh:
-                logger.info(f"Refreshing user token ... | {force_refresh=} {time.time()}:{self.payload.exp - 3600}")
+            if time.time() > self.payload.exp - self.refresh_margin or force_refresh:
+                logger.info(f"Refreshing user token ... | {force_refresh=} {time.time()}:{self.payload.exp - self.refresh_margin}")
                 await self._refresh_token()
                 if self._file:
                     self.export_to_file(self._file)
@@ -185,8 +329,8 @@ class AsyncUserToken:
             "grant_type": "refresh_token"
         }
 
-        async with httpx.AsyncClient() as client:
-            req = await client.post('https://osu.ppy.sh/oauth/token', data=post_data)
+        async with httpx.AsyncClient(transport=self.transport) as client:
+            req = await client.post(self.token_url, data=post_data)
         req.raise_for_status()
         res = req.json()
         self._update_token_info(res["access_token"], res["refresh_token"])
@@ -229,8 +373,8 @@ class AsyncUserToken:
             'redirect_uri': 'http://127.0.0.1/api'
         }
 
-        async with httpx.AsyncClient() as client:
-            req = await client.post('https://osu.ppy.sh/oauth/token', data=post_data)
+        async with httpx.AsyncClient(transport=self.transport) as client:
+            req = await client.post(self.token_url, data=post_data)
         req.raise_for_status()
         res = req.json()
         self._update_token_info(res["access_token"], res["refresh_token"])
@@ -244,14 +388,71 @@ class AsyncUserToken:
         :return:
         """
 
-        self.access_token = access_token
         self.refresh_token = refresh_token
-        self.payload = extract_payload_from_token(access_token)
+        self._snapshot = TokenSnapshot.create(access_token, extract_payload_from_token(access_token))
 
-    @property
-    def headers(self):
-        return {
-            "Authorization": f"Bearer {self.access_token}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
+
+class AsyncPooledToken(NamedTuple):
+    token: AsyncGuestToken | AsyncUserToken
+    rate_limit: AsyncRateLimit
+
+
+class AsyncTokenPool:
+    """
+    Several credentials, each with its own token and rate limit,
+    requests are scheduled to the least loaded one
+    """
+    def __init__(
+            self,
+            tokens: list[AsyncGuestToken | AsyncUserToken],
+            req_per_minute: int = 1000,
+            cooldown: float = 60,
+            rate_limits: list[AsyncRateLimit] | None = None):
+        """
+        :param tokens: one token per client
+        :param req_per_minute: rate limit of each client
+        :param cooldown: seconds a client is left out after a 429 without Retry-After
+        :param rate_limits: one rate limit per token instead of AsyncRateLimit(req_per_minute), e.g.
+                            AsyncRateLimit(1000, shared_file=f"ratelimit_{client_id}") to share each budget between processes
+        """
+        if not tokens:
+            raise ValueError("AsyncTokenPool needs at least one token")
+        if rate_limits is None:
+            rate_limits = [AsyncRateLimit(req_per_minute) for _ in tokens]
+        elif len(rate_limits) != len(tokens):
+            raise ValueError(f"Got {len(rate_limits)} rate limits for {len(tokens)} tokens")
+        self.cooldown = cooldown
+        self.credentials = [AsyncPooledToken(token, rate_limit) for token, rate_limit in zip(tokens, rate_limits)]
+
+    @classmethod
+    def from_credentials(
+            cls,
+            credentials: list[tuple[int, str]],
+            transport: httpx.AsyncBaseTransport | None = None,
+            **kwargs) -> "AsyncTokenPool":
+        """
+        Create a pool of guest tokens from (client_id, client_secret) pairs
+        """
+        return cls([AsyncGuestToken(client_id, client_secret, transport=transport)
+                    for client_id, client_secret in credentials], **kwargs)
+
+    def __len__(self):
+        return len(self.credentials)
+
+    def select(self) -> AsyncPooledToken:
+        """
+        Return the credential that would serve a new request the soonest
+        """
+        return min(self.credentials, key=lambda c: (c.rate_limit.wait_time(), -c.rate_limit.bucket))
+
+    def report_throttled(self, credential: AsyncPooledToken, retry_after: float | None = None):
+        """
+        Leave a credential out until its rate limit is lifted
+        """
+        credential.rate_limit.throttle(retry_after=retry_after if retry_after else self.cooldown)
+
+    async def has_scope(self, scope: ApiScope, raise_exception: bool = False) -> bool:
+        for credential in self.credentials:
+            if not await credential.token.has_scope(scope, raise_exception):
+                return False
+        return True
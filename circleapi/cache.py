@@ -0,0 +1,188 @@
+from collections import OrderedDict
+from collections.abc import Hashable, Mapping
+from typing import Any, Protocol
+import sqlite3
+import threading
+import time
+
+
+# Default time to live (seconds) of cached responses per endpoint, None never expires
+# Endpoints missing from the mapping are never cached
+DEFAULT_CACHE_TTL: dict[str, float | None] = {
+    "beatmap_lookup": 3600,
+    "get_beatmap": 3600,
+    "get_beatmaps": 3600,
+    "get_beatmap_attributes": 86400
+}
+
+
+class ResponseCache(Protocol):
+    hits: int
+    misses: int
+
+    def get(self, key: str) -> bytes | None:
+        ...
+
+    def set(self, key: str, value: bytes, ttl: float | None = None):
+        ...
+
+    def clear(self):
+        ...
+
+
+class MemoryCache:
+    """
+    In-memory LRU cache of raw response bodies
+    """
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[str, tuple[float | None, bytes]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or (item[0] is not None and item[0] < time.time()):
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: str, value: bytes, ttl: float | None = None):
+        with self._lock:
+            self._data[key] = (None if ttl is None else time.time() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SqliteCache:
+    """
+    On-disk LRU cache of raw response bodies, can be shared between runs
+    """
+    def __init__(self, filepath: str, maxsize: int | None = None):
+        self.filepath = filepath
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(filepath, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, expires_at REAL, accessed_at REAL NOT NULL, value BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, key: str) -> bytes | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at, value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (row[0] is not None and row[0] < now):
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.misses += 1
+                return None
+            if self.maxsize:
+                self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[1]
+
+    def set(self, key: str, value: bytes, ttl: float | None = None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, expires_at, accessed_at, value) VALUES (?, ?, ?, ?)",
+                (key, None if ttl is None else now + ttl, now, value)
+            )
+            if self.maxsize:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN ("
+                    "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.maxsize,)
+                )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ConditionalCache:
+    """
+    Remember the validators (ETag / Last-Modified) and the decoded object of the last response
+    per request, so unchanged data can be revalidated instead of downloaded and decoded again
+
+    Objects returned on a 304 are the very same instances that were returned previously
+    """
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[dict[str, str], Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get_headers(self, key: Hashable) -> dict[str, str] | None:
+        """
+        Return the conditional headers to send for this request, if any
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            self._data.move_to_end(key)
+            return item[0]
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Return the object previously decoded for this request (server answered 304)
+        """
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, response_headers: Mapping[str, str], data: Any):
+        headers = {}
+        if etag := response_headers.get("ETag"):
+            headers["If-None-Match"] = etag
+        if last_modified := response_headers.get("Last-Modified"):
+            headers["If-Modified-Since"] = last_modified
+
+        with self._lock:
+            if not headers:
+                self._data.pop(key, None)
+                return
+            self._data[key] = (headers, data)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
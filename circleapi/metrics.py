@@ -0,0 +1,153 @@
+from bisect import bisect_left
+from collections.abc import Mapping
+from typing import NamedTuple, Protocol
+import threading
+
+
+# Metrics recorded by ApiV2 / AsyncApiV2 when a sink is given
+REQUESTS = "circleapi_requests_total"
+REQUEST_DURATION = "circleapi_request_duration_seconds"
+RESPONSE_SIZE = "circleapi_response_size_bytes"
+RATE_LIMIT_WAIT = "circleapi_rate_limit_wait_seconds"
+TOKEN_REFRESHES = "circleapi_token_refreshes_total"
+RETRIES = "circleapi_retries_total"
+CACHE_HITS = "circleapi_cache_hits_total"
+
+_HELP = {
+    REQUESTS: "HTTP requests sent, by endpoint, method and status code (error on transport failures)",
+    REQUEST_DURATION: "Network round trip of each HTTP request",
+    RESPONSE_SIZE: "Size of the response bodies",
+    RATE_LIMIT_WAIT: "Time spent waiting for the rate limit before each HTTP request",
+    TOKEN_REFRESHES: "Access token refreshes triggered by requests",
+    RETRIES: "Retried HTTP requests, by endpoint and reason",
+    CACHE_HITS: "Calls answered without downloading the response, by endpoint and cache"
+}
+
+DEFAULT_BUCKETS: dict[str, tuple[float, ...]] = {
+    REQUEST_DURATION: (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    RESPONSE_SIZE: (1e3, 4e3, 16e3, 64e3, 256e3, 1e6, 4e6, 16e6),
+    RATE_LIMIT_WAIT: (0.001, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60)
+}
+# Histograms missing from the buckets mapping
+_SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class MetricsSink(Protocol):
+    def inc(self, name: str, labels: Mapping[str, str] | None = None, value: float = 1):
+        ...
+
+    def observe(self, name: str, value: float, labels: Mapping[str, str] | None = None):
+        ...
+
+
+class Histogram(NamedTuple):
+    buckets: tuple[float, ...]
+    # Observations per bucket (not cumulative), the last one is +Inf
+    counts: tuple[int, ...]
+    sum: float
+    count: int
+
+
+def _labels_key(labels: Mapping[str, str] | None) -> tuple[tuple[str, str], ...]:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: tuple[tuple[str, str], ...], extra: str = "") -> str:
+    parts = [f'{key}="{_escape(str(value))}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metrics:
+    """
+    In-memory counters and histograms, rendered in the Prometheus text exposition format
+    """
+    def __init__(self, buckets: dict[str, tuple[float, ...]] | None = None):
+        """
+        :param buckets: upper bounds of the buckets per histogram name, merged with DEFAULT_BUCKETS
+        """
+        self.buckets = DEFAULT_BUCKETS | (buckets or {})
+        self._counters: dict[str, dict[tuple, float]] = {}
+        # name -> labels -> [counts per bucket..., +Inf count, sum]
+        self._histograms: dict[str, dict[tuple, list]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, labels: Mapping[str, str] | None = None, value: float = 1):
+        key = _labels_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, labels: Mapping[str, str] | None = None):
+        key = _labels_key(labels)
+        buckets = self.buckets.get(name, _SECONDS_BUCKETS)
+        index = bisect_left(buckets, value)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            values = series.get(key)
+            if values is None:
+                values = series[key] = [0] * (len(buckets) + 1) + [0.0]
+            values[index] += 1
+            values[-1] += value
+
+    def get(self, name: str, labels: Mapping[str, str] | None = None) -> float | Histogram | None:
+        """
+        Value of a counter or snapshot of a histogram, None if nothing was recorded
+        """
+        key = _labels_key(labels)
+        with self._lock:
+            if name in self._counters:
+                return self._counters[name].get(key)
+            values = self._histograms.get(name, {}).get(key)
+            if values is None:
+                return None
+            counts = tuple(values[:-1])
+            return Histogram(self.buckets.get(name, _SECONDS_BUCKETS), counts, values[-1], sum(counts))
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        """
+        Prometheus text exposition format (version 0.0.4)
+        """
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {key: list(values) for key, values in series.items()}
+                          for name, series in self._histograms.items()}
+
+        lines = []
+        for name, series in sorted(counters.items()):
+            if name in _HELP:
+                lines.append(f"# HELP {name} {_HELP[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+        for name, series in sorted(histograms.items()):
+            if name in _HELP:
+                lines.append(f"# HELP {name} {_HELP[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            bounds = self.buckets.get(name, _SECONDS_BUCKETS) + (float("inf"),)
+            for key, values in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(bounds, values[:-1]):
+                    cumulative += count
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{name}_bucket{_format_labels(key, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(values[-1])}")
+                lines.append(f"{name}_count{_format_labels(key)} {cumulative}")
+        return "\n".join(lines) + "\n" if lines else ""
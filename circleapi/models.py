@@ -1,7 +1,14 @@
 from __future__ import annotations
-from enum import IntEnum
-from typing import Literal
+from collections.abc import Iterable, Iterator
+from enum import Enum, IntEnum
+from functools import lru_cache
+from itertools import islice
+from typing import ForwardRef, Literal, NamedTuple, Union, get_args, get_origin
 from datetime import datetime
+import os
+import sys
+import threading
+import types
 import msgspec
 
 
@@ -47,22 +54,236 @@ class RulesetInt(IntEnum):
     MANIA = 3
 
 
-class BaseStruct(msgspec.Struct):
+# Opt-in compact mode: models are not tracked by the garbage collector, which removes long GC pauses
+# when millions of them are kept in memory. Only safe as long as models never end up in reference cycles
+COMPACT = os.environ.get("CIRCLEAPI_COMPACT", "").lower() in ("1", "true", "yes")
+
+
+_lines_encoder = msgspec.json.Encoder()
+
+
+class BaseStruct(msgspec.Struct, gc=not COMPACT):
     def __hash__(self):
-        return hash(self.__repr__())
-
-    def to_dict(self) -> dict:
-        def _recursive_to_dict(data: msgspec.Struct) -> dict:
-            new_dict = msgspec.structs.asdict(data)
-            for key in new_dict:
-                if isinstance(new_dict[key], msgspec.Struct):
-                    new_dict[key] = _recursive_to_dict(new_dict[key])
-                elif isinstance(new_dict[key], list):
-                    for index, value in enumerate(new_dict[key]):
-                        if isinstance(value, msgspec.Struct):
-                            new_dict[key][index] = _recursive_to_dict(value)
-            return new_dict
-        return _recursive_to_dict(self)
+        # Hash the natural key when there is one, equal objects always share it
+        try:
+            return hash((type(self), self.id))
+        except AttributeError:
+            pass
+        # Field values rather than their encoding: 0.0 == -0.0 and datetimes of the same instant
+        # in different timezones are equal, and already hash equally
+        values = msgspec.structs.astuple(self)
+        try:
+            return hash((type(self), values))
+        except TypeError:
+            # Lists, dicts or plain structs among the values
+            return hash((type(self), _hashable(values)))
+
+    def to_dict(
+            self,
+            datetime_format: Literal["datetime", "iso"] = "datetime",
+            omit_none: bool = False,
+            by_alias: bool = False) -> dict:
+        """
+        Convert to builtin types (dict, list, str, int, float, bool, None), keys are the field names
+
+        :param datetime_format: keep datetime objects or convert them to iso 8601 strings
+        :param omit_none: drop the fields set to None
+        :param by_alias: key by the names used by the api (Covers.cover_2x is cover@2x) and convert
+                         enums to their values, the same as as_dict=True
+        """
+        if datetime_format not in ("datetime", "iso"):
+            raise ValueError(f"Unknown datetime format: {datetime_format}")
+        builtin_types = (datetime,) if datetime_format == "datetime" else ()
+        if type(self).__struct_config__.array_like:
+            # msgspec would convert compact types to lists
+            data = _to_builtins(self, builtin_types, by_alias)
+        else:
+            data = msgspec.to_builtins(self, builtin_types=builtin_types)
+            if not by_alias:
+                data = _restore_fields(data, type(self))
+        return _drop_none(data) if omit_none else data
+
+
+def _hashable(value):
+    """
+    Hashable equivalent of a field value, containers are converted recursively
+    """
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, dict):
+        return frozenset((key, _hashable(item)) for key, item in value.items())
+    if isinstance(value, set):
+        return frozenset(value)
+    if isinstance(value, msgspec.Struct) and not isinstance(value, BaseStruct):
+        return type(value), _hashable(msgspec.structs.astuple(value))
+    return value
+
+
+def to_json_lines(items: Iterable[msgspec.Struct], chunk_size: int = 1000) -> Iterator[bytes]:
+    """
+    Encode structs as json lines, yield chunks of at most chunk_size lines
+
+    with open("scores.jsonl", "wb") as f:
+        f.writelines(to_json_lines(scores))
+    """
+    iterator = iter(items)
+    while chunk := list(islice(iterator, chunk_size)):
+        yield _lines_encoder.encode_lines(chunk)
+
+
+def _to_builtins(value, builtin_types: tuple[type, ...], by_alias: bool):
+    if isinstance(value, msgspec.Struct):
+        names = value.__struct_encode_fields__ if by_alias else value.__struct_fields__
+        return {
+            name: _to_builtins(item, builtin_types, by_alias)
+            for name, item in zip(names, msgspec.structs.astuple(value))
+        }
+    if isinstance(value, list):
+        return [_to_builtins(item, builtin_types, by_alias) for item in value]
+    if isinstance(value, dict):
+        return {key: _to_builtins(item, builtin_types, by_alias) for key, item in value.items()}
+    if isinstance(value, Enum) and not by_alias:
+        return value
+    return msgspec.to_builtins(value, builtin_types=builtin_types)
+
+
+class _FieldsPlan(NamedTuple):
+    """
+    What msgspec.to_builtins changed in the output of a struct type: keys renamed for the api,
+    enums converted to their values, and fields holding structs (alone, in a list or in a dict) that
+    need the same repairs
+    """
+    renames: dict[str, str]
+    enums: tuple[tuple[str, type[Enum]], ...]
+    nested: tuple[tuple[str, type[msgspec.Struct], str], ...]
+
+
+# Struct type -> plan, None when to_builtins output needs no repair
+_fields_plans: dict[type, _FieldsPlan | None] = {}
+_fields_plans_lock = threading.Lock()
+
+
+def _field_kind(field_type) -> tuple[str, type] | None:
+    """
+    ("enum", type), ("struct" | "list" | "dict", struct type) or None for a field type
+    """
+    def strip_optional(annotation):
+        if get_origin(annotation) in (Union, types.UnionType):
+            members = [arg for arg in get_args(annotation) if arg is not type(None)]
+            return members[0] if len(members) == 1 else None
+        return annotation
+
+    field_type = strip_optional(field_type)
+    if isinstance(field_type, type):
+        if issubclass(field_type, Enum):
+            return "enum", field_type
+        if issubclass(field_type, msgspec.Struct):
+            return "struct", field_type
+        return None
+    origin = get_origin(field_type)
+    if origin in (list, dict):
+        item_type = strip_optional(get_args(field_type)[-1])
+        if isinstance(item_type, type) and issubclass(item_type, msgspec.Struct):
+            return origin.__name__, item_type
+    return None
+
+
+def _build_fields_plans(model: type[msgspec.Struct]):
+    # Every struct type reachable from model, then what each of them needs once the whole graph is known
+    # (types reference each other, e.g. beatmap <-> beatmapset)
+    kinds: dict[type, list[tuple[str, str, str, type]]] = {}
+    pending = [model]
+    while pending:
+        struct = pending.pop()
+        if struct in kinds or struct in _fields_plans:
+            continue
+        kinds[struct] = []
+        for field in msgspec.structs.fields(struct):
+            kind = _field_kind(field.type)
+            if kind is not None:
+                kinds[struct].append((field.encode_name, field.name, *kind))
+                if kind[0] != "enum":
+                    pending.append(kind[1])
+
+    def needs_repair(struct: type) -> bool:
+        if struct in _fields_plans:
+            return _fields_plans[struct] is not None
+        return needed[struct]
+
+    needed = {
+        struct: any(field.encode_name != field.name for field in msgspec.structs.fields(struct))
+        or any(kind == "enum" for _, _, kind, _ in fields)
+        for struct, fields in kinds.items()
+    }
+    changed = True
+    while changed:
+        changed = False
+        for struct, fields in kinds.items():
+            if not needed[struct] and any(kind != "enum" and needs_repair(inner) for _, _, kind, inner in fields):
+                needed[struct] = changed = True
+
+    for struct, fields in kinds.items():
+        if not needed[struct]:
+            _fields_plans[struct] = None
+            continue
+        _fields_plans[struct] = _FieldsPlan(
+            {field.encode_name: field.name for field in msgspec.structs.fields(struct)
+             if field.encode_name != field.name},
+            tuple((encode_name, inner) for encode_name, _, kind, inner in fields if kind == "enum"),
+            tuple((encode_name, inner, kind) for encode_name, _, kind, inner in fields
+                  if kind != "enum" and needs_repair(inner))
+        )
+
+
+def _restore_fields(data: dict, model: type[msgspec.Struct]) -> dict:
+    """
+    Turn the output of msgspec.to_builtins back to field names and enums, in place when possible
+    """
+    try:
+        plan = _fields_plans[model]
+    except KeyError:
+        with _fields_plans_lock:
+            if model not in _fields_plans:
+                _build_fields_plans(model)
+        plan = _fields_plans[model]
+    if plan is None:
+        return data
+
+    for encode_name, enum in plan.enums:
+        value = data.get(encode_name)
+        if value is not None:
+            data[encode_name] = enum(value)
+    for encode_name, inner, kind in plan.nested:
+        value = data.get(encode_name)
+        if not value:
+            continue
+        if kind == "struct":
+            data[encode_name] = _restore_fields(value, inner)
+        elif kind == "list":
+            value[:] = [_restore_fields(item, inner) if item is not None else None for item in value]
+        else:
+            for key, item in value.items():
+                if item is not None:
+                    value[key] = _restore_fields(item, inner)
+    if plan.renames:
+        renames = plan.renames
+        return {renames.get(key, key): item for key, item in data.items()}
+    return data
+
+
+def _drop_none(value: dict | list):
+    # Fresh output of to_builtins, modified in place
+    if type(value) is dict:
+        for key in [key for key, item in value.items() if item is None]:
+            del value[key]
+        for item in value.values():
+            if type(item) in (dict, list):
+                _drop_none(item)
+    # Lists of the models hold a single type, lists of scalars are skipped
+    elif value and type(value[0]) in (dict, list):
+        for item in value:
+            _drop_none(item)
+    return value
 
 
 class Covers(BaseStruct, kw_only=True, rename=sanitize_name):
@@ -452,8 +673,9 @@ class BeatmapUserScores(BaseStruct, kw_only=True):
 class BeatmapScores(BaseStruct, kw_only=True):
     # https://osu.ppy.sh/docs/index.html#beatmapset
     scores: list[Score]
-    scope: ScoreScope
-    beatmap_id: int
+    # Missing from api responses, filled by the client after decoding
+    scope: ScoreScope | None = None
+    beatmap_id: int | None = None
     user_score: BeatmapUserScore | None = None
 
 
@@ -486,7 +708,8 @@ class BeatmapDifficultyAttributes(BaseStruct, kw_only=True):
 
 class BeatmapAttributes(BaseStruct, kw_only=True):
     attributes: BeatmapDifficultyAttributes
-    beatmap_id: int
+    # Missing from api responses, filled by the client after decoding
+    beatmap_id: int | None = None
 
 
 class TokenPayload(BaseStruct, kw_only=True):
@@ -497,3 +720,159 @@ class TokenPayload(BaseStruct, kw_only=True):
     exp: float
     scopes: list[ApiScope]
     sub: int | None = None
+
+
+class LeaMoeBeatmapList(BaseStruct, kw_only=True):
+    beatmaps: list[int]
+
+
+class LeaMoeBeatmaps(BaseStruct, kw_only=True):
+    # https://osu.lea.moe/beatmaps
+    ranked: LeaMoeBeatmapList
+    loved: LeaMoeBeatmapList
+
+
+def projection(model: type[BaseStruct], fields: Iterable[str]) -> type[BaseStruct]:
+    """
+    Return a struct type decoding only the given fields of a model, the rest of the payload
+    is skipped by the decoder (no nested objects, no datetime parsing)
+
+    Nested fields are selected with dotted paths, through lists and optional values:
+    projection(BeatmapScores, ["scores.id", "scores.pp", "scores.user.username"])
+
+    Types are cached, the same projection always returns the same type
+    """
+    return _projection(model, frozenset(fields))
+
+
+@lru_cache(maxsize=None)
+def _projection(model: type[BaseStruct], fields: frozenset[str]) -> type[BaseStruct]:
+    tree: dict[str, set[str]] = {}
+    for path in fields:
+        name, _, rest = path.partition(".")
+        tree.setdefault(name, set())
+        if rest:
+            tree[name].add(rest)
+
+    model_fields = {field.name: field for field in msgspec.structs.fields(model)}
+    unknown = tree.keys() - model_fields.keys()
+    if unknown:
+        raise ValueError(f"{model.__name__} has no field {', '.join(sorted(unknown))}")
+
+    struct_fields = []
+    rename = {}
+    # Keep the field order of the model
+    for name, field in model_fields.items():
+        if name not in tree:
+            continue
+        field_type = field.type
+        if tree[name]:
+            subfields = frozenset(tree[name])
+            field_type = _replace_structs(field.type, lambda struct: _projection(struct, subfields))
+            if field_type == field.type:
+                raise ValueError(f"Can't select {', '.join(sorted(subfields))} in {field.type}")
+        struct_fields.append(_field_spec(field, field_type))
+        rename[name] = field.encode_name
+
+    return msgspec.defstruct(
+        f"{model.__name__}Projection",
+        struct_fields,
+        bases=(BaseStruct,),
+        kw_only=True,
+        rename=rename,
+        module=__name__,
+        namespace={"projected_model": model}
+    )
+
+
+def compact_type(model: type[BaseStruct]) -> type[BaseStruct]:
+    """
+    Return a subclass of a model serialized as arrays instead of objects (no field names),
+    used to store models on disk, see encode_compact / decode_compact
+    """
+    compact = _compact_types.get(model)
+    if compact is None:
+        with _compact_lock:
+            _build_compact_types(model)
+            compact = _compact_types[model]
+    return compact
+
+
+# Compact types reference each other by name (beatmap <-> beatmapset), resolved in their own module
+_compact_module = types.ModuleType(f"{__name__}_compact")
+sys.modules[_compact_module.__name__] = _compact_module
+_compact_types: dict[type, type] = {}
+_compact_lock = threading.Lock()
+
+
+def _build_compact_types(model: type[BaseStruct]):
+    queued: dict[type, str] = {}
+    pending = []
+
+    def reference(struct: type[BaseStruct]) -> ForwardRef:
+        if struct in _compact_types:
+            return ForwardRef(_compact_types[struct].__name__)
+        if struct not in queued:
+            name = f"{struct.__name__}Compact"
+            while hasattr(_compact_module, name) or name in queued.values():
+                name += "_"
+            queued[struct] = name
+            pending.append(struct)
+        return ForwardRef(queued[struct])
+
+    reference(model)
+    while pending:
+        struct = pending.pop()
+        setattr(_compact_module, queued[struct], msgspec.defstruct(
+            queued[struct],
+            [_field_spec(field, _replace_structs(field.type, reference)) for field in msgspec.structs.fields(struct)],
+            bases=(struct,),
+            kw_only=True,
+            array_like=True,
+            module=_compact_module.__name__
+        ))
+    for struct, name in queued.items():
+        _compact_types[struct] = getattr(_compact_module, name)
+
+
+def encode_compact(obj: BaseStruct) -> bytes:
+    """
+    Serialize a model (msgpack, structs as arrays), several times smaller than json
+    """
+    return msgspec.msgpack.encode(obj if type(obj).__struct_config__.array_like else _as_arrays(obj))
+
+
+def decode_compact(data: bytes, model: type[BaseStruct]):
+    """
+    Deserialize a model stored with encode_compact, the result is an instance of compact_type(model)
+    """
+    return msgspec.msgpack.decode(data, type=compact_type(model))
+
+
+def _as_arrays(value):
+    return [
+        _as_arrays(item) if isinstance(item, (msgspec.Struct, list)) else item
+        for item in (msgspec.structs.astuple(value) if isinstance(value, msgspec.Struct) else value)
+    ]
+
+
+def _field_spec(field: msgspec.structs.FieldInfo, field_type) -> tuple:
+    if field.default is not msgspec.NODEFAULT:
+        return field.name, field_type, field.default
+    if field.default_factory is not msgspec.NODEFAULT:
+        return field.name, field_type, msgspec.field(default_factory=field.default_factory)
+    return field.name, field_type
+
+
+def _replace_structs(field_type, replace):
+    """
+    Apply replace to the struct types found in a field type, through unions and lists
+    """
+    if isinstance(field_type, type) and issubclass(field_type, msgspec.Struct):
+        return replace(field_type)
+    origin = get_origin(field_type)
+    if origin in (Union, types.UnionType):
+        return Union[tuple(_replace_structs(arg, replace) for arg in get_args(field_type))]
+    if origin is list:
+        return list[_replace_structs(get_args(field_type)[0], replace)]
+    return field_type
@@ -0,0 +1,135 @@
+from .logger import logger
+from typing import Any, Literal, NamedTuple
+import cProfile
+import itertools
+import pstats
+import threading
+import time
+import tracemalloc
+
+
+class RequestTiming:
+    """
+    Monotonic timestamps (time.monotonic) of the phases of one api call, handed to the timing hooks
+
+    Phases, in order, repeated on every retry:
+    cache (response cache lookup), coalesced (waiting for an identical in-flight request),
+    rate_limit (waiting for the rate limit), token (token check and refresh), network (http round trip),
+    backoff (sleeping before a retry), decode (decoding and validating the response)
+    """
+    __slots__ = ("endpoint", "method", "url", "start", "end", "phases", "status_code", "error", "profile")
+
+    def __init__(self, endpoint: str | None, method: str, url: str):
+        self.endpoint = endpoint
+        self.method = method
+        self.url = url
+        self.start = time.monotonic()
+        self.end: float | None = None
+        self.phases: list[tuple[str, float, float]] = []
+        self.status_code: int | None = None
+        self.error: BaseException | None = None
+        # pstats.Stats (cprofile) or list[tracemalloc.StatisticDiff] (tracemalloc) of sampled requests
+        self.profile: Any = None
+
+    def __repr__(self):
+        phases = " ".join(f"{name}={duration * 1e3:.2f}ms" for name, duration in self.durations().items())
+        return f"<RequestTiming {self.endpoint} {self.method} {self.url} total={self.total * 1e3:.2f}ms {phases}>"
+
+    def add(self, phase: str, start: float, end: float):
+        self.phases.append((phase, start, end))
+
+    @property
+    def total(self) -> float:
+        return (self.end if self.end is not None else time.monotonic()) - self.start
+
+    @property
+    def attempts(self) -> int:
+        return sum(1 for phase in self.phases if phase[0] == "network")
+
+    def durations(self) -> dict[str, float]:
+        """
+        Seconds spent in each phase, summed over retries
+        """
+        durations = {}
+        for name, start, end in self.phases:
+            durations[name] = durations.get(name, 0) + end - start
+        return durations
+
+
+class _Capture(NamedTuple):
+    profile: cProfile.Profile | None = None
+    snapshot: tracemalloc.Snapshot | None = None
+    # tracemalloc was started for this capture only
+    started: bool = False
+
+
+class RequestProfiler:
+    """
+    Profile one request out of every `every` with cProfile or tracemalloc, the result is attached
+    to RequestTiming.profile
+
+    Captures never overlap: a sampled request starting while another one is captured is skipped.
+    cProfile only sees the thread of the request, in async clients it also sees the other tasks
+    of the event loop running meanwhile
+    """
+    def __init__(self, every: int = 100, mode: Literal["cprofile", "tracemalloc"] = "cprofile", top: int = 20):
+        """
+        :param every: sample one request out of every
+        :param mode: cprofile (call stats) or tracemalloc (memory allocated during the request)
+        :param top: allocation sites kept per tracemalloc capture
+        """
+        if mode not in ("cprofile", "tracemalloc"):
+            raise ValueError(f"Unknown profiling mode {mode}")
+        self.every = every
+        self.mode = mode
+        self.top = top
+        self.samples = 0
+        self.skipped = 0
+        # Aggregated call stats of every cprofile capture
+        self.stats: pstats.Stats | None = None
+        self._counter = itertools.count(1)
+        self._capturing = threading.Lock()
+
+    def start(self) -> _Capture | None:
+        """
+        Start a capture if this request is sampled, return what stop() needs
+        """
+        if next(self._counter) % self.every:
+            return None
+        if not self._capturing.acquire(blocking=False):
+            self.skipped += 1
+            return None
+        try:
+            if self.mode == "cprofile":
+                profile = cProfile.Profile()
+                profile.enable()
+                return _Capture(profile=profile)
+            started = not tracemalloc.is_tracing()
+            if started:
+                tracemalloc.start()
+            return _Capture(snapshot=tracemalloc.take_snapshot(), started=started)
+        except BaseException:
+            self._capturing.release()
+            raise
+
+    def stop(self, capture: _Capture) -> Any:
+        try:
+            if capture.profile is not None:
+                capture.profile.disable()
+                if self.stats is None:
+                    self.stats = pstats.Stats(capture.profile)
+                else:
+                    self.stats.add(capture.profile)
+                self.samples += 1
+                return pstats.Stats(capture.profile)
+
+            snapshot = tracemalloc.take_snapshot()
+            if capture.started:
+                tracemalloc.stop()
+            self.samples += 1
+            return snapshot.compare_to(capture.snapshot, "lineno")[:self.top]
+        except Exception:
+            logger.exception("Request profiling failed")
+            return None
+        finally:
+            self._capturing.release()
@@ -0,0 +1,237 @@
+"""
+Offline record/replay of api responses through httpx transports
+
+Record once against the real api:
+
+    api = ApiV2(GuestToken(client_id, secret, transport=RecordTransport("fixtures")),
+                transport=RecordTransport("fixtures"))
+
+Then replay offline, with an optional simulated latency:
+
+    replay = ReplayTransport("fixtures", latency=0.05)
+    api = ApiV2(GuestToken(transport=replay), transport=replay)
+"""
+from urllib.parse import parse_qs
+import asyncio
+import base64
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+import httpx
+import msgspec
+
+
+# Hop-by-hop headers, headers describing the raw (already decoded) body and cookies are never stored
+_SKIPPED_HEADERS = {"connection", "content-encoding", "content-length", "keep-alive", "set-cookie", "transfer-encoding"}
+_REDACTED = "redacted"
+
+
+class Fixture(msgspec.Struct, kw_only=True):
+    method: str
+    url: str
+    status_code: int
+    headers: list[tuple[str, str]]
+    content: str
+    base64: bool = False
+
+    def body(self) -> bytes:
+        return base64.b64decode(self.content) if self.base64 else self.content.encode("utf-8")
+
+
+class FixtureNotFound(LookupError):
+    def __init__(self, request: httpx.Request, filepath: str):
+        super().__init__(f"No fixture recorded for {request.method} {request.url} (expected {filepath})")
+
+
+def _is_token_request(request: httpx.Request) -> bool:
+    return request.url.path.endswith("/oauth/token")
+
+
+def fixture_name(request: httpx.Request) -> str:
+    """
+    File name of the fixture of a request, stable between runs
+    """
+    if _is_token_request(request):
+        # Only the grant type identifies a token request, credentials and codes are never part of the key
+        grant_type = parse_qs(request.content.decode()).get("grant_type", [""])[0]
+        key = f"{request.method} {request.url.copy_with(query=None)} {grant_type}".encode()
+    else:
+        key = f"{request.method} {request.url}".encode() + b"\n" + request.content
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", request.url.path).strip("_")[:80]
+    return f"{request.method.lower()}_{slug}_{hashlib.sha1(key).hexdigest()[:12]}.json"
+
+
+def _redact_token_response(content: bytes) -> bytes:
+    """
+    Keep the payload of the access token, drop its signature and the refresh token
+    """
+    data = msgspec.json.decode(content)
+    if isinstance(data, dict):
+        if isinstance(data.get("access_token"), str) and data["access_token"].count(".") == 2:
+            data["access_token"] = f"{_REDACTED}.{data['access_token'].split('.')[1]}.{_REDACTED}"
+        if "refresh_token" in data:
+            data["refresh_token"] = _REDACTED
+    return msgspec.json.encode(data)
+
+
+def _refresh_token_response(content: bytes) -> bytes:
+    """
+    Mint a token with the recorded payload, shifted so it is issued now
+    """
+    data = msgspec.json.decode(content)
+    if not isinstance(data, dict) or not isinstance(data.get("access_token"), str):
+        return content
+    raw_payload = data["access_token"].split(".")[1]
+    payload = msgspec.json.decode(base64.urlsafe_b64decode(raw_payload + "=" * (-len(raw_payload) % 4)))
+    shift = time.time() - payload.get("iat", 0)
+    for claim in ("iat", "nbf", "exp"):
+        if claim in payload:
+            payload[claim] += shift
+    encoded = base64.b64encode(msgspec.json.encode(payload)).decode()
+    data["access_token"] = f"{_REDACTED}.{encoded}.{_REDACTED}"
+    return msgspec.json.encode(data)
+
+
+class RecordTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """
+    Forward requests to the network and store every response in a fixture directory
+
+    Secrets never reach the fixtures: token requests are keyed on their grant type only,
+    token responses keep the payload of the access token but not its signature nor the refresh token
+    """
+    def __init__(
+            self,
+            directory: str,
+            transport: httpx.BaseTransport | httpx.AsyncBaseTransport | None = None,
+            http2: bool = True):
+        """
+        :param transport: transport doing the actual requests, a new HTTP transport by default
+        """
+        self.directory = directory
+        self.http2 = http2
+        self.recorded = 0
+        self._transport = transport
+        self._sync_transport: httpx.HTTPTransport | None = None
+        self._async_transport: httpx.AsyncHTTPTransport | None = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _save(self, request: httpx.Request, response: httpx.Response, content: bytes) -> httpx.Response:
+        headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in _SKIPPED_HEADERS]
+        stored = _redact_token_response(content) if _is_token_request(request) and response.is_success else content
+        try:
+            fixture = Fixture(method=request.method, url=str(request.url), status_code=response.status_code,
+                              headers=headers, content=stored.decode("utf-8"))
+        except UnicodeDecodeError:
+            fixture = Fixture(method=request.method, url=str(request.url), status_code=response.status_code,
+                              headers=headers, content=base64.b64encode(stored).decode(), base64=True)
+        filepath = os.path.join(self.directory, fixture_name(request))
+        with open(f"{filepath}.tmp", "wb") as f:
+            f.write(msgspec.json.format(msgspec.json.encode(fixture)))
+        os.replace(f"{filepath}.tmp", filepath)
+        with self._lock:
+            self.recorded += 1
+        # The body has been read (and decoded) already, hand the caller a plain copy of it
+        return httpx.Response(response.status_code, headers=headers, content=content,
+                              request=request, extensions=response.extensions)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        transport = self._transport
+        if transport is None:
+            with self._lock:
+                if self._sync_transport is None:
+                    self._sync_transport = httpx.HTTPTransport(http2=self.http2)
+                transport = self._sync_transport
+        response = transport.handle_request(request)
+        try:
+            content = response.read()
+        finally:
+            response.close()
+        return self._save(request, response, content)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        transport = self._transport
+        if transport is None:
+            with self._lock:
+                if self._async_transport is None:
+                    self._async_transport = httpx.AsyncHTTPTransport(http2=self.http2)
+                transport = self._async_transport
+        response = await transport.handle_async_request(request)
+        try:
+            content = await response.aread()
+        finally:
+            await response.aclose()
+        return self._save(request, response, content)
+
+    def close(self):
+        # Clients close their transport, the next client opens a new connection pool
+        with self._lock:
+            transport, self._sync_transport = self._sync_transport, None
+        if transport is not None:
+            transport.close()
+
+    async def aclose(self):
+        with self._lock:
+            transport, self._async_transport = self._async_transport, None
+        if transport is not None:
+            await transport.aclose()
+
+
+class ReplayTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """
+    Serve the responses of a fixture directory without any network access
+
+    Token responses are re-issued with fresh iat/nbf/exp claims so tokens never look expired
+    """
+    def __init__(self, directory: str, latency: float = 0.0, jitter: float = 0.0):
+        """
+        :param latency: seconds waited before each response
+        :param jitter: maximum random seconds added to the latency
+        """
+        if not os.path.isdir(directory):
+            raise FileNotFoundError(f"Fixture directory {directory} does not exist")
+        self.directory = directory
+        self.latency = latency
+        self.jitter = jitter
+        self.served = 0
+        self._fixtures: dict[str, Fixture] = {}
+        self._lock = threading.Lock()
+
+    def _delay(self) -> float:
+        return self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+
+    def _response(self, request: httpx.Request) -> httpx.Response:
+        name = fixture_name(request)
+        fixture = self._fixtures.get(name)
+        if fixture is None:
+            filepath = os.path.join(self.directory, name)
+            try:
+                with open(filepath, "rb") as f:
+                    fixture = msgspec.json.decode(f.read(), type=Fixture)
+            except FileNotFoundError:
+                raise FixtureNotFound(request, filepath) from None
+            self._fixtures[name] = fixture
+
+        content = fixture.body()
+        if _is_token_request(request) and 200 <= fixture.status_code < 300:
+            content = _refresh_token_response(content)
+        with self._lock:
+            self.served += 1
+        return httpx.Response(fixture.status_code, headers=fixture.headers, content=content, request=request)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        delay = self._delay()
+        if delay > 0:
+            time.sleep(delay)
+        return self._response(request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        delay = self._delay()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return self._response(request)
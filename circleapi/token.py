@@ -1,29 +1,114 @@
 from .logger import logger
 from .models import TokenPayload, ApiScope
-from .utils import InvalidApiScope, extract_payload_from_token
+from .utils import InvalidApiScope, FileLock, RateLimit, TokenSnapshot, extract_payload_from_token
+from typing import NamedTuple
+import abc
+import contextlib
 import httpx
 import time
 import socket
 import threading
 
 
-class GuestToken:
+class BaseToken(abc.ABC):
+    """
+    The token state is kept in an immutable snapshot replaced as a whole on refresh,
+    checking a valid token or reading its headers is a lock-free read
+    """
+    # Refresh the access token once it expires within this many seconds
+    refresh_margin = 3600
+    _snapshot: TokenSnapshot
+
+    @property
+    def access_token(self) -> str | None:
+        return self._snapshot.access_token
+
+    @access_token.setter
+    def access_token(self, access_token: str | None):
+        self._snapshot = TokenSnapshot.create(access_token, self._snapshot.payload)
+
+    @property
+    def payload(self) -> TokenPayload | None:
+        return self._snapshot.payload
+
+    @payload.setter
+    def payload(self, payload: TokenPayload | None):
+        self._snapshot = TokenSnapshot.create(self._snapshot.access_token, payload)
+
+    @property
+    def headers(self) -> dict[str, str]:
+        return self._snapshot.headers
+
+    @abc.abstractmethod
+    def check_token(self, force_refresh=False) -> bool:
+        ...
+
+    def start_auto_refresh(self, ahead: float = 60):
+        """
+        Refresh the token in a background thread `ahead` seconds before check_token would
+        (halfway through the lifetime of short-lived tokens), so requests never wait for a refresh
+        """
+        if getattr(self, "_refresh_thread", None) and self._refresh_thread.is_alive():
+            return
+        self._stop_refresh = threading.Event()
+        self._refresh_thread = threading.Thread(
+            target=self._auto_refresh,
+            args=(ahead,),
+            name=f"{type(self).__name__}Refresh",
+            daemon=True
+        )
+        self._refresh_thread.start()
+
+    def stop_auto_refresh(self):
+        if getattr(self, "_refresh_thread", None):
+            self._stop_refresh.set()
+            self._refresh_thread.join()
+            self._refresh_thread = None
+
+    def _auto_refresh(self, ahead: float):
+        while True:
+            delay = self._snapshot.refresh_delay(self.refresh_margin + ahead)
+            if self._stop_refresh.wait(delay):
+                return
+            try:
+                self.check_token(force_refresh=True)
+            except Exception:
+                logger.exception("Background token refresh failed, retrying in 30s")
+                if self._stop_refresh.wait(30):
+                    return
+
+
+class GuestToken(BaseToken):
     def __init__(
             self,
             client_id: int | None = None,
             client_secret: str | None = None,
             payload: TokenPayload | None = None,
-            filepath: str | None = None):
+            filepath: str | None = None,
+            shared: bool = False,
+            transport: httpx.BaseTransport | None = None,
+            token_url: str = "https://osu.ppy.sh/oauth/token"):
+        """
+        :param shared: the token file is shared by several processes, refreshes are done
+                       under a file lock and a token refreshed by another process is reused
+        :param transport: custom httpx transport used to request tokens
+        :param token_url: oauth token endpoint, to use a local stand-in of the api
+        """
+        if shared and not filepath:
+            raise ValueError("A shared token needs a filepath")
         self.client_id = client_id
         self.client_secret = client_secret
-        self.payload = payload
-        self.access_token = None
+        self._snapshot = TokenSnapshot.create(None, payload)
         self._file = None
+        self._file_lock = FileLock(f"{filepath}.lock") if shared else None
+        self.transport = transport
+        self.token_url = token_url
         self._lock = threading.Lock()
 
         if filepath:
             try:
-                self.load_from_file(filepath, enable_auto_update=True)
+                with self._file_lock if shared else contextlib.nullcontext():
+                    self.load_from_file(filepath, enable_auto_update=True)
             except FileNotFoundError:
                 logger.warning("Loading token from file failed: file does not exist")
 
@@ -46,8 +131,7 @@ class GuestToken:
             if len(lines) != 1:
                 raise ValueError("Invalid file format")
             access_token = lines[0].strip()
-        self.access_token = access_token
-        self.payload = extract_payload_from_token(self.access_token)
+        self._snapshot = TokenSnapshot.create(access_token, extract_payload_from_token(access_token))
 
     def export_to_file(self, filename: str, enable_auto_update: bool = False):
         if enable_auto_update:
@@ -62,19 +146,43 @@ class GuestToken:
 
         :return:
         """
+        # Lock-free fast path
+        if not force_refresh and self._snapshot.is_valid(self.refresh_margin):
+            return True
+
         with self._lock:
             if not self.access_token \
                     or not self.payload \
-                    or time.time() > self.payload.exp - 3600 \
+                    or time.time() > self.payload.exp - self.refresh_margin \
                     or force_refresh:
-                logger.info(f"Refreshing guest token ... | {force_refresh=} {time.time()}:{self.payload.exp - 3600 if self.payload else 0}")
-                self._request_token()
-                if self._file:
-                    self.export_to_file(self._file)
-                logger.info("Guest token refreshed")
+                with self._file_lock if self._file_lock else contextlib.nullcontext():
+                    if self._file_lock and self._load_shared_token(force_refresh):
+                        logger.info("Guest token refreshed by another process")
+                        return False
+                    logger.info(f"Refreshing guest token ... | {force_refresh=} {time.time()}:{self.payload.exp - self.refresh_margin if self.payload else 0}")
+                    self._request_token()
+                    if self._file:
+                        self.export_to_file(self._file)
+                    logger.info("Guest token refreshed")
                 return False
             return True
 
+    def _load_shared_token(self, force_refresh: bool = False) -> bool:
+        """
+        Adopt the token stored by another process, return False if it must be refreshed anyway
+        """
+        try:
+            with open(self._file, "r") as f:
+                access_token = f.read().strip()
+            snapshot = TokenSnapshot.create(access_token, extract_payload_from_token(access_token))
+        except (OSError, ValueError, IndexError, TypeError):
+            return False
+        if not snapshot.is_valid(self.refresh_margin) \
+                or (force_refresh and snapshot.access_token == self.access_token):
+            return False
+        self._snapshot = snapshot
+        return True
+
     def _request_token(self):
         """
         Request an access token from osu! api with the provided client_id and client_secret
@@ -87,32 +195,27 @@ class GuestToken:
             'grant_type': 'client_credentials',
             'scope': 'public'
         }
-        req = httpx.post('https://osu.ppy.sh/oauth/token', data=post_data)
+        with httpx.Client(transport=self.transport) as client:
+            req = client.post(self.token_url, data=post_data)
         req.raise_for_status()
         res = req.json()
-        self.access_token = res["access_token"]
-        self.payload = extract_payload_from_token(self.access_token)
+        self._snapshot = TokenSnapshot.create(res["access_token"], extract_payload_from_token(res["access_token"]))
 
-    @property
-    def headers(self):
-        return {
-            "Authorization": f"Bearer {self.access_token}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
 
-
-class UserToken:
+class UserToken(BaseToken):
     def __init__(self,
                  client_id: int | None = None,
                  client_secret: str | None = None,
                  payload: TokenPayload | None = None,
-                 filepath: str | None = None):
+                 filepath: str | None = None,
+                 transport: httpx.BaseTransport | None = None,
+                 token_url: str = "https://osu.ppy.sh/oauth/token"):
         self.client_id = client_id
         self.client_secret = client_secret
-        self.payload = payload
-        self.access_token = None
+        self._snapshot = TokenSnapshot.create(None, payload)
         self.refresh_token = None
+        self.transport = transport
+        self.token_url = token_url
         self._file = None
         self._lock = threading.Lock()
 
@@ -158,6 +261,11 @@ class UserToken:
         :return:
         """
 
+        # Lock-free fast path
+        if not force_renew and not force_refresh and self.refresh_token \
+                and self._snapshot.is_valid(self.refresh_margin):
+            return True
+
         with self._lock:
             if not self.access_token or not self.refresh_token or not self.payload or force_renew:
                 logger.info(f"Manually renewing user token ...")
@@ -167,8 +275,8 @@ class UserToken:
                 logger.info(f"Manually renewed user token")
                 return False
 
-            if time.time() > self.payload.exp - 3600 or force_refresh:
-                logger.info(f"Refreshing user token ... | {force_refresh=} {time.time()}:{self.payload.exp - 3600}")
+            if time.time() > self.payload.exp - self.refresh_margin or force_refresh:
+                logger.info(f"Refreshing user token ... | {force_refresh=} {time.time()}:{self.payload.exp - self.refresh_margin}")
                 self._refresh_token()
                 if self._file:
                     self.export_to_file(self._file)
@@ -184,7 +292,8 @@ class UserToken:
             "grant_type": "refresh_token"
         }
 
-        req = httpx.post('https://osu.ppy.sh/oauth/token', data=post_data)
+        with httpx.Client(transport=self.transport) as client:
+            req = client.post(self.token_url, data=post_data)
         req.raise_for_status()
         res = req.json()
         self._update_token_info(res["access_token"], res["refresh_token"])
@@ -227,7 +336,8 @@ class UserToken:
             'redirect_uri': 'http://127.0.0.1/api'
         }
 
-        req = httpx.post('https://osu.ppy.sh/oauth/token', data=post_data)
+        with httpx.Client(transport=self.transport) as client:
+            req = client.post(self.token_url, data=post_data)
         req.raise_for_status()
         res = req.json()
         self._update_token_info(res["access_token"], res["refresh_token"])
@@ -241,14 +351,68 @@ class UserToken:
         :return:
         """
 
-        self.access_token = access_token
         self.refresh_token = refresh_token
-        self.payload = extract_payload_from_token(access_token)
+        self._snapshot = TokenSnapshot.create(access_token, extract_payload_from_token(access_token))
 
-    @property
-    def headers(self):
-        return {
-            "Authorization": f"Bearer {self.access_token}",
-            "Accept": "application/json",
-            "Content-Type": "application/json"
-        }
+
+class PooledToken(NamedTuple):
+    token: GuestToken | UserToken
+    rate_limit: RateLimit
+
+
+class TokenPool:
+    """
+    Several credentials, each with its own token and rate limit,
+    requests are scheduled to the least loaded one
+    """
+    def __init__(
+            self,
+            tokens: list[GuestToken | UserToken],
+            req_per_minute: int = 1000,
+            cooldown: float = 60,
+            rate_limits: list[RateLimit] | None = None):
+        """
+        :param tokens: one token per client
+        :param req_per_minute: rate limit of each client
+        :param cooldown: seconds a client is left out after a 429 without Retry-After
+        :param rate_limits: one rate limit per token instead of RateLimit(req_per_minute), e.g.
+                            RateLimit(1000, shared_file=f"ratelimit_{client_id}") to share each budget between processes
+        """
+        if not tokens:
+            raise ValueError("TokenPool needs at least one token")
+        if rate_limits is None:
+            rate_limits = [RateLimit(req_per_minute) for _ in tokens]
+        elif len(rate_limits) != len(tokens):
+            raise ValueError(f"Got {len(rate_limits)} rate limits for {len(tokens)} tokens")
+        self.cooldown = cooldown
+        self.credentials = [PooledToken(token, rate_limit) for token, rate_limit in zip(tokens, rate_limits)]
+
+    @classmethod
+    def from_credentials(
+            cls,
+            credentials: list[tuple[int, str]],
+            transport: httpx.BaseTransport | None = None,
+            **kwargs) -> "TokenPool":
+        """
+        Create a pool of guest tokens from (client_id, client_secret) pairs
+        """
+        return cls([GuestToken(client_id, client_secret, transport=transport)
+                    for client_id, client_secret in credentials], **kwargs)
+
+    def __len__(self):
+        return len(self.credentials)
+
+    def select(self) -> PooledToken:
+        """
+        Return the credential that would serve a new request the soonest
+        """
+        return min(self.credentials, key=lambda c: (c.rate_limit.wait_time(), -c.rate_limit.bucket))
+
+    def report_throttled(self, credential: PooledToken, retry_after: float | None = None):
+        """
+        Leave a credential out until its rate limit is lifted
+        """
+        credential.rate_limit.throttle(retry_after=retry_after if retry_after else self.cooldown)
+
+    def has_scope(self, scope: ApiScope, raise_exception: bool = False) -> bool:
+        return all(c.token.has_scope(scope, raise_exception) for c in self.credentials)
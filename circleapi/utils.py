@@ -1,11 +1,32 @@
-from .models import TokenPayload
+from .models import (
+    TokenPayload, BeatmapScores, BeatmapUserScore, BeatmapUserScores, LeaMoeBeatmaps,
+    BeatmapExtended, BeatmapsExtended, BeatmapAttributes, Score, UserExtended
+)
 from .logger import logger
-from copy import deepcopy
+from array import array
+from collections.abc import Hashable, Iterable
+from contextvars import ContextVar
+from typing import Any, NamedTuple
 import base64
+import contextlib
+import heapq
+import itertools
 import json
 import threading
 import time
 import asyncio
+import email.utils
+import os
+import random
+import struct
+import msgspec
+import httpx
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
 
 
 class InvalidApiScope(Exception):
@@ -15,6 +36,9 @@ class InvalidApiScope(Exception):
 
 
 class RequestThread(threading.Thread):
+    """
+    One thread per request, prefer ApiV2.batch which reuses a bounded pool of threads
+    """
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.result = None
@@ -34,7 +58,7 @@ class RequestThread(threading.Thread):
         """
         try:
             if self._target is not None:
-                self.args = deepcopy(self._kwargs.get("args") if self._kwargs.get("args") else {})
+                self.args = self._kwargs.get("args") if self._kwargs.get("args") else {}
                 self.result = self._target(*self._args, **self._kwargs)
         finally:
             # Avoid a refcycle if the thread is running a function with
@@ -42,82 +66,481 @@ class RequestThread(threading.Thread):
             del self._target, self._args, self._kwargs
 
 
+class CallResult(NamedTuple):
+    """
+    Outcome of one call of a batch: either a result or the exception it raised
+    """
+    kwargs: dict
+    result: Any = None
+    error: Exception | None = None
+
+
+class FileLock:
+    """
+    Exclusive lock on a file shared between processes, the file can hold a small state
+
+    Not reentrant, guard it with a threading lock when used from several threads
+    """
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self._fd = os.open(filepath, os.O_RDWR | os.O_CREAT, 0o644)
+
+    def acquire(self):
+        if fcntl:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+
+    def release(self):
+        if fcntl:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def read(self) -> bytes:
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        return os.read(self._fd, os.fstat(self._fd).st_size)
+
+    def write(self, data: bytes):
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, data)
+        os.ftruncate(self._fd, len(data))
+
+    def close(self):
+        os.close(self._fd)
+
+
+class _SharedBucket:
+    """
+    Token bucket state (bucket, last_req_ts, resume_ts) stored in a locked file,
+    timestamps come from the host wide monotonic clock
+    """
+    _format = struct.Struct("ddd")
+
+    def __init__(self, filepath: str, rate_limit: "RateLimit | AsyncRateLimit"):
+        self._file = FileLock(filepath)
+        self._rate_limit = rate_limit
+
+    def __enter__(self):
+        self._file.acquire()
+        data = self._file.read()
+        rate_limit = self._rate_limit
+        if len(data) == self._format.size:
+            bucket, last_req_ts, resume_ts = self._format.unpack(data)
+            # Ignore a state left by a previous boot
+            if last_req_ts <= time.monotonic():
+                rate_limit.bucket = min(bucket, rate_limit.bucket_limit)
+                rate_limit.last_req_ts = last_req_ts
+                rate_limit._resume_ts = resume_ts
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        rate_limit = self._rate_limit
+        try:
+            self._file.write(self._format.pack(rate_limit.bucket, rate_limit.last_req_ts, rate_limit._resume_ts))
+        finally:
+            self._file.release()
+
+
+class _FairQueue:
+    """
+    Waiters of a rate limit: served by priority (highest first), then by weighted fair share
+    of their tenant (start-time fair queuing), FIFO for a given priority and tenant
+    """
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._virtual_time = 0.0
+        self._finish_tags: dict[Hashable, float] = {}
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, n: int, priority: int, tenant: Hashable, weight: float) -> tuple:
+        start = max(self._virtual_time, self._finish_tags.get(tenant, 0.0))
+        finish = start + n / weight
+        self._finish_tags[tenant] = finish
+        entry = (-priority, finish, next(self._seq), start)
+        heapq.heappush(self._heap, entry)
+        return entry
+
+    def head(self) -> tuple:
+        return self._heap[0]
+
+    def served(self, entry: tuple):
+        self._virtual_time = max(self._virtual_time, entry[3])
+
+    def remove(self, entry: tuple):
+        if self._heap[0] is entry:
+            heapq.heappop(self._heap)
+        else:
+            self._heap.remove(entry)
+            heapq.heapify(self._heap)
+        if not self._heap:
+            # Idle, every tenant starts over on equal terms
+            self._virtual_time = 0.0
+            self._finish_tags.clear()
+
+
+# (priority, tenant) of the requests sent from the current context
+_request_priority: ContextVar[tuple[int, Hashable]] = ContextVar("request_priority", default=(0, None))
+
+
+@contextlib.contextmanager
+def request_priority(priority: int = 0, tenant: Hashable = None):
+    """
+    Set the priority and tenant of the requests sent within the block (thread / task local)
+    """
+    token = _request_priority.set((priority, tenant))
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
 class RateLimit:
     max_req_per_sec: float
     bucket_limit: float
     bucket: float
-    last_req_ts: int
+    last_req_ts: float
 
-    def __init__(self, req_per_minute):
+    def __init__(self, req_per_minute, shared_file: str | None = None):
+        """
+        :param req_per_minute:
+        :param shared_file: share the budget with every process using the same file
+        """
         self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        self._waiters = _FairQueue()
+        self._resume_ts = 0.0
+        self._shared = _SharedBucket(shared_file, self) if shared_file else contextlib.nullcontext()
         self.set_rate_limit(req_per_minute)
 
     def set_rate_limit(self, req_per_minute: int):
-        self.max_req_per_sec = req_per_minute / 60
-        self.bucket_limit = 1 if self.max_req_per_sec < 1 else self.max_req_per_sec
-        self.bucket = self.bucket_limit
-        self.last_req_ts = int(time.time())
+        with self._lock:
+            self.max_req_per_sec = req_per_minute / 60
+            self.bucket_limit = 1 if self.max_req_per_sec < 1 else self.max_req_per_sec
+            self.bucket = self.bucket_limit
+            self.last_req_ts = time.monotonic()
+            with self._shared:
+                pass
+            self._condition.notify_all()
+
+    def _refill(self):
+        current_ts = time.monotonic()
+        self.bucket = min(self.bucket_limit, self.bucket + (current_ts - self.last_req_ts) * self.max_req_per_sec)
+        self.last_req_ts = current_ts
 
     def is_exceeded(self):
         """
         Token bucket algorithm
 
-        Return True if empty
+        Return True if empty (or if other callers are already waiting in acquire)
+        """
+        with self._lock:
+            with self._shared:
+                self._refill()
+                if self._waiters or self.bucket < 1 or self._resume_ts > self.last_req_ts:
+                    logger.warning("Rate limit exceeded")
+                    return True
+                else:
+                    self.bucket = self.bucket - 1
+                    return False
+
+    def throttle(self, remaining: int | None = None, retry_after: float | None = None):
+        """
+        Slow down according to the server: cap the bucket to the remaining requests
+        and/or pause every caller for retry_after seconds
         """
         with self._lock:
-            current_ts = int(time.time())
-            time_passed = current_ts - self.last_req_ts
-            self.last_req_ts = current_ts
-            self.bucket = self.bucket + time_passed * self.max_req_per_sec
+            with self._shared:
+                if remaining is not None:
+                    self._refill()
+                    self.bucket = min(self.bucket, remaining)
+                if retry_after:
+                    self._resume_ts = max(self._resume_ts, time.monotonic() + retry_after)
+            self._condition.notify_all()
+
+    def wait_time(self, n: int = 1) -> float:
+        """
+        Estimated seconds a new caller would wait for n tokens
+        """
+        with self._lock, self._shared:
+            self._refill()
+            deficit = n + len(self._waiters) - self.bucket
+            return max(deficit / self.max_req_per_sec, self._resume_ts - self.last_req_ts, 0)
 
-            if self.bucket > self.bucket_limit:
-                self.bucket = self.bucket_limit
+    def acquire(
+            self,
+            n: int = 1,
+            timeout: float | None = None,
+            priority: int = 0,
+            tenant: Hashable = None,
+            weight: float = 1) -> bool:
+        """
+        Block until n tokens are available, callers are served by priority (highest first),
+        then by weighted fair share of their tenant, in FIFO order otherwise
 
-            if self.bucket < 1:
-                logger.warning("Rate limit exceeded")
-                return True
-            else:
-                self.bucket = self.bucket - 1
-                return False
+        Return False if the tokens couldn't be acquired before the timeout
+        """
+        if n > self.bucket_limit:
+            raise ValueError(f"Can't acquire {n} tokens at once, bucket limit is {self.bucket_limit}")
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._condition:
+            waiter = self._waiters.push(n, priority, tenant, weight)
+            try:
+                while True:
+                    wait = None
+                    if self._waiters.head() is waiter:
+                        with self._shared:
+                            self._refill()
+                            if self._resume_ts > self.last_req_ts:
+                                # Paused by the server
+                                wait = self._resume_ts - self.last_req_ts
+                            elif self.bucket >= n:
+                                self.bucket = self.bucket - n
+                                self._waiters.served(waiter)
+                                return True
+                            else:
+                                # Exact time until the missing tokens are refilled
+                                wait = (n - self.bucket) / self.max_req_per_sec
+
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        wait = remaining if wait is None else min(wait, remaining)
+
+                    self._condition.wait(wait)
+            finally:
+                self._waiters.remove(waiter)
+                self._condition.notify_all()
 
 
 class AsyncRateLimit:
     max_req_per_sec: float
     bucket_limit: float
     bucket: float
-    last_req_ts: int
+    last_req_ts: float
 
-    def __init__(self, req_per_minute):
-        self._lock = asyncio.Lock()
+    def __init__(self, req_per_minute, shared_file: str | None = None):
+        """
+        :param req_per_minute:
+        :param shared_file: share the budget with every process using the same file
+        """
+        # asyncio conditions are bound to the event loop they were first waited in, keep one per loop
+        self._conditions: dict[asyncio.AbstractEventLoop, asyncio.Condition] = {}
+        self._waiters = _FairQueue()
+        self._resume_ts = 0.0
+        self._shared = _SharedBucket(shared_file, self) if shared_file else contextlib.nullcontext()
         self.set_rate_limit(req_per_minute)
 
+    def _get_condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        condition = self._conditions.get(loop)
+        if condition is None:
+            # Forget conditions of event loops that are gone
+            for closed_loop in [key for key in self._conditions if key.is_closed()]:
+                del self._conditions[closed_loop]
+            condition = self._conditions[loop] = asyncio.Condition()
+        return condition
+
     def set_rate_limit(self, req_per_minute: int):
         self.max_req_per_sec = req_per_minute / 60
         self.bucket_limit = 1 if self.max_req_per_sec < 1 else self.max_req_per_sec
         self.bucket = self.bucket_limit
-        self.last_req_ts = int(time.time())
+        self.last_req_ts = time.monotonic()
+        with self._shared:
+            pass
+
+    def _refill(self):
+        current_ts = time.monotonic()
+        self.bucket = min(self.bucket_limit, self.bucket + (current_ts - self.last_req_ts) * self.max_req_per_sec)
+        self.last_req_ts = current_ts
 
     async def is_exceeded(self):
         """
         Token bucket algorithm
 
-        Return True if empty
+        Return True if empty (or if other callers are already waiting in acquire)
+        """
+        async with self._get_condition():
+            with self._shared:
+                self._refill()
+                if self._waiters or self.bucket < 1 or self._resume_ts > self.last_req_ts:
+                    logger.warning("Rate limit exceeded")
+                    return True
+                else:
+                    self.bucket = self.bucket - 1
+                    return False
+
+    def throttle(self, remaining: int | None = None, retry_after: float | None = None):
+        """
+        Slow down according to the server: cap the bucket to the remaining requests
+        and/or pause every caller for retry_after seconds
+        """
+        with self._shared:
+            if remaining is not None:
+                self._refill()
+                self.bucket = min(self.bucket, remaining)
+            if retry_after:
+                self._resume_ts = max(self._resume_ts, time.monotonic() + retry_after)
+
+    def wait_time(self, n: int = 1) -> float:
+        """
+        Estimated seconds a new caller would wait for n tokens
+        """
+        with self._shared:
+            self._refill()
+            deficit = n + len(self._waiters) - self.bucket
+        return max(deficit / self.max_req_per_sec, self._resume_ts - self.last_req_ts, 0)
+
+    async def acquire(
+            self,
+            n: int = 1,
+            timeout: float | None = None,
+            priority: int = 0,
+            tenant: Hashable = None,
+            weight: float = 1) -> bool:
         """
-        async with self._lock:
-            current_ts = int(time.time())
-            time_passed = current_ts - self.last_req_ts
-            self.last_req_ts = current_ts
-            self.bucket = self.bucket + time_passed * self.max_req_per_sec
+        Wait until n tokens are available, callers are served by priority (highest first),
+        then by weighted fair share of their tenant, in FIFO order otherwise
+
+        Return False if the tokens couldn't be acquired before the timeout
+        """
+        if n > self.bucket_limit:
+            raise ValueError(f"Can't acquire {n} tokens at once, bucket limit is {self.bucket_limit}")
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        condition = self._get_condition()
+        async with condition:
+            waiter = self._waiters.push(n, priority, tenant, weight)
+            try:
+                while True:
+                    wait = None
+                    if self._waiters.head() is waiter:
+                        with self._shared:
+                            self._refill()
+                            if self._resume_ts > self.last_req_ts:
+                                # Paused by the server
+                                wait = self._resume_ts - self.last_req_ts
+                            elif self.bucket >= n:
+                                self.bucket = self.bucket - n
+                                self._waiters.served(waiter)
+                                return True
+                            else:
+                                # Exact time until the missing tokens are refilled
+                                wait = (n - self.bucket) / self.max_req_per_sec
+
+                    if deadline is not None:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            return False
+                        wait = remaining if wait is None else min(wait, remaining)
+
+                    try:
+                        await asyncio.wait_for(condition.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+            finally:
+                self._waiters.remove(waiter)
+                condition.notify_all()
+
+
+class RetryPolicy:
+    def __init__(
+            self,
+            max_attempts: int = 5,
+            status_codes: tuple[int, ...] = (429, 500, 502, 503, 504),
+            retry_transport_errors: bool = True,
+            base_delay: float = 1,
+            max_delay: float = 60):
+        """
+        :param max_attempts: total number of attempts per request, 1 disables retries
+        :param status_codes: response status codes worth retrying
+        :param retry_transport_errors: retry on timeouts and connection errors
+        :param base_delay: minimum delay between two attempts in seconds
+        :param max_delay: maximum delay between two attempts in seconds
+        """
+        self.max_attempts = max_attempts
+        self.status_codes = frozenset(status_codes)
+        self.retry_transport_errors = retry_transport_errors
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def next_delay(self, previous_delay: float | None = None) -> float:
+        """
+        Decorrelated jitter backoff
+        """
+        if previous_delay is None:
+            return self.base_delay
+        return min(self.max_delay, random.uniform(self.base_delay, previous_delay * 3))
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """
+    Parse a Retry-After header (delay in seconds or http date) to a delay in seconds
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_rate_limit_remaining(value: str | None) -> int | None:
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
 
-            if self.bucket > self.bucket_limit:
-                self.bucket = self.bucket_limit
 
-            if self.bucket < 1:
-                logger.warning("Rate limit exceeded")
-                return True
-            else:
-                self.bucket = self.bucket - 1
-                return False
+class TokenSnapshot(NamedTuple):
+    """
+    Immutable token state, replaced as a whole on refresh
+    """
+    access_token: str | None
+    payload: TokenPayload | None
+    headers: dict[str, str]
+
+    @classmethod
+    def create(cls, access_token: str | None = None, payload: TokenPayload | None = None) -> "TokenSnapshot":
+        return cls(access_token, payload, {
+            "Authorization": f"Bearer {access_token}",
+            "Accept": "application/json",
+            "Content-Type": "application/json"
+        })
+
+    def is_valid(self, margin: float = 0) -> bool:
+        """
+        Return True if the access token doesn't expire within margin seconds
+        """
+        return bool(self.access_token) and self.payload is not None and time.time() <= self.payload.exp - margin
+
+    def refresh_delay(self, margin: float = 0) -> float:
+        """
+        Seconds until the token expires within margin seconds, but never before half of its lifetime:
+        a token living less than margin would otherwise be refreshed in a loop
+        """
+        if self.payload is None:
+            return 0
+        payload = self.payload
+        refresh_at = max(payload.exp - margin, payload.iat + (payload.exp - payload.iat) / 2)
+        return max(refresh_at - time.time(), 0)
 
 
 def extract_payload_from_token(token) -> TokenPayload:
@@ -127,4 +550,232 @@ def extract_payload_from_token(token) -> TokenPayload:
     payload = json.loads(payload_bytes.decode("utf-8"))
     if not payload.get("sub"):
         payload["sub"] = None
-    return TokenPayload(**payload)
\ No newline at end of file
+    return TokenPayload(**payload)
+
+
+_dict_decoder = msgspec.json.Decoder()
+# Decoders of every response type are built once at import, other types (projections) on first use
+_decoders: dict[type, msgspec.json.Decoder] = {
+    validate_with: msgspec.json.Decoder(type=validate_with, strict=False)
+    for validate_with in (
+        BeatmapExtended, BeatmapsExtended, BeatmapScores, BeatmapUserScore, BeatmapUserScores,
+        BeatmapAttributes, Score, UserExtended, LeaMoeBeatmaps
+    )
+}
+_decoders_lock = threading.Lock()
+
+
+def get_decoder(validate_with: type) -> msgspec.json.Decoder:
+    """
+    Return a cached (non strict) json decoder for the given type
+    """
+    try:
+        return _decoders[validate_with]
+    except KeyError:
+        # Building msgspec type info concurrently from several threads isn't safe
+        with _decoders_lock:
+            if validate_with not in _decoders:
+                _decoders[validate_with] = msgspec.json.Decoder(type=validate_with, strict=False)
+            return _decoders[validate_with]
+
+
+def _update_struct(data: msgspec.Struct, args: dict):
+    fields = data.__struct_fields__
+    for key, value in args.items():
+        if key in fields:
+            setattr(data, key, value)
+
+
+def request_key(method: str, url: str, params: dict | str | None = None, json_data: dict | None = None) -> str:
+    """
+    Identify a request by its method, url, params and json body
+    """
+    return msgspec.json.encode((method, url, params, json_data)).decode()
+
+
+def bulk_fields(fields: Iterable[str] | None) -> tuple[str, ...] | None:
+    """
+    Check that the fields of a bulk call select the beatmaps its chunks are merged on
+    """
+    if not fields:
+        return None
+    fields = tuple(fields)
+    if not any(field.partition(".")[0] == "beatmaps" for field in fields):
+        raise ValueError(f"fields must select beatmaps (e.g. beatmaps.id), got {', '.join(fields)}")
+    return fields
+
+
+def decode_response(content: bytes, validate_with: type, args: dict | None = None, as_dict: bool = False):
+    """
+    Decode a response body in a single pass, then add some important values
+    that are missing from api responses
+    """
+    if as_dict:
+        if getattr(validate_with, "projected_model", None) is None:
+            data: dict = _dict_decoder.decode(content)
+        else:
+            # Only the selected fields, keyed by their api names like the raw payload
+            data = msgspec.to_builtins(get_decoder(validate_with).decode(content))
+        if args:
+            # Look for nested scores by structure so projections are filled too
+            data.update(args)
+            for score in data.get("scores") or ():
+                score.update(args)
+            for container in (data, data.get("user_score")):
+                score = container.get("score") if isinstance(container, dict) else None
+                if isinstance(score, dict):
+                    score.update(args)
+        return data
+
+    data = get_decoder(validate_with).decode(content)
+    if args:
+        # Look for nested scores by structure so projections of the models are filled too
+        _update_struct(data, args)
+        for score in getattr(data, "scores", None) or ():
+            _update_struct(score, args)
+        for container in (data, getattr(data, "user_score", None)):
+            score = getattr(container, "score", None)
+            if isinstance(score, msgspec.Struct):
+                _update_struct(score, args)
+    return data
+
+
+class BeatmapIds(NamedTuple):
+    # Sorted beatmap ids
+    ranked: array
+    loved: array
+    ranked_and_loved: array
+
+
+class _BeatmapIdsFile(msgspec.Struct):
+    fetched_at: float
+    etag: str | None
+    last_modified: str | None
+    ranked: bytes
+    loved: bytes
+
+
+class BeatmapIdsCache:
+    """
+    In-memory (and optionally on-disk) cache of the osu.lea.moe ranked/loved beatmap ids,
+    revalidated with ETag / Last-Modified once older than max_age seconds
+    """
+    def __init__(self, filepath: str | None = None, max_age: float = 600):
+        self.filepath = filepath
+        self.max_age = max_age
+        self.ids: BeatmapIds | None = None
+        self.etag: str | None = None
+        self.last_modified: str | None = None
+        self.fetched_at = 0.0
+        self._decoder = msgspec.json.Decoder(LeaMoeBeatmaps)
+        self._lock = threading.Lock()
+
+        if filepath:
+            try:
+                self.load_from_file(filepath)
+            except FileNotFoundError:
+                pass
+
+    def is_fresh(self) -> bool:
+        return self.ids is not None and time.time() - self.fetched_at < self.max_age
+
+    @property
+    def headers(self) -> dict[str, str]:
+        """
+        Conditional headers to send when revalidating
+        """
+        headers = {}
+        if self.ids is not None:
+            if self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified:
+                headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+    def update(self, response: httpx.Response) -> BeatmapIds:
+        """
+        Update the cache from a (possibly 304) osu.lea.moe response
+        """
+        with self._lock:
+            if response.status_code != 304 or self.ids is None:
+                response.raise_for_status()
+                data = self._decoder.decode(response.content)
+                ranked = array("i", sorted(data.ranked.beatmaps))
+                loved = array("i", sorted(data.loved.beatmaps))
+                self.ids = BeatmapIds(ranked, loved, array("i", sorted(set(ranked).union(loved))))
+            self.etag = response.headers.get("ETag", self.etag)
+            self.last_modified = response.headers.get("Last-Modified", self.last_modified)
+            self.fetched_at = time.time()
+            if self.filepath:
+                self.export_to_file(self.filepath)
+            return self.ids
+
+    def load_from_file(self, filepath: str):
+        with open(filepath, "rb") as f:
+            data = msgspec.msgpack.decode(f.read(), type=_BeatmapIdsFile)
+        ranked = array("i", data.ranked)
+        loved = array("i", data.loved)
+        self.ids = BeatmapIds(ranked, loved, array("i", sorted(set(ranked).union(loved))))
+        self.etag = data.etag
+        self.last_modified = data.last_modified
+        self.fetched_at = data.fetched_at
+
+    def export_to_file(self, filepath: str):
+        data = _BeatmapIdsFile(
+            self.fetched_at, self.etag, self.last_modified,
+            self.ids.ranked.tobytes(), self.ids.loved.tobytes()
+        )
+        with open(filepath, "wb") as f:
+            f.write(msgspec.msgpack.encode(data))
+
+
+class BeatmapIdsDiff(NamedTuple):
+    # Sorted beatmap ids
+    added: array
+    removed: array
+    current: array
+
+
+def diff_sorted_ids(previous: array, current: array) -> BeatmapIdsDiff:
+    """
+    Merge walk over two sorted id arrays, return the ids added and removed since previous
+    """
+    added = array("i")
+    removed = array("i")
+    i = j = 0
+    len_previous, len_current = len(previous), len(current)
+    while i < len_previous and j < len_current:
+        old, new = previous[i], current[j]
+        if old == new:
+            i += 1
+            j += 1
+        elif old < new:
+            removed.append(old)
+            i += 1
+        else:
+            added.append(new)
+            j += 1
+    removed.extend(previous[i:])
+    added.extend(current[j:])
+    return BeatmapIdsDiff(added, removed, current)
+
+
+def load_ids_snapshot(filepath: str) -> array:
+    """
+    Load a sorted id array saved with save_ids_snapshot, empty if the file does not exist
+    """
+    ids = array("i")
+    try:
+        with open(filepath, "rb") as f:
+            ids.frombytes(f.read())
+    except FileNotFoundError:
+        pass
+    return ids
+
+
+def save_ids_snapshot(filepath: str, ids: array):
+    # Write then rename, a crash never leaves a truncated snapshot behind
+    tmp_filepath = f"{filepath}.tmp"
+    with open(tmp_filepath, "wb") as f:
+        ids.tofile(f)
+    os.replace(tmp_filepath, filepath)
@@ -0,0 +1,42 @@
+from circleapi import AsyncGuestToken, AsyncApiV2, start_logging
+import asyncio
+import os
+
+
+CLIENT_ID = 12345
+CLIENT_SECRET = "secret"
+MAX_CONCURRENCY = 8
+
+
+def beatmap_ids():
+    # Any (lazy) iterable or async iterable works, nothing is created up front
+    yield from range(53, 1053)
+
+
+async def main():
+    # Initialize objects
+    token = AsyncGuestToken(
+        client_id=CLIENT_ID,
+        client_secret=CLIENT_SECRET,
+        filepath="my_token"  # Optional: Load/Save the token on your disk
+    )
+    api = AsyncApiV2(token)
+
+    # Keep at most MAX_CONCURRENCY requests in flight, results are yielded as they complete
+    kwargs_iterable = ({"beatmap_id": beatmap_id, "mode": "osu"} for beatmap_id in beatmap_ids())
+    async for call in api.map_stream("get_beatmap_scores", kwargs_iterable, concurrency=MAX_CONCURRENCY):
+        if call.error:
+            print(f"{call.kwargs} generated an exception: {call.error}")
+        else:
+            print(call.result)
+
+
+if __name__ == "__main__":
+    # Windows shenanigans
+    if os.name == "nt":
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+    # Start logging requests
+    with start_logging(to_console=True):
+        # Run main
+        asyncio.run(main())
@@ -0,0 +1,25 @@
+from circleapi import GuestToken, ApiV2, ExternalApi, start_logging, save_ids_snapshot
+
+
+CLIENT_ID = 12345
+CLIENT_SECRET = "secret"
+SNAPSHOT_FILE = "ranked_and_loved_ids"
+
+# Initialize objects
+token = GuestToken(
+    client_id=CLIENT_ID,
+    client_secret=CLIENT_SECRET,
+    filepath="my_token"
+)
+api = ApiV2(token)
+
+with start_logging(to_console=True):
+    # Only the ids that changed since the last run (everything on the first run)
+    diff = ExternalApi.get_ranked_and_loved_diff(SNAPSHOT_FILE, update_snapshot=False)
+    print(f"{len(diff.added)} new beatmaps, {len(diff.removed)} removed beatmaps")
+
+    for chunk in api.iter_beatmaps_bulk(diff.added):
+        print(chunk)
+
+    # Save the snapshot once the delta has been processed
+    save_ids_snapshot(SNAPSHOT_FILE, diff.current)
@@ -1,4 +1,3 @@
-import concurrent.futures
 from circleapi import GuestToken, ApiV2, start_logging
 
 
@@ -15,14 +14,11 @@ token = GuestToken(
 api = ApiV2(token)
 
 req_args = [{"beatmap_id": 53, "ruleset": "osu"}, {"beatmap_id": 55, "ruleset": "osu"}]
-with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_THREAD_COUNT) as executor, start_logging(to_console=True):
-    future_to_args = {executor.submit(api.get_beatmap_attributes, **args): args for args in req_args}
-    for future in concurrent.futures.as_completed(future_to_args):
-        args = future_to_args.pop(future)
-        try:
-            data = future.result()
-        except Exception as exc:
-            print(f"{args} generated an exception: {exc}")
+calls = (("get_beatmap_attributes", args) for args in req_args)
+with start_logging(to_console=True):
+    # Worker threads and connections are reused, results are yielded as they complete
+    for call in api.batch(calls, max_workers=MAX_THREAD_COUNT):
+        if call.error:
+            print(f"{call.kwargs} generated an exception: {call.error}")
         else:
-            print(data)
-
+            print(call.result)
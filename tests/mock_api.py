@@ -0,0 +1,50 @@
+"""
+Offline helpers: fake tokens and api clients backed by an httpx.MockTransport
+"""
+import base64
+import time
+import httpx
+import msgspec
+from circleapi import ApiV2, AsyncApiV2, GuestToken, AsyncGuestToken
+from circleapi.utils import extract_payload_from_token
+
+
+def fake_access_token(lifetime: int = 86400) -> str:
+    now = time.time()
+    payload = {"aud": 1, "jti": "test", "iat": now, "nbf": now, "exp": now + lifetime, "scopes": ["public", "identify"]}
+    return f"e30.{base64.b64encode(msgspec.json.encode(payload)).decode()}.sig"
+
+
+def fake_token(cls=GuestToken):
+    token = cls()
+    token.access_token = fake_access_token()
+    token.payload = extract_payload_from_token(token.access_token)
+    return token
+
+
+def beatmap(beatmap_id: int) -> dict:
+    return {
+        "beatmapset_id": 1, "difficulty_rating": 5.0, "id": beatmap_id, "mode": "osu", "status": "ranked",
+        "total_length": 100, "user_id": 2, "version": "Insane", "accuracy": 7.0, "ar": 9.0, "convert": False,
+        "count_circles": 100, "count_sliders": 100, "count_spinners": 1, "cs": 4.0, "drain": 6.0,
+        "hit_length": 90, "is_scoreable": True, "last_updated": "2023-01-01T12:00:00+00:00", "mode_int": 0,
+        "passcount": 10, "playcount": 100, "ranked": 1, "url": f"https://osu.ppy.sh/beatmaps/{beatmap_id}"
+    }
+
+
+class MockApiV2(ApiV2):
+    def __init__(self, handler, token=None, **kwargs):
+        super().__init__(token if token else fake_token(), **kwargs)
+        self.handler = handler
+
+    def _create_client(self) -> httpx.Client:
+        return httpx.Client(transport=httpx.MockTransport(self.handler), base_url=self.base_url)
+
+
+class MockAsyncApiV2(AsyncApiV2):
+    def __init__(self, handler, token=None, **kwargs):
+        super().__init__(token if token else fake_token(AsyncGuestToken), **kwargs)
+        self.handler = handler
+
+    def _create_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handler), base_url=self.base_url)
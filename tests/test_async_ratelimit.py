@@ -1,6 +1,7 @@
 import unittest
 from circleapi import AsyncRateLimit
 import asyncio
+import time
 
 
 class TestAsyncRateLimit(unittest.IsolatedAsyncioTestCase):
@@ -32,6 +33,55 @@ class TestAsyncRateLimit(unittest.IsolatedAsyncioTestCase):
         await asyncio.sleep(1)
         self.assertFalse(await rate_limit.is_exceeded(), "Test if not exceeded")
 
+    async def test_acquire_waits_exact_refill_time(self):
+        # 10 req/s
+        rate_limit = AsyncRateLimit(600)
+        start = time.monotonic()
+        for _ in range(10):
+            self.assertTrue(await rate_limit.acquire())
+        self.assertLess(time.monotonic() - start, 0.05, "Test if full bucket doesn't wait")
+
+        start = time.monotonic()
+        for _ in range(5):
+            self.assertTrue(await rate_limit.acquire())
+        self.assertAlmostEqual(0.5, time.monotonic() - start, delta=0.1)
+
+    async def test_acquire_timeout(self):
+        rate_limit = AsyncRateLimit(60)
+        self.assertTrue(await rate_limit.acquire())
+        self.assertFalse(await rate_limit.acquire(timeout=0.1), "Test if timed out")
+        self.assertTrue(await rate_limit.is_exceeded(), "Test if exceeded")
+
+    async def test_acquire_fifo(self):
+        # 20 req/s
+        rate_limit = AsyncRateLimit(1200)
+        await rate_limit.acquire(20)
+        order = []
+
+        async def worker(index):
+            await rate_limit.acquire()
+            order.append(index)
+
+        tasks = []
+        for index in range(5):
+            tasks.append(asyncio.create_task(worker(index)))
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*tasks)
+        self.assertEqual([0, 1, 2, 3, 4], order)
+
+
+class TestAsyncRateLimitEventLoops(unittest.TestCase):
+    def test_reused_across_event_loops(self):
+        rate_limit = AsyncRateLimit(600)
+
+        async def run():
+            # More callers than the bucket holds, some of them have to wait
+            await asyncio.gather(*[rate_limit.acquire() for _ in range(15)])
+
+        asyncio.run(run())
+        asyncio.run(run())
+        self.assertEqual(1, len(rate_limit._conditions))
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import threading
+import time
+import httpx
+from circleapi import CallResult, BeatmapExtended
+from mock_api import MockApiV2, beatmap
+
+
+class Handler:
+    def __init__(self):
+        self.threads = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        with self._lock:
+            self.threads.add(threading.get_ident())
+        beatmap_id = int(request.url.path.split("/")[-1])
+        time.sleep(0.002 * (beatmap_id % 5))
+        if beatmap_id == 13:
+            return httpx.Response(404)
+        return httpx.Response(200, json=beatmap(beatmap_id))
+
+
+class TestBatch(unittest.TestCase):
+    def test_ordered(self):
+        handler = Handler()
+        api = MockApiV2(handler)
+        calls = (("get_beatmap", {"beatmap_id": beatmap_id}) for beatmap_id in range(1, 16))
+        results = list(api.batch(calls, max_workers=3, ordered=True))
+
+        self.assertTrue(all(isinstance(call, CallResult) for call in results))
+        self.assertEqual(list(range(1, 16)), [call.kwargs["beatmap_id"] for call in results])
+        self.assertIsInstance(results[12].error, httpx.HTTPStatusError)
+        self.assertIsInstance(results[0].result, BeatmapExtended)
+        self.assertLessEqual(len(handler.threads), 3)
+
+    def test_unordered_back_pressure(self):
+        api = MockApiV2(Handler())
+        consumed = []
+
+        def calls():
+            for beatmap_id in range(1, 16):
+                consumed.append(beatmap_id)
+                yield api.get_beatmap, {"beatmap_id": beatmap_id}
+
+        seen = []
+        for call in api.batch(calls(), max_workers=2):
+            # At most 2 * max_workers calls are queued
+            self.assertLessEqual(len(consumed) - len(seen), 4)
+            seen.append(call.kwargs["beatmap_id"])
+        self.assertEqual(list(range(1, 16)), sorted(seen))
+
+
+if __name__ == "__main__":
+    unittest.main()
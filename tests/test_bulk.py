@@ -0,0 +1,93 @@
+import unittest
+import asyncio
+import threading
+import httpx
+from circleapi import BeatmapsExtended
+from mock_api import MockApiV2, MockAsyncApiV2, beatmap
+
+
+class BeatmapsHandler:
+    def __init__(self):
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        ids = [int(value) for value in request.url.params.get_list("ids[]")]
+        with self._lock:
+            self.calls.append(ids)
+        return httpx.Response(200, json={"beatmaps": [beatmap(beatmap_id) for beatmap_id in ids]})
+
+
+class TestBeatmapsBulk(unittest.TestCase):
+    def test_get_beatmaps_bulk(self):
+        handler = BeatmapsHandler()
+        api = MockApiV2(handler)
+        ids = list(range(1, 121)) + [1, 2, 3]
+
+        data = api.get_beatmaps_bulk(ids, concurrency=3)
+        self.assertIsInstance(data, BeatmapsExtended)
+        self.assertEqual(list(range(1, 121)), [beatmap.id for beatmap in data.beatmaps])
+        self.assertEqual([50, 50, 20], sorted((len(call) for call in handler.calls), reverse=True))
+
+    def test_iter_beatmaps_bulk(self):
+        api = MockApiV2(BeatmapsHandler())
+        chunks = list(api.iter_beatmaps_bulk(range(1, 11), chunk_size=4, as_dict=True))
+        self.assertEqual([[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]],
+                         [[beatmap["id"] for beatmap in chunk["beatmaps"]] for chunk in chunks])
+
+    def test_invalid_chunk_size(self):
+        with self.assertRaises(ValueError):
+            MockApiV2(BeatmapsHandler()).get_beatmaps_bulk([1], chunk_size=51)
+
+    def test_bounded_in_flight(self):
+        handler = BeatmapsHandler()
+        api = MockApiV2(handler)
+        api.rate_limit.set_rate_limit(10 ** 9)
+        chunks = api.iter_beatmaps_bulk(range(1, 1001), chunk_size=10, concurrency=2)
+        next(chunks)
+        # 100 chunks, only 2 * concurrency are fetched ahead of the consumer
+        self.assertLessEqual(len(handler.calls), 4)
+        self.assertEqual(99, len(list(chunks)))
+        self.assertEqual(100, len(handler.calls))
+
+    def test_fields_without_beatmaps(self):
+        handler = BeatmapsHandler()
+        with self.assertRaises(ValueError):
+            MockApiV2(handler).get_beatmaps_bulk([1, 2], fields=["args"])
+        self.assertEqual([], handler.calls)
+
+
+class TestAsyncBeatmapsBulk(unittest.IsolatedAsyncioTestCase):
+    async def test_get_beatmaps_bulk(self):
+        handler = BeatmapsHandler()
+        api = MockAsyncApiV2(handler)
+        ids = list(range(1, 121)) + [1, 2, 3]
+
+        data = await api.get_beatmaps_bulk(ids, concurrency=3)
+        self.assertIsInstance(data, BeatmapsExtended)
+        self.assertEqual(list(range(1, 121)), [beatmap.id for beatmap in data.beatmaps])
+        self.assertEqual(3, len(handler.calls))
+
+    async def test_iter_beatmaps_bulk(self):
+        api = MockAsyncApiV2(BeatmapsHandler())
+        chunks = [chunk async for chunk in api.iter_beatmaps_bulk(range(1, 11), chunk_size=4)]
+        self.assertEqual([[1, 2, 3, 4], [5, 6, 7, 8], [9, 10]],
+                         [[beatmap.id for beatmap in chunk.beatmaps] for chunk in chunks])
+
+    async def test_bounded_in_flight(self):
+        handler = BeatmapsHandler()
+        api = MockAsyncApiV2(handler)
+        api.rate_limit.set_rate_limit(10 ** 9)
+        chunks = api.iter_beatmaps_bulk(range(1, 1001), chunk_size=10, concurrency=2)
+        await anext(chunks)
+        await asyncio.sleep(0.05)
+        self.assertLessEqual(len(handler.calls), 4)
+        self.assertEqual(99, len([chunk async for chunk in chunks]))
+
+    async def test_fields_without_beatmaps(self):
+        with self.assertRaises(ValueError):
+            await MockAsyncApiV2(BeatmapsHandler()).get_beatmaps_bulk([1, 2], fields=["args"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import os
+import tempfile
+import time
+import httpx
+from circleapi import MemoryCache, SqliteCache, BeatmapExtended
+from mock_api import MockApiV2, MockAsyncApiV2, beatmap
+
+
+class CountingHandler:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        return httpx.Response(200, json=beatmap(int(request.url.path.split("/")[-1])))
+
+
+class CacheTests:
+    def create_cache(self, maxsize):
+        raise NotImplementedError
+
+    def test_get_set(self):
+        cache = self.create_cache(10)
+        self.assertIsNone(cache.get("a"))
+        cache.set("a", b"1")
+        self.assertEqual(b"1", cache.get("a"))
+        self.assertEqual((1, 1), (cache.hits, cache.misses))
+
+    def test_ttl(self):
+        cache = self.create_cache(10)
+        cache.set("a", b"1", ttl=0.05)
+        cache.set("b", b"2", ttl=None)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(b"2", cache.get("b"))
+
+    def test_lru_eviction(self):
+        cache = self.create_cache(2)
+        cache.set("a", b"1")
+        time.sleep(0.01)
+        cache.set("b", b"2")
+        time.sleep(0.01)
+        cache.get("a")
+        time.sleep(0.01)
+        cache.set("c", b"3")
+        self.assertEqual(2, len(cache))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(b"1", cache.get("a"))
+
+
+class TestMemoryCache(CacheTests, unittest.TestCase):
+    def create_cache(self, maxsize):
+        return MemoryCache(maxsize)
+
+
+class TestSqliteCache(CacheTests, unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def create_cache(self, maxsize):
+        cache = SqliteCache(os.path.join(self.tmp_dir.name, "cache.sqlite"), maxsize)
+        self.addCleanup(cache.close)
+        return cache
+
+
+class TestApiCache(unittest.TestCase):
+    def test_cached_endpoint(self):
+        handler = CountingHandler()
+        api = MockApiV2(handler, cache=MemoryCache())
+        for _ in range(3):
+            self.assertIsInstance(api.get_beatmap(53), BeatmapExtended)
+        self.assertEqual(1, handler.calls)
+        self.assertEqual(53, api.get_beatmap(53, as_dict=True)["id"])
+        self.assertEqual(1, handler.calls)
+        api.get_beatmap(55)
+        self.assertEqual(2, handler.calls)
+
+    def test_custom_ttl(self):
+        handler = CountingHandler()
+        api = MockApiV2(handler, cache=MemoryCache(), cache_ttl={"get_beatmap": 0})
+        api.get_beatmap(53)
+        time.sleep(0.01)
+        api.get_beatmap(53)
+        self.assertEqual(2, handler.calls)
+
+
+class TestAsyncApiCache(unittest.IsolatedAsyncioTestCase):
+    async def test_cached_endpoint(self):
+        handler = CountingHandler()
+        api = MockAsyncApiV2(handler, cache=MemoryCache())
+        for _ in range(3):
+            self.assertIsInstance(await api.get_beatmap(53), BeatmapExtended)
+        self.assertEqual(1, handler.calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from circleapi import BeatmapExtended
+from mock_api import MockApiV2, MockAsyncApiV2, beatmap
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    return httpx.Response(200, json=beatmap(53))
+
+
+class CountingApiV2(MockApiV2):
+    def __init__(self, handler, **kwargs):
+        super().__init__(handler, **kwargs)
+        self.created = 0
+
+    def _create_client(self) -> httpx.Client:
+        self.created += 1
+        return super()._create_client()
+
+
+class CountingAsyncApiV2(MockAsyncApiV2):
+    def __init__(self, handler, **kwargs):
+        super().__init__(handler, **kwargs)
+        self.created = 0
+
+    def _create_client(self) -> httpx.AsyncClient:
+        self.created += 1
+        return super()._create_client()
+
+
+class TestSharedClient(unittest.TestCase):
+    def test_lazy_and_reused(self):
+        api = CountingApiV2(handler)
+        self.assertIsNone(api._client)
+        self.assertEqual(0, api.created)
+        self.assertIsInstance(api.get_beatmap(53), BeatmapExtended)
+        client = api._client
+        api.get_beatmap(53)
+        self.assertIs(client, api._client)
+        self.assertEqual(1, api.created)
+        api.stop_client()
+
+    def test_renewed_after_stop(self):
+        api = CountingApiV2(handler)
+        with api:
+            api.get_beatmap(53)
+            client = api._client
+        self.assertIsNone(api._client)
+        self.assertTrue(client.is_closed)
+        api.get_beatmap(53)
+        self.assertIsNot(client, api._client)
+        self.assertEqual(2, api.created)
+        api.stop_client()
+
+    def test_concurrent_first_use(self):
+        api = CountingApiV2(handler)
+        barrier = threading.Barrier(8)
+
+        def first_use(_):
+            barrier.wait()
+            return api._get_client()
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            clients = list(executor.map(first_use, range(8)))
+        self.assertEqual(1, api.created)
+        self.assertTrue(all(client is clients[0] for client in clients))
+        api.stop_client()
+
+
+class TestAsyncSharedClient(unittest.TestCase):
+    def test_client_per_event_loop(self):
+        api = CountingAsyncApiV2(handler)
+
+        async def use() -> httpx.AsyncClient:
+            await asyncio.gather(*[api.get_beatmap(53) for _ in range(4)])
+            first = await api._get_client()
+            await api.get_beatmap(53)
+            self.assertIs(first, await api._get_client())
+            return first
+
+        first = asyncio.run(use())
+        # A new event loop gets its own pool, the one of the closed loop is forgotten
+        second = asyncio.run(use())
+        self.assertIsNot(first, second)
+        self.assertEqual(2, api.created)
+        self.assertEqual(1, len(api._clients))
+
+    def test_renewed_after_stop(self):
+        api = CountingAsyncApiV2(handler)
+
+        async def main():
+            async with api:
+                await api.get_beatmap(53)
+            self.assertEqual({}, api._clients)
+            await api.get_beatmap(53)
+            await api.stop_client()
+
+        asyncio.run(main())
+        self.assertEqual(2, api.created)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+from circleapi import BeatmapAttributes
+from mock_api import MockApiV2, MockAsyncApiV2
+
+
+ATTRIBUTES = {"attributes": {"max_combo": 100, "star_rating": 5.5}}
+
+
+class SlowHandler:
+    def __init__(self, status_code: int = 200):
+        self.status_code = status_code
+        self.calls = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        time.sleep(0.2)
+        return httpx.Response(self.status_code, json=ATTRIBUTES)
+
+
+class AsyncSlowHandler(SlowHandler):
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        await asyncio.sleep(0.2)
+        return httpx.Response(self.status_code, json=ATTRIBUTES)
+
+
+class TestCoalescing(unittest.TestCase):
+    def test_identical_requests(self):
+        handler = SlowHandler()
+        api = MockApiV2(handler)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: api.get_beatmap_attributes(53, ruleset="osu"), range(8)))
+        self.assertEqual(1, handler.calls)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertIsInstance(results[0], BeatmapAttributes)
+        self.assertEqual({}, api._in_flight)
+
+    def test_different_requests(self):
+        handler = SlowHandler()
+        api = MockApiV2(handler)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda beatmap_id: api.get_beatmap_attributes(beatmap_id), [53, 55, 53, 55]))
+        self.assertEqual(2, handler.calls)
+
+    def test_shared_error(self):
+        handler = SlowHandler(404)
+        api = MockApiV2(handler)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(api.get_beatmap_attributes, 53) for _ in range(4)]
+        for future in futures:
+            self.assertIsInstance(future.exception(), httpx.HTTPStatusError)
+        self.assertEqual(1, handler.calls)
+
+    def test_disabled(self):
+        handler = SlowHandler()
+        api = MockApiV2(handler, coalesce_requests=False)
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(executor.map(lambda _: api.get_beatmap_attributes(53), range(4)))
+        self.assertEqual(4, handler.calls)
+
+
+class TestAsyncCoalescing(unittest.IsolatedAsyncioTestCase):
+    async def test_identical_requests(self):
+        handler = AsyncSlowHandler()
+        api = MockAsyncApiV2(handler)
+        results = await asyncio.gather(*[api.get_beatmap_attributes(53, ruleset="osu") for _ in range(8)])
+        self.assertEqual(1, handler.calls)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    async def test_cancelled_follower(self):
+        handler = AsyncSlowHandler()
+        api = MockAsyncApiV2(handler)
+        leader = asyncio.create_task(api.get_beatmap_attributes(53))
+        follower = asyncio.create_task(api.get_beatmap_attributes(53))
+        await asyncio.sleep(0.05)
+        follower.cancel()
+        self.assertIsInstance(await leader, BeatmapAttributes)
+        self.assertEqual(1, handler.calls)
+
+    async def test_cancelled_leader(self):
+        handler = AsyncSlowHandler()
+        api = MockAsyncApiV2(handler)
+        leader = asyncio.create_task(api.get_beatmap_attributes(53))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(api.get_beatmap_attributes(53))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        self.assertIsInstance(await follower, BeatmapAttributes)
+        self.assertTrue(leader.cancelled())
+        self.assertEqual(1, handler.calls)
+        self.assertEqual({}, api._in_flight)
+
+    async def test_leader_timeout(self):
+        handler = AsyncSlowHandler()
+        api = MockAsyncApiV2(handler)
+        leader = asyncio.create_task(asyncio.wait_for(api.get_beatmap_attributes(53), 0.1))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(api.get_beatmap_attributes(53))
+        with self.assertRaises(asyncio.TimeoutError):
+            await leader
+        self.assertIsInstance(await follower, BeatmapAttributes)
+        self.assertEqual(1, handler.calls)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import subprocess
+import sys
+import unittest
+import msgspec
+from circleapi import BeatmapScores, BeatmapExtended, BeatmapsExtended, compact_type, encode_compact, decode_compact
+from circleapi.utils import decode_response
+from mock_api import beatmap
+from test_decode import SCORE
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def beatmapset(beatmapset_id: int) -> dict:
+    return {
+        "artist": "Artist", "artist_unicode": "Artist", "creator": "mapper", "favourite_count": 1,
+        "id": beatmapset_id, "nsfw": False, "offset": 0, "play_count": 1, "preview_url": "", "source": "",
+        "spotlight": False, "status": "ranked", "title": "Title", "title_unicode": "Title", "user_id": 2,
+        "video": False, "bpm": 180.0, "can_be_hyped": False, "discussion_locked": False, "is_scoreable": True,
+        "last_updated": "2023-01-01T12:00:00+00:00", "ranked": 1, "storyboard": False, "tags": "",
+        "availability": {"download_disabled": False},
+        "covers": {name: "" for name in (
+            "cover", "cover@2x", "card", "card@2x", "list", "list@2x", "slimcover", "slimcover@2x"
+        )}
+    }
+
+
+class TestCompact(unittest.TestCase):
+    def test_round_trip(self):
+        content = msgspec.json.encode({"scores": [SCORE, SCORE], "user_score": {"position": 1, "score": SCORE}})
+        data = decode_response(content, BeatmapScores, {"beatmap_id": 53, "scope": "global"})
+        stored = encode_compact(data)
+        self.assertLess(len(stored), len(content) / 2)
+
+        restored = decode_compact(stored, BeatmapScores)
+        self.assertIsInstance(restored, BeatmapScores)
+        self.assertIsInstance(restored.scores[0].statistics, type(data.scores[0].statistics))
+        self.assertEqual(stored, encode_compact(restored))
+        self.assertEqual(data.to_dict(), restored.to_dict())
+
+    def test_models_referencing_each_other(self):
+        item = beatmap(53) | {"beatmapset": beatmapset(5) | {"beatmaps": [beatmap(54), beatmap(55)]}}
+        data = decode_response(msgspec.json.encode({"beatmaps": [item]}), BeatmapsExtended)
+        restored = decode_compact(encode_compact(data), BeatmapsExtended)
+        self.assertIs(compact_type(BeatmapExtended), type(restored.beatmaps[0].beatmapset.beatmaps[0]))
+        # Renamed fields are kept
+        self.assertEqual("", restored.beatmaps[0].beatmapset.covers.cover_2x)
+        self.assertEqual(data.to_dict(), restored.to_dict())
+
+    def test_same_fields(self):
+        compact = compact_type(BeatmapScores)
+        self.assertIs(compact, compact_type(BeatmapScores))
+        self.assertEqual(BeatmapScores.__struct_fields__, compact.__struct_fields__)
+        self.assertTrue(compact.__struct_config__.array_like)
+
+    def test_compact_mode(self):
+        code = "import gc; from circleapi.models import TokenPayload; " \
+               "print(gc.is_tracked(TokenPayload(aud=1, jti='', iat=0, nbf=0, exp=0, scopes=[])))"
+        for value, tracked in (("1", "False"), ("", "True")):
+            output = subprocess.run(
+                [sys.executable, "-c", code],
+                env=os.environ | {"CIRCLEAPI_COMPACT": value, "PYTHONPATH": ROOT},
+                capture_output=True,
+                text=True,
+                check=True
+            ).stdout.strip()
+            self.assertEqual(tracked, output)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import httpx
+from circleapi import ConditionalCache, BeatmapExtended
+from mock_api import MockApiV2, MockAsyncApiV2, beatmap
+
+
+class ETagHandler:
+    def __init__(self):
+        self.etag = '"v1"'
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.headers.get("If-None-Match") == self.etag:
+            return httpx.Response(304, headers={"ETag": self.etag})
+        return httpx.Response(200, json=beatmap(53), headers={"ETag": self.etag})
+
+
+class TestConditionalRequests(unittest.TestCase):
+    def test_not_modified(self):
+        handler = ETagHandler()
+        api = MockApiV2(handler, conditional_cache=ConditionalCache())
+        first = api.get_beatmap(53)
+        second = api.get_beatmap(53)
+        self.assertIsInstance(first, BeatmapExtended)
+        self.assertIs(first, second)
+        self.assertNotIn("If-None-Match", handler.requests[0].headers)
+        self.assertEqual('"v1"', handler.requests[1].headers["If-None-Match"])
+        self.assertEqual(1, api.conditional_cache.hits)
+
+        handler.etag = '"v2"'
+        third = api.get_beatmap(53)
+        self.assertIsNot(first, third)
+        self.assertEqual(first, third)
+
+    def test_as_dict_is_stored_separately(self):
+        api = MockApiV2(ETagHandler(), conditional_cache=ConditionalCache())
+        self.assertIsInstance(api.get_beatmap(53), BeatmapExtended)
+        self.assertIsInstance(api.get_beatmap(53, as_dict=True), dict)
+        self.assertIsInstance(api.get_beatmap(53), BeatmapExtended)
+
+    def test_without_validators(self):
+        cache = ConditionalCache()
+        cache.set("key", {}, "data")
+        self.assertIsNone(cache.get_headers("key"))
+        cache.set("key", {"Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT"}, "data")
+        self.assertEqual({"If-Modified-Since": "Wed, 21 Oct 2015 07:28:00 GMT"}, cache.get_headers("key"))
+
+
+class TestAsyncConditionalRequests(unittest.IsolatedAsyncioTestCase):
+    async def test_not_modified(self):
+        api = MockAsyncApiV2(ETagHandler(), conditional_cache=ConditionalCache())
+        first = await api.get_beatmap(53)
+        self.assertIs(first, await api.get_beatmap(53))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+import msgspec
+from circleapi import BeatmapScores, BeatmapAttributes, Score
+from circleapi.utils import decode_response, get_decoder
+
+
+SCORE = {
+    "accuracy": 0.98, "best_id": 1, "created_at": "2023-01-01T12:00:00+00:00", "id": 1,
+    "max_combo": 100, "mode": "osu", "mode_int": 0, "mods": ["HD"], "passed": True,
+    "perfect": False, "pp": 100.0, "rank": "S", "replay": False, "score": 1000000,
+    "statistics": {"count_100": 1, "count_300": 100, "count_50": 0, "count_geki": 10, "count_katu": 1, "count_miss": 0},
+    "user_id": 2
+}
+
+
+class TestDecodeResponse(unittest.TestCase):
+    def test_missing_values_are_added(self):
+        content = msgspec.json.encode({"scores": [SCORE, SCORE], "user_score": {"position": 1, "score": SCORE}})
+        args = {"args": {"beatmap_id": 53}, "beatmap_id": 53, "scope": "country"}
+
+        data = decode_response(content, BeatmapScores, args)
+        self.assertIsInstance(data, BeatmapScores)
+        self.assertEqual(53, data.beatmap_id)
+        self.assertEqual("country", data.scope)
+        self.assertTrue(all(score.beatmap_id == 53 for score in data.scores))
+        self.assertEqual(53, data.user_score.score.beatmap_id)
+
+    def test_as_dict(self):
+        content = msgspec.json.encode({"attributes": {"max_combo": 100, "star_rating": 5.5}})
+        data = decode_response(content, BeatmapAttributes, {"args": {"beatmap_id": 53}, "beatmap_id": 53}, as_dict=True)
+        self.assertEqual({"attributes": {"max_combo": 100, "star_rating": 5.5},
+                          "args": {"beatmap_id": 53}, "beatmap_id": 53}, data)
+
+    def test_decoder_is_cached(self):
+        self.assertIs(get_decoder(Score), get_decoder(Score))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+from datetime import datetime
+import msgspec
+from circleapi import Score, BaseStruct, to_json_lines, decode_compact, encode_compact
+from circleapi.models import BeatmapExtended, Covers, RankStatusInt, RulesetInt
+from mock_api import beatmap
+from test_decode import SCORE
+
+
+class Nested(BaseStruct, kw_only=True):
+    scores: dict[str, Score]
+
+
+class CoversList(BaseStruct, kw_only=True):
+    covers: list[Covers | None]
+
+
+class TestToDict(unittest.TestCase):
+    def setUp(self):
+        self.score = msgspec.convert(SCORE, Score)
+
+    def test_builtins(self):
+        data = self.score.to_dict()
+        self.assertEqual(1, data["id"])
+        self.assertIsInstance(data["created_at"], datetime)
+        self.assertEqual({"count_100": 1, "count_300": 100, "count_50": 0, "count_geki": 10, "count_katu": 1,
+                          "count_miss": 0}, data["statistics"])
+        self.assertIsNone(data["user"])
+        # The struct itself is left untouched
+        self.assertIsInstance(self.score.statistics, msgspec.Struct)
+
+    def test_nested_in_dict(self):
+        data = Nested(scores={"best": self.score}).to_dict()
+        self.assertIsInstance(data["scores"]["best"], dict)
+
+    def test_options(self):
+        data = self.score.to_dict(datetime_format="iso", omit_none=True)
+        self.assertEqual("2023-01-01T12:00:00Z", data["created_at"])
+        self.assertNotIn("user", data)
+        self.assertNotIn("rank_global", data)
+        with self.assertRaises(ValueError):
+            self.score.to_dict(datetime_format="timestamp")
+
+    def test_field_names(self):
+        covers = Covers(**{name: name for name in Covers.__struct_fields__})
+        self.assertEqual(list(Covers.__struct_fields__), list(covers.to_dict()))
+        self.assertEqual("cover_2x", covers.to_dict()["cover_2x"])
+        self.assertEqual("cover_2x", covers.to_dict(by_alias=True)["cover@2x"])
+        self.assertNotIn("cover_2x", covers.to_dict(by_alias=True))
+
+    def test_enums(self):
+        self.assertIs(RulesetInt.OSU, self.score.to_dict()["mode_int"])
+        self.assertEqual(0, self.score.to_dict(by_alias=True)["mode_int"])
+        self.assertNotIsInstance(self.score.to_dict(by_alias=True)["mode_int"], RulesetInt)
+
+    def test_nested(self):
+        covers = {name: name for name in Covers.__struct_fields__}
+        data = CoversList(covers=[Covers(**covers), None]).to_dict()
+        self.assertEqual([covers, None], data["covers"])
+        ranked = msgspec.convert(beatmap(53), BeatmapExtended).to_dict()["ranked"]
+        self.assertIs(RankStatusInt(1), ranked)
+        data = Nested(scores={"best": self.score}).to_dict()
+        self.assertIs(RulesetInt.OSU, data["scores"]["best"]["mode_int"])
+
+    def test_compact(self):
+        restored = decode_compact(encode_compact(self.score), Score)
+        self.assertEqual(self.score.to_dict(omit_none=True), restored.to_dict(omit_none=True))
+        self.assertEqual(self.score.to_dict(by_alias=True), restored.to_dict(by_alias=True))
+
+
+class TestJsonLines(unittest.TestCase):
+    def test_chunks(self):
+        scores = [msgspec.convert(SCORE | {"id": index}, Score) for index in range(5)]
+        chunks = list(to_json_lines(iter(scores), chunk_size=2))
+        self.assertEqual(3, len(chunks))
+        lines = b"".join(chunks).splitlines()
+        self.assertEqual(scores, [msgspec.json.decode(line, type=Score) for line in lines])
+        self.assertEqual([], list(to_json_lines([])))
+
+
+if __name__ == '__main__':
+    unittest.main()
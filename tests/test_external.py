@@ -0,0 +1,121 @@
+import unittest
+import asyncio
+import os
+import tempfile
+from array import array
+import httpx
+from circleapi import ExternalApi, AsyncExternalApi, BeatmapIdsCache, diff_sorted_ids, load_ids_snapshot
+
+
+DOCUMENT = {"ranked": {"beatmaps": [55, 53, 75]}, "loved": {"beatmaps": [24722, 53]}}
+
+
+class LeaMoeHandler:
+    def __init__(self):
+        self.requests = []
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, json=DOCUMENT, headers={"ETag": '"v1"'})
+
+
+class TestExternalApi(unittest.TestCase):
+    def setUp(self):
+        self.handler = LeaMoeHandler()
+
+        class MockExternalApi(ExternalApi):
+            cache = BeatmapIdsCache()
+            _client = httpx.Client(transport=httpx.MockTransport(self.handler))
+
+        self.api = MockExternalApi
+
+    def test_accessors_share_one_fetch(self):
+        self.assertEqual([53, 55, 75], self.api.get_ranked_ids())
+        self.assertEqual([53, 24722], self.api.get_loved_ids())
+        self.assertEqual([53, 55, 75, 24722], self.api.get_ranked_and_loved_ids())
+        self.assertEqual(array("i", [53, 55, 75, 24722]), self.api.get_beatmap_ids().ranked_and_loved)
+        self.assertEqual(1, len(self.handler.requests))
+
+    def test_returned_ids_are_copies(self):
+        self.api.get_ranked_ids().append(1)
+        self.assertEqual([53, 55, 75], self.api.get_ranked_ids())
+
+    def test_revalidation(self):
+        ids = self.api.get_beatmap_ids()
+        self.api.cache.max_age = 0
+        self.assertIs(ids, self.api.get_beatmap_ids())
+        self.assertEqual(2, len(self.handler.requests))
+        self.assertEqual('"v1"', self.handler.requests[1].headers["If-None-Match"])
+
+
+class TestAsyncExternalApi(unittest.TestCase):
+    def test_lock_per_event_loop(self):
+        handler = LeaMoeHandler()
+
+        async def slow_handler(request: httpx.Request) -> httpx.Response:
+            await asyncio.sleep(0.01)
+            return handler(request)
+
+        class MockAsyncExternalApi(AsyncExternalApi):
+            cache = BeatmapIdsCache(max_age=0)
+            transport = httpx.MockTransport(slow_handler)
+
+        async def fetch():
+            return await asyncio.gather(MockAsyncExternalApi.get_ranked_ids(), MockAsyncExternalApi.get_loved_ids())
+
+        # Concurrent callers on two successive event loops
+        self.assertEqual([[53, 55, 75], [53, 24722]], asyncio.run(fetch()))
+        self.assertEqual([[53, 55, 75], [53, 24722]], asyncio.run(fetch()))
+        self.assertEqual(4, len(handler.requests))
+
+
+class TestBeatmapIdsCache(unittest.TestCase):
+    def test_disk_cache(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filepath = os.path.join(tmp_dir, "lea_moe")
+            cache = BeatmapIdsCache(filepath)
+            self.assertFalse(cache.is_fresh())
+            self.assertEqual({}, cache.headers)
+            request = httpx.Request("GET", ExternalApi.url)
+            cache.update(httpx.Response(200, json=DOCUMENT, headers={"ETag": '"v1"'}, request=request))
+
+            cache = BeatmapIdsCache(filepath)
+            self.assertTrue(cache.is_fresh())
+            self.assertEqual(array("i", [53, 55, 75, 24722]), cache.ids.ranked_and_loved)
+            self.assertEqual({"If-None-Match": '"v1"'}, cache.headers)
+
+
+class TestIdsDiff(unittest.TestCase):
+    def test_diff_sorted_ids(self):
+        diff = diff_sorted_ids(array("i", [1, 2, 4, 6, 9]), array("i", [0, 2, 3, 4, 9, 10, 11]))
+        self.assertEqual(array("i", [0, 3, 10, 11]), diff.added)
+        self.assertEqual(array("i", [1, 6]), diff.removed)
+
+    def test_diff_empty(self):
+        diff = diff_sorted_ids(array("i"), array("i", [1, 2]))
+        self.assertEqual(array("i", [1, 2]), diff.added)
+        self.assertEqual(array("i"), diff.removed)
+
+    def test_get_ranked_and_loved_diff(self):
+        handler = LeaMoeHandler()
+
+        class MockExternalApi(ExternalApi):
+            cache = BeatmapIdsCache()
+            _client = httpx.Client(transport=httpx.MockTransport(handler))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filepath = os.path.join(tmp_dir, "snapshot")
+            diff = MockExternalApi.get_ranked_and_loved_diff(filepath, update_snapshot=False)
+            self.assertEqual(array("i", [53, 55, 75, 24722]), diff.added)
+            self.assertEqual(array("i"), load_ids_snapshot(filepath))
+
+            MockExternalApi.get_ranked_and_loved_diff(filepath)
+            self.assertEqual(array("i", [53, 55, 75, 24722]), load_ids_snapshot(filepath))
+            diff = MockExternalApi.get_ranked_and_loved_diff(filepath)
+            self.assertEqual((array("i"), array("i")), (diff.added, diff.removed))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from datetime import datetime, timedelta, timezone
+import msgspec
+from circleapi import BaseStruct, Score, BeatmapExtended, projection
+from circleapi.models import StatisticsOsu
+from mock_api import beatmap
+from test_decode import SCORE
+
+
+class TestHash(unittest.TestCase):
+    def test_natural_key(self):
+        first = msgspec.convert(beatmap(53), BeatmapExtended)
+        second = msgspec.convert(beatmap(53) | {"playcount": 1}, BeatmapExtended)
+        self.assertEqual(hash(first), hash(second))
+        # Same id, different content: both kept
+        self.assertEqual(2, len({first, second}))
+        self.assertEqual(1, len({first, msgspec.convert(beatmap(53), BeatmapExtended)}))
+
+    def test_type_is_part_of_the_key(self):
+        score = msgspec.convert(SCORE, Score)
+        self.assertNotEqual(hash(score), hash(msgspec.convert(SCORE, projection(Score, ["id"]))))
+
+    def test_structural(self):
+        first = msgspec.convert(SCORE["statistics"], StatisticsOsu)
+        second = msgspec.convert(SCORE["statistics"], StatisticsOsu)
+        third = msgspec.convert(SCORE["statistics"] | {"count_miss": 1}, StatisticsOsu)
+        self.assertEqual(hash(first), hash(second))
+        self.assertNotEqual(hash(first), hash(third))
+        self.assertEqual(2, len({first, second, third}))
+
+    def test_equal_values(self):
+        class Sample(BaseStruct):
+            value: float
+            at: datetime
+            tags: list[float]
+
+        first = Sample(0.0, datetime(2024, 1, 1, 12, tzinfo=timezone.utc), [0.0])
+        second = Sample(-0.0, datetime(2024, 1, 1, 14, tzinfo=timezone(timedelta(hours=2))), [-0.0])
+        self.assertEqual(first, second)
+        self.assertEqual(hash(first), hash(second))
+        self.assertEqual(1, len({first, second}))
+
+    def test_deduplicate(self):
+        scores = [msgspec.convert(SCORE | {"id": index % 100}, Score) for index in range(1000)]
+        self.assertEqual(100, len(set(scores)))
+
+
+if __name__ == '__main__':
+    unittest.main()
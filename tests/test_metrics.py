@@ -0,0 +1,104 @@
+import unittest
+import httpx
+from circleapi import Metrics, MemoryCache, RetryPolicy
+from circleapi.metrics import (
+    REQUESTS, REQUEST_DURATION, RESPONSE_SIZE, RATE_LIMIT_WAIT, TOKEN_REFRESHES, RETRIES, CACHE_HITS
+)
+from circleapi.utils import extract_payload_from_token
+from mock_api import MockApiV2, MockAsyncApiV2, beatmap, fake_access_token
+from test_retry import FlakyHandler
+
+
+class TestMetrics(unittest.TestCase):
+    def test_counter(self):
+        metrics = Metrics()
+        self.assertIsNone(metrics.get("calls_total"))
+        metrics.inc("calls_total", {"b": "2", "a": "1"})
+        metrics.inc("calls_total", {"a": "1", "b": "2"}, value=2)
+        self.assertEqual(3, metrics.get("calls_total", {"a": "1", "b": "2"}))
+
+    def test_histogram(self):
+        metrics = Metrics(buckets={"latency_seconds": (0.1, 1)})
+        for value in (0.05, 0.1, 0.5, 5):
+            metrics.observe("latency_seconds", value)
+        histogram = metrics.get("latency_seconds")
+        self.assertEqual((2, 1, 1), histogram.counts)
+        self.assertEqual(4, histogram.count)
+        self.assertAlmostEqual(5.65, histogram.sum)
+
+    def test_render(self):
+        metrics = Metrics(buckets={"latency_seconds": (0.1, 1)})
+        metrics.inc(REQUESTS, {"endpoint": "get_beatmap", "status": "200"})
+        metrics.inc("odd_total", {"path": 'a"b\\c'})
+        metrics.observe("latency_seconds", 0.5, {"endpoint": "get_beatmap"})
+        metrics.observe("latency_seconds", 2, {"endpoint": "get_beatmap"})
+        lines = metrics.render().splitlines()
+        self.assertIn(f"# TYPE {REQUESTS} counter", lines)
+        self.assertIn(f'{REQUESTS}{{endpoint="get_beatmap",status="200"}} 1', lines)
+        self.assertIn('odd_total{path="a\\"b\\\\c"} 1', lines)
+        self.assertIn("# TYPE latency_seconds histogram", lines)
+        self.assertIn('latency_seconds_bucket{endpoint="get_beatmap",le="0.1"} 0', lines)
+        self.assertIn('latency_seconds_bucket{endpoint="get_beatmap",le="1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{endpoint="get_beatmap",le="+Inf"} 2', lines)
+        self.assertIn('latency_seconds_sum{endpoint="get_beatmap"} 2.5', lines)
+        self.assertIn('latency_seconds_count{endpoint="get_beatmap"} 2', lines)
+        self.assertEqual("", Metrics().render())
+
+
+class TestApiMetrics(unittest.TestCase):
+    def test_request(self):
+        metrics = Metrics()
+        body = httpx.Response(200, json=beatmap(53)).read()
+        api = MockApiV2(lambda request: httpx.Response(200, content=body), metrics=metrics)
+        api.get_beatmap(53)
+        labels = {"endpoint": "get_beatmap"}
+        self.assertEqual(1, metrics.get(REQUESTS, labels | {"method": "GET", "status": "200"}))
+        self.assertEqual(1, metrics.get(REQUEST_DURATION, labels).count)
+        self.assertEqual(1, metrics.get(RATE_LIMIT_WAIT, labels).count)
+        self.assertEqual(len(body), metrics.get(RESPONSE_SIZE, labels).sum)
+        self.assertIsNone(metrics.get(TOKEN_REFRESHES, {"reason": "expired"}))
+
+    def test_retries(self):
+        metrics = Metrics()
+        handler = FlakyHandler(httpx.Response(503), httpx.ConnectError("boom"))
+        api = MockApiV2(handler, retry_policy=RetryPolicy(base_delay=0.01), metrics=metrics)
+        api.get_beatmap(53)
+        self.assertEqual(1, metrics.get(RETRIES, {"endpoint": "get_beatmap", "reason": "503"}))
+        self.assertEqual(1, metrics.get(RETRIES, {"endpoint": "get_beatmap", "reason": "transport"}))
+        self.assertEqual(1, metrics.get(REQUESTS, {"endpoint": "get_beatmap", "method": "GET", "status": "error"}))
+        self.assertEqual(3, metrics.get(REQUEST_DURATION, {"endpoint": "get_beatmap"}).count
+                         + metrics.get(REQUESTS, {"endpoint": "get_beatmap", "method": "GET", "status": "error"}))
+
+    def test_token_refresh(self):
+        metrics = Metrics()
+        api = MockApiV2(FlakyHandler(httpx.Response(401)), metrics=metrics)
+
+        def request_token():
+            new_token = fake_access_token()
+            api.token._snapshot = api.token._snapshot.create(new_token, extract_payload_from_token(new_token))
+
+        api.token._request_token = request_token
+        api.get_beatmap(53)
+        self.assertEqual(1, metrics.get(TOKEN_REFRESHES, {"reason": "401"}))
+        self.assertEqual(1, metrics.get(RETRIES, {"endpoint": "get_beatmap", "reason": "401"}))
+
+    def test_cache_hit(self):
+        metrics = Metrics()
+        api = MockApiV2(lambda request: httpx.Response(200, json=beatmap(53)), cache=MemoryCache(), metrics=metrics)
+        api.get_beatmap(53)
+        api.get_beatmap(53)
+        self.assertEqual(1, metrics.get(CACHE_HITS, {"endpoint": "get_beatmap", "cache": "response"}))
+        self.assertEqual(1, metrics.get(REQUESTS, {"endpoint": "get_beatmap", "method": "GET", "status": "200"}))
+
+
+class TestAsyncApiMetrics(unittest.IsolatedAsyncioTestCase):
+    async def test_request(self):
+        metrics = Metrics()
+        handler = FlakyHandler(httpx.Response(500))
+        api = MockAsyncApiV2(handler, retry_policy=RetryPolicy(base_delay=0.01), metrics=metrics)
+        await api.get_beatmap(53)
+        labels = {"endpoint": "get_beatmap"}
+        self.assertEqual(1, metrics.get(REQUESTS, labels | {"method": "GET", "status": "500"}))
+        self.assertEqual(1, metrics.get(REQUESTS, labels | {"method": "GET", "status": "200"}))
+        self.assertEqual(1, metrics.get(RETRIES, labels | {"reason": "500"}))
+        self.assertEqual(2, metrics.get(RATE_LIMIT_WAIT, labels).count)
@@ -0,0 +1,74 @@
+import asyncio
+import unittest
+from collections import Counter
+import httpx
+from circleapi import TokenPool, AsyncTokenPool, GuestToken, AsyncGuestToken, BeatmapExtended, RetryPolicy
+from mock_api import MockApiV2, MockAsyncApiV2, fake_token, beatmap
+
+
+class PoolHandler:
+    def __init__(self, throttled: set[str] = frozenset()):
+        self.throttled = throttled
+        self.calls = Counter()
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        authorization = request.headers["Authorization"]
+        self.calls[authorization] += 1
+        if authorization in self.throttled:
+            return httpx.Response(429)
+        return httpx.Response(200, json=beatmap(53))
+
+
+class TestTokenPool(unittest.TestCase):
+    def test_spread_load(self):
+        pool = TokenPool([fake_token(), fake_token()], req_per_minute=600)
+        handler = PoolHandler()
+        api = MockApiV2(handler, token=pool)
+        for _ in range(10):
+            api.get_beatmap(53)
+        self.assertEqual([5, 5], sorted(handler.calls.values()))
+
+    def test_rotate_on_429(self):
+        tokens = [fake_token(), fake_token()]
+        pool = TokenPool(tokens, cooldown=60)
+        handler = PoolHandler({tokens[0].headers["Authorization"]})
+        api = MockApiV2(handler, token=pool, retry_policy=RetryPolicy(base_delay=0.01))
+        for _ in range(5):
+            self.assertIsInstance(api.get_beatmap(53), BeatmapExtended)
+        # The throttled credential is left out after its first 429
+        self.assertEqual(1, handler.calls[tokens[0].headers["Authorization"]])
+        self.assertEqual(5, handler.calls[tokens[1].headers["Authorization"]])
+
+    def test_has_scope(self):
+        pool = TokenPool([fake_token(), fake_token()])
+        self.assertTrue(pool.has_scope("public"))
+        self.assertFalse(pool.has_scope("chat.write"))
+
+    def test_empty_pool(self):
+        with self.assertRaises(ValueError):
+            TokenPool([])
+
+    def test_from_credentials(self):
+        pool = TokenPool.from_credentials([(1, "a"), (2, "b")], req_per_minute=60)
+        self.assertEqual(2, len(pool))
+        self.assertIsInstance(pool.credentials[0].token, GuestToken)
+        self.assertEqual(1, pool.credentials[0].rate_limit.max_req_per_sec)
+
+
+class TestAsyncTokenPool(unittest.TestCase):
+    def test_rotate_on_429(self):
+        async def run():
+            tokens = [fake_token(AsyncGuestToken), fake_token(AsyncGuestToken)]
+            pool = AsyncTokenPool(tokens, cooldown=60)
+            handler = PoolHandler({tokens[1].headers["Authorization"]})
+            api = MockAsyncApiV2(handler, token=pool, retry_policy=RetryPolicy(base_delay=0.01), coalesce_requests=False)
+            results = await asyncio.gather(*[api.get_beatmap(53) for _ in range(4)])
+            self.assertTrue(all(isinstance(result, BeatmapExtended) for result in results))
+            self.assertLessEqual(handler.calls[tokens[1].headers["Authorization"]], 4)
+            self.assertTrue(await pool.has_scope("public"))
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
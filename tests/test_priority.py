@@ -0,0 +1,165 @@
+import asyncio
+import threading
+import time
+import unittest
+import httpx
+from circleapi import RateLimit, AsyncRateLimit
+from circleapi.utils import _FairQueue
+from mock_api import MockApiV2, MockAsyncApiV2, beatmap
+
+
+def drain_order(queue: _FairQueue, entries: dict) -> list:
+    order = []
+    while len(queue):
+        head = queue.head()
+        queue.served(head)
+        queue.remove(head)
+        order.append(next(name for name, entry in entries.items() if entry is head))
+    return order
+
+
+class TestFairQueue(unittest.TestCase):
+    def test_fifo(self):
+        queue = _FairQueue()
+        entries = {name: queue.push(1, 0, None, 1) for name in "abcd"}
+        self.assertEqual(list("abcd"), drain_order(queue, entries))
+
+    def test_priority(self):
+        queue = _FairQueue()
+        entries = {"low": queue.push(1, 0, None, 1), "high": queue.push(1, 10, None, 1)}
+        self.assertEqual(["high", "low"], drain_order(queue, entries))
+
+    def test_fair_share(self):
+        queue = _FairQueue()
+        entries = {f"a{i}": queue.push(1, 0, "a", 1) for i in range(4)}
+        entries |= {f"b{i}": queue.push(1, 0, "b", 1) for i in range(2)}
+        self.assertEqual(["a0", "b0", "a1", "b1", "a2", "a3"], drain_order(queue, entries))
+
+    def test_weighted_share(self):
+        queue = _FairQueue()
+        entries = {f"a{i}": queue.push(1, 0, "a", 1) for i in range(3)}
+        entries |= {f"b{i}": queue.push(1, 0, "b", 2) for i in range(4)}
+        self.assertEqual(["b0", "a0", "b1", "b2", "a1", "b3", "a2"], drain_order(queue, entries))
+
+
+class TestPriorityRateLimit(unittest.TestCase):
+    def test_high_priority_skips_ahead(self):
+        rate_limit = RateLimit(600)
+        rate_limit.acquire(10)
+        order = []
+
+        def acquire(name, priority):
+            rate_limit.acquire(5, priority=priority)
+            order.append(name)
+
+        threads = [threading.Thread(target=acquire, args=("low", 0))]
+        threads[0].start()
+        time.sleep(0.05)
+        threads.append(threading.Thread(target=acquire, args=("high", 10)))
+        threads[1].start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(["high", "low"], order)
+
+    def test_async_high_priority_skips_ahead(self):
+        async def run():
+            rate_limit = AsyncRateLimit(600)
+            await rate_limit.acquire(10)
+            order = []
+
+            async def acquire(name, priority):
+                await rate_limit.acquire(5, priority=priority)
+                order.append(name)
+
+            low = asyncio.create_task(acquire("low", 0))
+            await asyncio.sleep(0.05)
+            await asyncio.gather(low, acquire("high", 10))
+            self.assertEqual(["high", "low"], order)
+
+        asyncio.run(run())
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    if request.url.path.endswith("/beatmaps"):
+        return httpx.Response(200, json={"beatmaps": [beatmap(53)]})
+    return httpx.Response(200, json=beatmap(53))
+
+
+class TestApiPriority(unittest.TestCase):
+    def test_context_reaches_rate_limit(self):
+        api = MockApiV2(handler, tenant_weights={"bot": 3})
+        calls = []
+        acquire = api.rate_limit.acquire
+
+        def record(*args, **kwargs):
+            calls.append((kwargs["priority"], kwargs["tenant"], kwargs["weight"]))
+            return acquire(*args, **kwargs)
+
+        api.rate_limit.acquire = record
+        api.get_beatmap(1)
+        with api.priority(5, tenant="bot"):
+            api.get_beatmap(2)
+            list(api.batch([("get_beatmap", {"beatmap_id": 3})]))
+            list(api.iter_beatmaps_bulk([4]))
+        self.assertEqual([(0, None, 1), (5, "bot", 3), (5, "bot", 3), (5, "bot", 3)], calls)
+
+    def test_async_context_reaches_rate_limit(self):
+        async def run():
+            api = MockAsyncApiV2(handler)
+            calls = []
+            acquire = api.rate_limit.acquire
+
+            async def record(*args, **kwargs):
+                calls.append((kwargs["priority"], kwargs["tenant"]))
+                return await acquire(*args, **kwargs)
+
+            api.rate_limit.acquire = record
+            with api.priority(5, tenant="user"):
+                await asyncio.gather(api.get_beatmap(1), api.get_beatmap(2))
+            await api.get_beatmap(3)
+            self.assertEqual([(5, "user"), (5, "user"), (0, None)], calls)
+
+        asyncio.run(run())
+
+
+class TestCoalescingPriority(unittest.TestCase):
+    def test_high_priority_not_coalesced_with_low(self):
+        api = MockApiV2(handler, rate_limit=RateLimit(600))
+        api.rate_limit.acquire(10)
+        order = []
+
+        def get_beatmap(name, priority):
+            with api.priority(priority):
+                api.get_beatmap(53)
+            order.append(name)
+
+        threads = [threading.Thread(target=get_beatmap, args=("low", 0))]
+        threads[0].start()
+        time.sleep(0.05)
+        threads.append(threading.Thread(target=get_beatmap, args=("high", 10)))
+        threads[1].start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(["high", "low"], order)
+
+    def test_async_high_priority_not_coalesced_with_low(self):
+        async def run():
+            api = MockAsyncApiV2(handler, rate_limit=AsyncRateLimit(600))
+            await api.rate_limit.acquire(10)
+            order = []
+
+            async def get_beatmap(name, priority):
+                with api.priority(priority):
+                    await api.get_beatmap(53)
+                order.append(name)
+
+            low = asyncio.create_task(get_beatmap("low", 0))
+            await asyncio.sleep(0.05)
+            await asyncio.gather(low, get_beatmap("high", 10))
+            self.assertEqual(["high", "low"], order)
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+import pstats
+import httpx
+from circleapi import RequestProfiler, RetryPolicy, MemoryCache, BeatmapExtended
+from mock_api import MockApiV2, MockAsyncApiV2, beatmap
+from test_retry import FlakyHandler
+
+
+def phase_names(timing) -> list[str]:
+    return [phase[0] for phase in timing.phases]
+
+
+class TestTimingHooks(unittest.TestCase):
+    def test_phases(self):
+        timings = []
+        api = MockApiV2(lambda request: httpx.Response(200, json=beatmap(53)), timing_hooks=[timings.append])
+        self.assertIsInstance(api.get_beatmap(53), BeatmapExtended)
+        self.assertEqual(1, len(timings))
+        timing = timings[0]
+        self.assertEqual("get_beatmap", timing.endpoint)
+        self.assertEqual("GET", timing.method)
+        self.assertEqual(200, timing.status_code)
+        self.assertIsNone(timing.error)
+        self.assertEqual(["rate_limit", "token", "network", "decode"], phase_names(timing))
+        previous = timing.start
+        for _, start, end in timing.phases:
+            self.assertLessEqual(previous, start)
+            self.assertLessEqual(start, end)
+            previous = end
+        self.assertLessEqual(previous, timing.end)
+        self.assertAlmostEqual(timing.total, timing.end - timing.start)
+
+    def test_retries(self):
+        timings = []
+        handler = FlakyHandler(httpx.Response(503), httpx.ConnectError("boom"))
+        api = MockApiV2(handler, retry_policy=RetryPolicy(base_delay=0.01), timing_hooks=[timings.append])
+        api.get_beatmap(53)
+        timing = timings[0]
+        self.assertEqual(3, timing.attempts)
+        self.assertEqual(2, phase_names(timing).count("backoff"))
+        self.assertGreaterEqual(timing.durations()["backoff"], 0.02)
+
+    def test_error(self):
+        timings = []
+        api = MockApiV2(lambda request: httpx.Response(404), timing_hooks=[timings.append])
+        with self.assertRaises(httpx.HTTPStatusError):
+            api.get_beatmap(53)
+        self.assertIsInstance(timings[0].error, httpx.HTTPStatusError)
+        self.assertEqual(404, timings[0].status_code)
+
+    def test_cache(self):
+        timings = []
+        api = MockApiV2(lambda request: httpx.Response(200, json=beatmap(53)), cache=MemoryCache(),
+                        timing_hooks=[timings.append])
+        api.get_beatmap(53)
+        api.get_beatmap(53)
+        self.assertEqual(["cache", "decode"], phase_names(timings[1]))
+
+    def test_failing_hook(self):
+        def hook(timing):
+            raise RuntimeError("boom")
+
+        timings = []
+        api = MockApiV2(lambda request: httpx.Response(200, json=beatmap(53)), timing_hooks=[hook, timings.append])
+        with self.assertLogs("circleapi", level="ERROR"):
+            self.assertIsInstance(api.get_beatmap(53), BeatmapExtended)
+        self.assertEqual(1, len(timings))
+
+
+class TestRequestProfiler(unittest.TestCase):
+    def test_cprofile(self):
+        timings = []
+        profiler = RequestProfiler(every=2)
+        api = MockApiV2(lambda request: httpx.Response(200, json=beatmap(53)), coalesce_requests=False,
+                        timing_hooks=[timings.append], profiler=profiler)
+        for _ in range(4):
+            api.get_beatmap(53)
+        self.assertEqual([False, True, False, True], [timing.profile is not None for timing in timings])
+        self.assertIsInstance(timings[1].profile, pstats.Stats)
+        self.assertEqual(2, profiler.samples)
+        self.assertIsInstance(profiler.stats, pstats.Stats)
+
+    def test_tracemalloc(self):
+        timings = []
+        profiler = RequestProfiler(every=1, mode="tracemalloc", top=5)
+        api = MockApiV2(lambda request: httpx.Response(200, json=beatmap(53)), timing_hooks=[timings.append],
+                        profiler=profiler)
+        api.get_beatmap(53)
+        self.assertIsInstance(timings[0].profile, list)
+        self.assertLessEqual(len(timings[0].profile), 5)
+
+    def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            RequestProfiler(mode="perf")
+
+
+class TestAsyncTimingHooks(unittest.IsolatedAsyncioTestCase):
+    async def test_phases(self):
+        timings = []
+        handler = FlakyHandler(httpx.Response(500))
+        api = MockAsyncApiV2(handler, retry_policy=RetryPolicy(base_delay=0.01), timing_hooks=[timings.append],
+                             profiler=RequestProfiler(every=1))
+        await api.get_beatmap(53)
+        timing = timings[0]
+        self.assertEqual(2, timing.attempts)
+        self.assertEqual(["rate_limit", "token", "network", "backoff", "rate_limit", "token", "network", "decode"],
+                         phase_names(timing))
+        self.assertIsInstance(timing.profile, pstats.Stats)
@@ -0,0 +1,74 @@
+import unittest
+import httpx
+import msgspec
+from circleapi import BeatmapScores, BeatmapsExtended, Score, projection
+from circleapi.utils import decode_response
+from mock_api import MockApiV2, beatmap
+from test_decode import SCORE
+
+
+class TestProjection(unittest.TestCase):
+    def test_nested_fields(self):
+        scores = projection(BeatmapScores, ["scores.id", "scores.pp", "scores.statistics.count_300"])
+        self.assertEqual(("scores",), scores.__struct_fields__)
+        data = msgspec.json.decode(msgspec.json.encode({"scores": [SCORE]}), type=scores)
+        self.assertEqual(1, data.scores[0].id)
+        self.assertEqual(100.0, data.scores[0].pp)
+        self.assertEqual(100, data.scores[0].statistics.count_300)
+        self.assertFalse(hasattr(data.scores[0], "created_at"))
+
+    def test_cached(self):
+        self.assertIs(projection(Score, ["id", "pp"]), projection(Score, ("pp", "id", "pp")))
+
+    def test_invalid_fields(self):
+        with self.assertRaises(ValueError):
+            projection(Score, ["id", "unknown"])
+        with self.assertRaises(ValueError):
+            projection(Score, ["pp.value"])
+
+    def test_validation_is_kept(self):
+        with self.assertRaises(msgspec.ValidationError):
+            msgspec.json.decode(b'{"id": "1"}', type=projection(Score, ["id"]))
+
+    def test_missing_values_are_added(self):
+        content = msgspec.json.encode({"scores": [SCORE], "user_score": {"position": 1, "score": SCORE}})
+        args = {"beatmap_id": 53, "scope": "country"}
+        fields = ["scores.id", "scores.beatmap_id", "user_score.score.beatmap_id", "scope"]
+        data = decode_response(content, projection(BeatmapScores, fields), args)
+        self.assertEqual("country", data.scope)
+        self.assertEqual(53, data.scores[0].beatmap_id)
+        self.assertEqual(53, data.user_score.score.beatmap_id)
+
+    def test_as_dict(self):
+        content = msgspec.json.encode({"scores": [SCORE], "user_score": {"position": 1, "score": SCORE}})
+        args = {"beatmap_id": 53, "scope": "country"}
+        data = decode_response(content, projection(BeatmapScores, ["scores.id", "user_score.score.id"]), args, as_dict=True)
+        self.assertEqual({"id": 1, "beatmap_id": 53, "scope": "country"}, data["scores"][0])
+        self.assertEqual({"id": 1, "beatmap_id": 53, "scope": "country"}, data["user_score"]["score"])
+        self.assertEqual("country", data["scope"])
+
+    def test_endpoint_fields_as_dict(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, json={"scores": [SCORE]})
+
+        api = MockApiV2(handler)
+        full = api.get_beatmap_scores(54, as_dict=True)
+        data = api.get_beatmap_scores(54, as_dict=True, fields=["scores.id"])
+        self.assertEqual(54, full["scores"][0]["beatmap_id"])
+        self.assertEqual({"id", "args", "beatmap_id", "scope"}, data["scores"][0].keys())
+        self.assertEqual(54, data["scores"][0]["beatmap_id"])
+
+    def test_endpoint_fields(self):
+        def handler(request: httpx.Request) -> httpx.Response:
+            return httpx.Response(200, json={"beatmaps": [beatmap(53), beatmap(54)]})
+
+        api = MockApiV2(handler)
+        data = api.get_beatmaps([53, 54], fields=["beatmaps.id"])
+        self.assertEqual([53, 54], [item.id for item in data.beatmaps])
+        self.assertIsNot(BeatmapsExtended, type(data))
+        data = api.get_beatmaps_bulk([53, 54], fields=["beatmaps.id", "beatmaps.accuracy"])
+        self.assertEqual([7.0, 7.0], [item.accuracy for item in data.beatmaps])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,6 @@
 import unittest
 import time
+import threading
 from circleapi import RateLimit
 
 
@@ -32,6 +33,48 @@ class TestRateLimit(unittest.TestCase):
         time.sleep(1)
         self.assertFalse(rate_limit.is_exceeded(), "Test if not exceeded")
 
+    def test_acquire_waits_exact_refill_time(self):
+        # 10 req/s
+        rate_limit = RateLimit(600)
+        start = time.monotonic()
+        for _ in range(10):
+            self.assertTrue(rate_limit.acquire())
+        self.assertLess(time.monotonic() - start, 0.05, "Test if full bucket doesn't wait")
+
+        start = time.monotonic()
+        for _ in range(5):
+            self.assertTrue(rate_limit.acquire())
+        self.assertAlmostEqual(0.5, time.monotonic() - start, delta=0.1)
+
+    def test_acquire_timeout(self):
+        rate_limit = RateLimit(60)
+        self.assertTrue(rate_limit.acquire())
+        self.assertFalse(rate_limit.acquire(timeout=0.1), "Test if timed out")
+        self.assertTrue(rate_limit.is_exceeded(), "Test if exceeded")
+
+    def test_acquire_fifo(self):
+        # 20 req/s
+        rate_limit = RateLimit(1200)
+        rate_limit.acquire(20)
+        order = []
+
+        def worker(index):
+            rate_limit.acquire()
+            order.append(index)
+
+        threads = []
+        for index in range(5):
+            threads.append(threading.Thread(target=worker, args=(index,)))
+            threads[-1].start()
+            time.sleep(0.01)
+        for thread in threads:
+            thread.join()
+        self.assertEqual([0, 1, 2, 3, 4], order)
+
+    def test_acquire_too_many(self):
+        with self.assertRaises(ValueError):
+            RateLimit(60).acquire(2)
+
 
 if __name__ == "__main__":
     unittest.main()
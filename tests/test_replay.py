@@ -0,0 +1,122 @@
+import base64
+import os
+import tempfile
+import time
+import unittest
+import httpx
+import msgspec
+from circleapi import (
+    ApiV2, AsyncApiV2, GuestToken, AsyncGuestToken, UserToken, BeatmapExtended,
+    RecordTransport, ReplayTransport, FixtureNotFound
+)
+from mock_api import beatmap
+
+
+def recorded_access_token() -> str:
+    # Issued an hour ago, replayed tokens must be issued at replay time
+    iat = time.time() - 3600
+    payload = {"aud": 1, "jti": "test", "iat": iat, "nbf": iat, "exp": iat + 86400, "scopes": ["public"]}
+    return f"e30.{base64.b64encode(msgspec.json.encode(payload)).decode()}.signature"
+
+
+class OsuHandler:
+    """
+    Stands for the real api while recording
+    """
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        if request.url.path == "/oauth/token":
+            return httpx.Response(200, json={
+                "token_type": "Bearer", "expires_in": 86400,
+                "access_token": recorded_access_token(), "refresh_token": "secret-refresh-token"
+            })
+        return httpx.Response(200, json=beatmap(int(request.url.path.split("/")[-1])), headers={"ETag": '"v1"'})
+
+
+class TestReplay(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.fixtures = self._dir.name
+        self.handler = OsuHandler()
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def record(self):
+        record = RecordTransport(self.fixtures, transport=httpx.MockTransport(self.handler))
+        with ApiV2(GuestToken(1, "client-secret", transport=record), transport=record) as api:
+            data = api.get_beatmap(53)
+        self.assertEqual(2, record.recorded)
+        return data
+
+    def test_record_then_replay(self):
+        recorded = self.record()
+        replay = ReplayTransport(self.fixtures)
+        with ApiV2(GuestToken(2, "other-secret", transport=replay), transport=replay) as api:
+            data = api.get_beatmap(53)
+            self.assertIsInstance(data, BeatmapExtended)
+            self.assertEqual(recorded, data)
+            self.assertEqual('"v1"', api._get_client().get("/beatmaps/53").headers["ETag"])
+        self.assertEqual(2, self.handler.calls)
+        self.assertEqual(3, replay.served)
+
+    def test_fixtures_hold_no_secret(self):
+        self.record()
+        for name in os.listdir(self.fixtures):
+            with open(os.path.join(self.fixtures, name), "rb") as f:
+                content = f.read()
+            for secret in (b"client-secret", b"secret-refresh-token", b"signature"):
+                self.assertNotIn(secret, content)
+
+    def test_replayed_token_is_fresh(self):
+        self.record()
+        token = GuestToken(1, "client-secret", transport=ReplayTransport(self.fixtures))
+        token.check_token()
+        self.assertGreater(token.payload.exp, time.time() + 86000)
+        # A valid token is not requested again
+        self.assertTrue(token.check_token())
+
+    def test_user_token_refresh(self):
+        self.record()
+        record = RecordTransport(self.fixtures, transport=httpx.MockTransport(self.handler))
+        token = UserToken(1, "client-secret", transport=record)
+        token.refresh_token = "secret-refresh-token"
+        token._refresh_token()
+
+        token = UserToken(1, "client-secret", transport=ReplayTransport(self.fixtures))
+        token.refresh_token = "redacted"
+        token._refresh_token()
+        self.assertTrue(token.check_token())
+
+    def test_missing_fixture(self):
+        self.record()
+        replay = ReplayTransport(self.fixtures)
+        with ApiV2(GuestToken(transport=replay), transport=replay) as api:
+            with self.assertRaises(FixtureNotFound):
+                api.get_beatmap(54)
+
+    def test_latency(self):
+        self.record()
+        replay = ReplayTransport(self.fixtures, latency=0.05)
+        with ApiV2(GuestToken(transport=replay), transport=replay) as api:
+            start = time.perf_counter()
+            api.get_beatmap(53)
+            # Token request then beatmap request
+            self.assertGreaterEqual(time.perf_counter() - start, 0.1)
+
+
+class TestAsyncReplay(unittest.IsolatedAsyncioTestCase):
+    async def test_record_then_replay(self):
+        with tempfile.TemporaryDirectory() as fixtures:
+            record = RecordTransport(fixtures, transport=httpx.MockTransport(OsuHandler()))
+            async with AsyncApiV2(AsyncGuestToken(1, "client-secret", transport=record), transport=record) as api:
+                recorded = await api.get_beatmap(53)
+
+            replay = ReplayTransport(fixtures, latency=0.02)
+            async with AsyncApiV2(AsyncGuestToken(transport=replay), transport=replay) as api:
+                self.assertEqual(recorded, await api.get_beatmap(53))
+                with self.assertRaises(FixtureNotFound):
+                    await api.get_beatmap(54)
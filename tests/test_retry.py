@@ -0,0 +1,105 @@
+import unittest
+import time
+import httpx
+from circleapi import RetryPolicy, BeatmapExtended, RateLimit
+from circleapi.utils import parse_retry_after
+from mock_api import MockApiV2, MockAsyncApiV2, beatmap
+
+
+class FlakyHandler:
+    def __init__(self, *responses: httpx.Response):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        if self.responses:
+            response = self.responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+        return httpx.Response(200, json=beatmap(53))
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_next_delay(self):
+        policy = RetryPolicy(base_delay=1, max_delay=10)
+        self.assertEqual(1, policy.next_delay())
+        delay = 1
+        for _ in range(20):
+            delay = policy.next_delay(delay)
+            self.assertTrue(1 <= delay <= 10)
+
+    def test_parse_retry_after(self):
+        self.assertEqual(2.5, parse_retry_after("2.5"))
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertEqual(0, parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"))
+
+    def test_throttle(self):
+        rate_limit = RateLimit(6000)
+        rate_limit.throttle(retry_after=0.2)
+        self.assertTrue(rate_limit.is_exceeded())
+        start = time.monotonic()
+        rate_limit.acquire()
+        self.assertAlmostEqual(0.2, time.monotonic() - start, delta=0.05)
+
+        rate_limit.throttle(remaining=0)
+        self.assertTrue(rate_limit.is_exceeded())
+
+
+class TestRetry(unittest.TestCase):
+    def test_retry_server_errors(self):
+        handler = FlakyHandler(httpx.Response(502), httpx.Response(503), httpx.ConnectError("boom"))
+        api = MockApiV2(handler, retry_policy=RetryPolicy(base_delay=0.01))
+        self.assertIsInstance(api.get_beatmap(53), BeatmapExtended)
+        self.assertEqual(4, handler.calls)
+
+    def test_give_up(self):
+        handler = FlakyHandler(*[httpx.Response(500) for _ in range(3)])
+        api = MockApiV2(handler, retry_policy=RetryPolicy(max_attempts=3, base_delay=0.01))
+        with self.assertRaises(httpx.HTTPStatusError):
+            api.get_beatmap(53)
+        self.assertEqual(3, handler.calls)
+
+    def test_retry_after(self):
+        handler = FlakyHandler(httpx.Response(429, headers={"Retry-After": "0.3"}))
+        api = MockApiV2(handler, retry_policy=RetryPolicy(base_delay=0.01))
+        start = time.monotonic()
+        api.get_beatmap(53)
+        self.assertGreaterEqual(time.monotonic() - start, 0.3)
+        self.assertEqual(2, handler.calls)
+
+    def test_refresh_token_once_on_401(self):
+        handler = FlakyHandler(httpx.Response(401), httpx.Response(401))
+        api = MockApiV2(handler)
+        refreshes = []
+        api.token._request_token = lambda: refreshes.append(True)
+        with self.assertRaises(httpx.HTTPStatusError):
+            api.get_beatmap(53)
+        self.assertEqual(1, len(refreshes))
+        self.assertEqual(2, handler.calls)
+
+
+class TestAsyncRetry(unittest.IsolatedAsyncioTestCase):
+    async def test_retry_server_errors(self):
+        handler = FlakyHandler(httpx.Response(502), httpx.ReadTimeout("boom"), httpx.Response(429))
+        api = MockAsyncApiV2(handler, retry_policy=RetryPolicy(base_delay=0.01))
+        self.assertIsInstance(await api.get_beatmap(53), BeatmapExtended)
+        self.assertEqual(4, handler.calls)
+
+    async def test_refresh_token_once_on_401(self):
+        handler = FlakyHandler(httpx.Response(401))
+        api = MockAsyncApiV2(handler)
+        refreshes = []
+
+        async def request_token():
+            refreshes.append(True)
+
+        api.token._request_token = request_token
+        self.assertIsInstance(await api.get_beatmap(53), BeatmapExtended)
+        self.assertEqual(1, len(refreshes))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+import asyncio
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import unittest
+import httpx
+from circleapi import RateLimit, GuestToken, AsyncGuestToken, TokenPool
+from circleapi.utils import FileLock, extract_payload_from_token
+from mock_api import MockApiV2, beatmap, fake_access_token, fake_token
+
+
+def _drain(shared_file, results):
+    rate_limit = RateLimit(600, shared_file=shared_file)
+    results.put(sum(not rate_limit.is_exceeded() for _ in range(20)))
+
+
+class TestSharedRateLimit(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.shared_file = os.path.join(self.tmp.name, "ratelimit")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_one_budget(self):
+        first = RateLimit(600, shared_file=self.shared_file)
+        second = RateLimit(600, shared_file=self.shared_file)
+        # 10 req/s shared by both instances
+        taken = sum(not rate_limit.is_exceeded() for _ in range(10) for rate_limit in (first, second))
+        self.assertEqual(10, taken)
+        self.assertTrue(first.is_exceeded())
+
+    def test_shared_pause(self):
+        first = RateLimit(6000, shared_file=self.shared_file)
+        second = RateLimit(6000, shared_file=self.shared_file)
+        first.throttle(retry_after=0.2)
+        start = time.monotonic()
+        second.acquire()
+        self.assertAlmostEqual(0.2, time.monotonic() - start, delta=0.05)
+
+    def test_processes(self):
+        RateLimit(600, shared_file=self.shared_file)
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=_drain, args=(self.shared_file, results)) for _ in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        taken = sum(results.get() for _ in processes)
+        # The bucket refills while the processes start
+        self.assertLess(taken, 20)
+
+    def test_api_rate_limit(self):
+        handler = lambda request: httpx.Response(200, json=beatmap(53))
+        apis = [MockApiV2(handler, rate_limit=RateLimit(600, shared_file=self.shared_file)) for _ in range(2)]
+        for api in apis:
+            api.get_beatmap(53)
+        # Both clients drew from the same 10 req/s budget
+        self.assertEqual(8, sum(not apis[0].rate_limit.is_exceeded() for _ in range(10)))
+
+    def test_pool_rate_limits(self):
+        shared_files = [f"{self.shared_file}_{index}" for index in range(2)]
+        pools = [
+            TokenPool([fake_token(), fake_token()],
+                      rate_limits=[RateLimit(600, shared_file=shared_file) for shared_file in shared_files])
+            for _ in range(2)
+        ]
+        for pool in pools:
+            pool.credentials[0].rate_limit.acquire()
+        self.assertEqual(8, sum(not pools[0].credentials[0].rate_limit.is_exceeded() for _ in range(10)))
+        self.assertEqual(10, sum(not pools[0].credentials[1].rate_limit.is_exceeded() for _ in range(10)))
+        with self.assertRaises(ValueError):
+            TokenPool([fake_token()], rate_limits=[])
+
+
+class TestSharedToken(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.tmp.name, "token")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def shared_token(self, calls):
+        token = GuestToken(filepath=self.filepath, shared=True)
+
+        def request_token():
+            calls.append(1)
+            access_token = fake_access_token()
+            token._snapshot = token._snapshot.create(access_token, extract_payload_from_token(access_token))
+
+        token._request_token = request_token
+        return token
+
+    def test_refresh_once(self):
+        calls = []
+        first, second = self.shared_token(calls), self.shared_token(calls)
+        self.assertFalse(first.check_token())
+        self.assertFalse(second.check_token())
+        self.assertEqual(1, len(calls))
+        self.assertEqual(first.access_token, second.access_token)
+
+    def test_force_refresh(self):
+        calls = []
+        first, second = self.shared_token(calls), self.shared_token(calls)
+        first.check_token()
+        second.check_token()
+        # Both see the same token expiring, only one of them refreshes it
+        first.check_token(force_refresh=True)
+        second.check_token(force_refresh=True)
+        self.assertEqual(2, len(calls))
+        self.assertEqual(first.access_token, second.access_token)
+
+    def test_cancelled_refresh_releases_lock(self):
+        async def run():
+            token = AsyncGuestToken(filepath=self.filepath, shared=True)
+            calls = []
+
+            async def request_token():
+                calls.append(1)
+                access_token = fake_access_token()
+                token._snapshot = token._snapshot.create(access_token, extract_payload_from_token(access_token))
+
+            token._request_token = request_token
+            # Another process holds the lock while the refresh is cancelled
+            holder = FileLock(f"{self.filepath}.lock")
+            holder.acquire()
+            refresh = asyncio.create_task(token.check_token())
+            await asyncio.sleep(0.1)
+            refresh.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await refresh
+            holder.release()
+
+            # Daemon thread, a leaked lock must fail the test instead of hanging it
+            other = FileLock(f"{self.filepath}.lock")
+            thread = threading.Thread(target=other.acquire, daemon=True)
+            thread.start()
+            thread.join(2)
+            self.assertFalse(thread.is_alive())
+            other.release()
+            self.assertFalse(await token.check_token())
+            self.assertEqual(1, len(calls))
+            holder.close()
+            other.close()
+
+        asyncio.run(run())
+
+    def test_needs_filepath(self):
+        with self.assertRaises(ValueError):
+            GuestToken(shared=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
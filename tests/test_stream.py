@@ -0,0 +1,63 @@
+import unittest
+import asyncio
+import httpx
+from circleapi import CallResult, BeatmapExtended
+from mock_api import MockAsyncApiV2, beatmap
+
+
+class CountingHandler:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        beatmap_id = int(request.url.path.split("/")[-1])
+        await asyncio.sleep(0.01 * (beatmap_id % 3))
+        self.in_flight -= 1
+        if beatmap_id == 13:
+            return httpx.Response(404)
+        return httpx.Response(200, json=beatmap(beatmap_id))
+
+
+class TestMapStream(unittest.IsolatedAsyncioTestCase):
+    async def test_map_stream(self):
+        handler = CountingHandler()
+        api = MockAsyncApiV2(handler)
+        consumed = []
+
+        def kwargs_iterable():
+            for beatmap_id in range(1, 31):
+                consumed.append(beatmap_id)
+                yield {"beatmap_id": beatmap_id}
+
+        results = []
+        async for call in api.map_stream("get_beatmap", kwargs_iterable(), concurrency=4):
+            self.assertIsInstance(call, CallResult)
+            # Input is consumed lazily
+            self.assertLessEqual(len(consumed), len(results) + 5)
+            results.append(call)
+
+        self.assertEqual(30, len(results))
+        self.assertLessEqual(handler.max_in_flight, 4)
+        errors = [call for call in results if call.error]
+        self.assertEqual([{"beatmap_id": 13}], [call.kwargs for call in errors])
+        self.assertIsInstance(errors[0].error, httpx.HTTPStatusError)
+        self.assertTrue(all(isinstance(call.result, BeatmapExtended) for call in results if not call.error))
+
+    async def test_async_input_and_early_exit(self):
+        api = MockAsyncApiV2(CountingHandler())
+
+        async def kwargs_iterable():
+            for beatmap_id in range(1, 100):
+                yield {"beatmap_id": beatmap_id}
+
+        stream = api.map_stream(api.get_beatmap, kwargs_iterable(), concurrency=2)
+        call = await anext(stream)
+        self.assertIsInstance(call.result, BeatmapExtended)
+        await stream.aclose()
+
+
+if __name__ == "__main__":
+    unittest.main()
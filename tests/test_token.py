@@ -0,0 +1,154 @@
+import asyncio
+import threading
+import time
+import unittest
+import httpx
+from circleapi import GuestToken, AsyncGuestToken
+from circleapi.token import BaseToken
+from circleapi.async_token import AsyncBaseToken
+from circleapi.utils import extract_payload_from_token
+from mock_api import fake_access_token, fake_token
+
+
+class TestTokenSnapshot(unittest.TestCase):
+    def test_valid_token_skips_lock(self):
+        token = fake_token()
+
+        def fail():
+            raise AssertionError("token should not be refreshed")
+
+        token._request_token = fail
+        with token._lock:
+            # Would deadlock if the fast path took the lock
+            self.assertTrue(token.check_token())
+
+    def test_headers_follow_refresh(self):
+        token = fake_token()
+        new_token = fake_access_token()
+
+        def request_token():
+            token._snapshot = token._snapshot.create(new_token, extract_payload_from_token(new_token))
+
+        token._request_token = request_token
+        headers = token.headers
+        self.assertFalse(token.check_token(force_refresh=True))
+        self.assertEqual(token.headers["Authorization"], f"Bearer {new_token}")
+        # Old snapshots are never mutated
+        self.assertNotEqual(headers["Authorization"], token.headers["Authorization"])
+
+    def test_expiring_token_is_refreshed(self):
+        token = GuestToken()
+        token.access_token = fake_access_token(lifetime=60)
+        token.payload = extract_payload_from_token(token.access_token)
+        calls = []
+
+        def request_token():
+            calls.append(1)
+            new_token = fake_access_token()
+            token._snapshot = token._snapshot.create(new_token, extract_payload_from_token(new_token))
+
+        token._request_token = request_token
+        self.assertFalse(token.check_token())
+        self.assertTrue(token.check_token())
+        self.assertEqual(len(calls), 1)
+
+
+class TestBaseToken(unittest.TestCase):
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            BaseToken()
+        with self.assertRaises(TypeError):
+            AsyncBaseToken()
+
+
+class TestTokenUrl(unittest.TestCase):
+    @staticmethod
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url != "http://127.0.0.1:8000/oauth/token":
+            return httpx.Response(404)
+        return httpx.Response(200, json={"access_token": fake_access_token()})
+
+    def test_token_url(self):
+        token = GuestToken(1, "secret", transport=httpx.MockTransport(self.handler),
+                           token_url="http://127.0.0.1:8000/oauth/token")
+        self.assertFalse(token.check_token())
+        self.assertTrue(token.check_token())
+
+    def test_async_token_url(self):
+        async def run():
+            token = AsyncGuestToken(1, "secret", transport=httpx.MockTransport(self.handler),
+                                    token_url="http://127.0.0.1:8000/oauth/token")
+            self.assertFalse(await token.check_token())
+            self.assertTrue(await token.check_token())
+
+        asyncio.run(run())
+
+
+class TestAutoRefresh(unittest.TestCase):
+    def test_background_refresh(self):
+        token = GuestToken()
+        token.refresh_margin = 0
+        token.access_token = fake_access_token(lifetime=1)
+        token.payload = extract_payload_from_token(token.access_token)
+        refreshed = threading.Event()
+
+        def request_token():
+            new_token = fake_access_token()
+            token._snapshot = token._snapshot.create(new_token, extract_payload_from_token(new_token))
+            refreshed.set()
+
+        token._request_token = request_token
+        token.start_auto_refresh(ahead=0.5)
+        try:
+            self.assertTrue(refreshed.wait(5))
+            self.assertTrue(token._snapshot.is_valid(3600))
+        finally:
+            token.stop_auto_refresh()
+
+    def test_short_lived_token(self):
+        # Lifetime shorter than refresh_margin + ahead, refreshed halfway instead of continuously
+        token = GuestToken()
+        token.access_token = fake_access_token(lifetime=2)
+        token.payload = extract_payload_from_token(token.access_token)
+        self.assertAlmostEqual(1, token._snapshot.refresh_delay(token.refresh_margin + 60), delta=0.1)
+        calls = []
+
+        def request_token():
+            calls.append(1)
+            new_token = fake_access_token(lifetime=2)
+            token._snapshot = token._snapshot.create(new_token, extract_payload_from_token(new_token))
+
+        token._request_token = request_token
+        token.start_auto_refresh(ahead=60)
+        try:
+            time.sleep(1.5)
+        finally:
+            token.stop_auto_refresh()
+        self.assertEqual(1, len(calls))
+
+    def test_async_background_refresh(self):
+        async def run():
+            token = AsyncGuestToken()
+            token.refresh_margin = 0
+            token.access_token = fake_access_token(lifetime=1)
+            token.payload = extract_payload_from_token(token.access_token)
+            refreshed = asyncio.Event()
+
+            async def request_token():
+                new_token = fake_access_token()
+                token._snapshot = token._snapshot.create(new_token, extract_payload_from_token(new_token))
+                refreshed.set()
+
+            token._request_token = request_token
+            token.start_auto_refresh(ahead=0.5)
+            start = time.monotonic()
+            await asyncio.wait_for(refreshed.wait(), 5)
+            self.assertLess(time.monotonic() - start, 1)
+            await token.stop_auto_refresh()
+            self.assertTrue(token._snapshot.is_valid(3600))
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()